@@ -1,6 +1,7 @@
 import streamlit as st
-from database import get_db
-from auth import authenticate_user
+from database import session_scope
+from auth import authenticate_user, session_user
+from session import remember_login, restore_login, forget_login
 import time
 
 st.set_page_config(page_title="Inventory Assets Management", page_icon="📦", layout="wide")
@@ -15,16 +16,20 @@ def login_page():
         submit = st.form_submit_button("Login")
         
         if submit:
-            db = next(get_db())
-            user = authenticate_user(db, username, password)
+            with session_scope("Login") as db:
+                user = authenticate_user(db, username, password)
+                # Read the user while the session is open (the login commit expires it)
+                if user:
+                    st.session_state["user"] = session_user(user)
+                    remember_login(user)
             if user:
-                st.session_state["user"] = {"id": user.id, "username": user.username, "role": user.role.value}
-                st.success(f"Welcome {user.username}!")
+                st.success(f"Welcome {st.session_state['user']['username']}!")
                 st.rerun()
             else:
                 st.error("Invalid credentials")
 
 def main():
+    restore_login()
     if "user" not in st.session_state:
         login_page()
     else:
@@ -33,7 +38,7 @@ def main():
         st.sidebar.text(f"Role: {user['role']}")
         
         if st.sidebar.button("Logout"):
-            del st.session_state["user"]
+            forget_login()
             st.rerun()
         
         st.title("Dashboard")
@@ -44,9 +49,9 @@ def main():
         if user["role"] == "REQUESTER":
             st.write("Go to **Requester Portal** to view inventory and make requests.")
         elif user["role"] == "APPROVER":
-            st.write("Go to **Approver Portal** to manage pending requests.")
+            st.write("Go to **Approver Portal** to manage pending requests, or **Analytics** for demand and stock trends.")
         elif user["role"] == "ADMIN":
-            st.write("Go to **Admin Console** to manage system data.")
+            st.write("Go to **Admin Console** to manage system data, or **Analytics** for demand and stock trends.")
 
 if __name__ == "__main__":
     main()
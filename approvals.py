@@ -0,0 +1,124 @@
+"""
+Approve/reject decisions on asset requests. A batch of decisions is
+applied in one transaction, together with the outbox messages that
+notify the requesters.
+"""
+import datetime
+from collections import defaultdict
+from sqlalchemy.orm import Session, joinedload
+from models import AssetRequest, ApprovalLog, RequestStatus
+from stock import reserve_stock_batch, transition_pending
+from outbox import enqueue_notifications
+from email_templates import render_email
+from catalog import update_catalog_stock
+from stats import record_decisions, record_stock_taken
+from audit import record
+
+def _notification(req, decision, comments):
+    kind = "approved" if decision == RequestStatus.APPROVED else "rejected"
+    html, text = render_email(kind, item_model=req.item.model, comments=comments)
+    return {
+        "to_email": req.requester.email or "user@example.com",
+        "subject": f"Request {kind.capitalize()}",
+        "body": html,
+        "is_html": True,
+        "text_body": text,
+    }
+
+def _fit_to_stock(requests, stock):
+    """
+    Splits approvals into lines that fit the available stock and lines
+    that don't, filling each item's stock in submission order.
+    """
+    remaining = dict(stock)
+    fits, short = [], []
+    for req in sorted(requests, key=lambda r: (r.created_at, r.id)):
+        if remaining.get(req.item_id, 0) >= req.qty_requested:
+            remaining[req.item_id] -= req.qty_requested
+            fits.append(req)
+        else:
+            short.append(req)
+    return fits, short
+
+def decide_requests(db: Session, request_ids, approver_id: int, decision: RequestStatus,
+                    comments: str = "", skip_short: bool = False):
+    """
+    Applies one decision to a batch of pending requests in a single
+    transaction: stock is decremented once per item by the summed
+    quantity and approval logs are written in bulk. Both the status change
+    and the stock decrement are conditional, so concurrent approvers can't
+    decide a request twice or oversell an item. The dashboard summaries
+    (stats.py) are updated in the same transaction, and each decision and
+    stock change is audited once it commits.
+
+    When the stock of an item can't cover all approvals, the whole batch
+    is refused, or with skip_short=True only the lines that don't fit are
+    left pending.
+
+    Returns (success, message).
+    """
+    try:
+        requests = (
+            db.query(AssetRequest)
+            .options(joinedload(AssetRequest.item), joinedload(AssetRequest.requester))
+            .filter(AssetRequest.id.in_(list(request_ids)), AssetRequest.status == RequestStatus.PENDING)
+            .all()
+        )
+        if not requests:
+            return False, "No pending requests selected."
+
+        short = []
+        if decision == RequestStatus.APPROVED:
+            stock = {req.item_id: req.item.qty or 0 for req in requests}
+            requests, short = _fit_to_stock(requests, stock)
+            if short and not skip_short:
+                ids = ", ".join(f"#{r.id}" for r in short)
+                return False, f"Insufficient stock for requests {ids}; nothing was approved."
+            if not requests:
+                return False, "Insufficient stock for every selected request."
+
+        ids = [req.id for req in requests]
+        if transition_pending(db, ids, decision) != len(ids):
+            db.rollback()
+            return False, "Some requests were already decided by another approver; nothing was changed."
+
+        if decision == RequestStatus.APPROVED:
+            per_item = defaultdict(int)
+            for req in requests:
+                per_item[req.item_id] += req.qty_requested
+            failed = reserve_stock_batch(db, per_item)
+            if failed:
+                # Stock moved since the page was loaded
+                db.rollback()
+                return False, "Stock changed while deciding; nothing was approved. Please review again."
+            record_stock_taken(db, per_item)
+            for item_id, qty in per_item.items():
+                record(db, "STOCK_RESERVED", str(approver_id), "item", item_id, {"qty": qty})
+
+        now = datetime.datetime.utcnow()
+        record_decisions(db, requests, decision, approver_id, now)
+        db.bulk_insert_mappings(ApprovalLog, [{
+            "request_id": req_id,
+            "approver_id": approver_id,
+            "decision": decision.value,
+            "comments": comments,
+            "timestamp": now,
+        } for req_id in ids])
+        action = f"REQUEST_{decision.value}"
+        for req in requests:
+            record(db, action, str(approver_id), "request", req.id,
+                   {"item_id": req.item_id, "qty": req.qty_requested, "comments": comments})
+
+        enqueue_notifications(db, [_notification(req, decision, comments) for req in requests])
+        db.commit()
+        if decision == RequestStatus.APPROVED:
+            update_catalog_stock(db, per_item)
+
+        msg = f"{decision.value.capitalize()} {len(ids)} request(s)."
+        if short:
+            msg += " Left pending for insufficient stock: " + ", ".join(f"#{r.id}" for r in short)
+        return True, msg
+
+    except Exception as e:
+        db.rollback()
+        return False, f"Error: {str(e)}"
@@ -0,0 +1,207 @@
+"""
+Audit trail. record() queues an event on the caller's session; when that
+session commits, its events move to an in-process buffer that a
+background thread writes to audit_logs in batches (rolled-back work
+leaves no entries). The table is append-only: entries older than
+AUDIT_RETENTION_MONTHS are moved to one gzipped JSON Lines file per
+month and deleted.
+
+    python audit.py archive [--keep-months 6]
+"""
+import atexit
+import gzip
+import json
+import os
+import threading
+from datetime import datetime
+from sqlalchemy import delete, event, func, insert, select
+from sqlalchemy.orm import Session
+from models import AuditLog
+
+# Buffered events are written at least this often, or as soon as this many are waiting
+AUDIT_FLUSH_SECONDS = float(os.getenv("AUDIT_FLUSH_SECONDS", 2))
+AUDIT_BATCH_SIZE = int(os.getenv("AUDIT_BATCH_SIZE", 500))
+# A batch that keeps failing (e.g. its database is gone) is dropped after this many tries
+AUDIT_FLUSH_ATTEMPTS = 5
+
+AUDIT_ARCHIVE_DIR = os.getenv("AUDIT_ARCHIVE_DIR", "data/audit_archive")
+# Months kept in the table, the current one included
+AUDIT_RETENTION_MONTHS = int(os.getenv("AUDIT_RETENTION_MONTHS", 6))
+ARCHIVE_BATCH_SIZE = 10000
+
+# Actions recorded by the app, for the Admin Console filter
+AUDIT_ACTIONS = ["LOGIN", "LOGIN_FAILED", "LOGOUT", "REQUEST_APPROVED", "REQUEST_REJECTED", "STOCK_RESERVED",
+                 "INVENTORY_UPLOAD", "AUDIT_ARCHIVE", "SCHEMA_MIGRATION"]
+AUDIT_ENTITIES = ["user", "request", "item", "inventory"]
+
+_SESSION_KEY = "audit_events"
+_pending = {}  # engine -> committed events not written yet
+_pending_lock = threading.Lock()
+_flush_lock = threading.Lock()
+_failures = {}  # engine -> failed flush attempts in a row
+_flusher = None
+_wake = threading.Event()
+
+def record(db: Session, action: str, actor: str, entity: str = None, entity_id: int = None, details: dict = None):
+    """
+    Queues an audit event. It is written after the caller commits, and
+    dropped if the transaction rolls back.
+    """
+    db.info.setdefault(_SESSION_KEY, []).append({
+        "action": action,
+        "actor": actor,
+        "entity": entity,
+        "entity_id": entity_id,
+        "timestamp": datetime.utcnow(),
+        "details": json.dumps(details, default=str) if details is not None else None,
+    })
+
+@event.listens_for(Session, "after_commit")
+def _after_commit(session):
+    events = session.info.pop(_SESSION_KEY, None)
+    if events:
+        _enqueue(session.get_bind(), events)
+
+@event.listens_for(Session, "after_transaction_end")
+def _after_transaction_end(session, transaction):
+    # Still queued at the end of the outermost transaction: it rolled back
+    if transaction.parent is None:
+        session.info.pop(_SESSION_KEY, None)
+
+def _enqueue(engine, events):
+    with _pending_lock:
+        waiting = _pending.setdefault(engine, [])
+        waiting.extend(events)
+        full = len(waiting) >= AUDIT_BATCH_SIZE
+    _start_flusher()
+    if full:
+        _wake.set()
+
+def flush_audit() -> int:
+    """Writes every buffered event now. Returns how many were written."""
+    written = 0
+    with _flush_lock:
+        with _pending_lock:
+            batches = list(_pending.items())
+            _pending.clear()
+        for engine, events in batches:
+            try:
+                with engine.begin() as conn:
+                    for start in range(0, len(events), AUDIT_BATCH_SIZE):
+                        conn.execute(insert(AuditLog), events[start:start + AUDIT_BATCH_SIZE])
+                written += len(events)
+                _failures.pop(engine, None)
+            except Exception as e:
+                attempts = _failures[engine] = _failures.get(engine, 0) + 1
+                if attempts >= AUDIT_FLUSH_ATTEMPTS:
+                    del _failures[engine]
+                    print(f"Audit flush error, dropped {len(events)} event(s): {e}")
+                    continue
+                print(f"Audit flush error, will retry: {e}")
+                with _pending_lock:
+                    _pending[engine] = events + _pending.get(engine, [])
+    return written
+
+def run_audit_flusher(interval: float = AUDIT_FLUSH_SECONDS):
+    while True:
+        _wake.wait(interval)
+        _wake.clear()
+        flush_audit()
+
+def _start_flusher():
+    global _flusher
+    with _pending_lock:
+        if _flusher is None or not _flusher.is_alive():
+            _flusher = threading.Thread(target=run_audit_flusher, name="audit-flusher", daemon=True)
+            _flusher.start()
+            atexit.register(flush_audit)
+
+def _month_start(value: datetime) -> datetime:
+    return datetime(value.year, value.month, 1)
+
+def _add_months(month: datetime, months: int) -> datetime:
+    index = month.year * 12 + month.month - 1 + months
+    return datetime(index // 12, index % 12 + 1, 1)
+
+def _archive_month(db: Session, start: datetime, directory: str):
+    """
+    Writes the entries of the month starting at `start` to
+    audit-YYYY-MM-<first id>.jsonl.gz and deletes them. A rerun after a
+    crash between the two rewrites the same file, now with any later
+    entries too. Returns (path, entries).
+    """
+    end = _add_months(start, 1)
+    in_month = (AuditLog.timestamp >= start, AuditLog.timestamp < end)
+    columns = list(AuditLog.__table__.c)
+    result = db.execute(
+        select(*columns).where(*in_month).order_by(AuditLog.id).execution_options(yield_per=ARCHIVE_BATCH_SIZE)
+    )
+    tmp_path = os.path.join(directory, f".audit-{start:%Y-%m}.tmp")
+    first_id = last_id = None
+    count = 0
+    with gzip.open(tmp_path, "wt", encoding="utf-8") as f:
+        for rows in result.partitions():
+            for row in rows:
+                entry = dict(zip((c.name for c in columns), row))
+                entry["timestamp"] = entry["timestamp"].isoformat()
+                f.write(json.dumps(entry) + "\n")
+            first_id = rows[0].id if first_id is None else first_id
+            last_id = rows[-1].id
+            count += len(rows)
+    path = os.path.join(directory, f"audit-{start:%Y-%m}-{first_id}.jsonl.gz")
+    os.replace(tmp_path, path)
+    db.execute(delete(AuditLog).where(*in_month, AuditLog.id <= last_id))
+    db.commit()
+    return path, count
+
+def archive_audit_logs(db: Session, keep_months: int = AUDIT_RETENTION_MONTHS, directory: str = AUDIT_ARCHIVE_DIR,
+                       actor: str = "SYSTEM"):
+    """
+    Moves entries older than the last keep_months calendar months out of
+    the table, one archive file per month. Returns {path: entries}.
+    """
+    os.makedirs(directory, exist_ok=True)
+    cutoff = _add_months(_month_start(datetime.utcnow()), -(max(keep_months, 1) - 1))
+    archived = {}
+    while True:
+        oldest = db.query(func.min(AuditLog.timestamp)).scalar()
+        if oldest is None or oldest >= cutoff:
+            break
+        path, count = _archive_month(db, _month_start(oldest), directory)
+        archived[path] = count
+    if archived:
+        record(db, "AUDIT_ARCHIVE", actor, details={"before": cutoff.date(), "files": archived})
+        db.commit()
+    return archived
+
+def list_audit_archives(directory: str = AUDIT_ARCHIVE_DIR):
+    """Archive file names, oldest month first."""
+    if not os.path.isdir(directory):
+        return []
+    return sorted(name for name in os.listdir(directory) if name.startswith("audit-") and name.endswith(".jsonl.gz"))
+
+def read_audit_archive(path: str):
+    """Yields the entries of an archive file as dicts."""
+    with gzip.open(path, "rt", encoding="utf-8") as f:
+        for line in f:
+            yield json.loads(line)
+
+if __name__ == "__main__":
+    import argparse
+    from database import SessionLocal
+
+    parser = argparse.ArgumentParser(description="Move old audit entries to monthly archive files.")
+    parser.add_argument("command", choices=["archive"])
+    parser.add_argument("--keep-months", type=int, default=AUDIT_RETENTION_MONTHS)
+    parser.add_argument("--dir", default=AUDIT_ARCHIVE_DIR)
+    args = parser.parse_args()
+
+    db = SessionLocal()
+    try:
+        archived = archive_audit_logs(db, args.keep_months, args.dir)
+    finally:
+        db.close()
+    flush_audit()
+    for path, count in archived.items():
+        print(f"{path}: {count:,} entries")
+    print(f"Archived {sum(archived.values()):,} entries into {len(archived)} file(s)")
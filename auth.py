@@ -1,12 +1,58 @@
-import bcrypt
+import hashlib
+import hmac
+import os
+import secrets
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from sqlalchemy.exc import IntegrityError
 from sqlalchemy.orm import Session
-from models import User, UserRole
+from models import User, UserRole, RevokedSessionToken
+from audit import record
 
-def hash_password(password: str) -> str:
-    return bcrypt.hashpw(password.encode('utf-8'), bcrypt.gensalt()).decode('utf-8')
+# bcrypt cost (log2 rounds). Stored hashes with another cost are rehashed on the next login.
+BCRYPT_ROUNDS = int(os.getenv("BCRYPT_ROUNDS", 12))
+# Concurrent bcrypt computations; a login spike queues here instead of taking every core
+AUTH_WORKERS = int(os.getenv("AUTH_WORKERS", 2))
+
+# Signed session tokens hand a login over to a new tab, which then skips
+# bcrypt. They travel in the page URL, so they are short-lived and
+# single-use: redeemed and logged-out tokens are recorded in the database,
+# where every app process sees them.
+# Without SESSION_SECRET a random one is used and tokens end with the process.
+SESSION_SECRET = os.getenv("SESSION_SECRET") or secrets.token_hex(32)
+SESSION_TTL_SECONDS = int(os.getenv("SESSION_TTL_SECONDS", 15 * 60))
+# How often a process deletes revocations of tokens that expired since
+_PRUNE_SECONDS = 3600
+
+_pool = None
+_pool_lock = threading.Lock()
+_last_prune = 0.0
+
+def _bcrypt_pool() -> ThreadPoolExecutor:
+    global _pool
+    with _pool_lock:
+        if _pool is None:
+            _pool = ThreadPoolExecutor(max_workers=AUTH_WORKERS, thread_name_prefix="bcrypt")
+        return _pool
+
+def hash_password(password: str, rounds: int = None) -> str:
+    import bcrypt  # Loaded on first login, not by every page
+
+    salt = bcrypt.gensalt(rounds or BCRYPT_ROUNDS)
+    return _bcrypt_pool().submit(bcrypt.hashpw, password.encode('utf-8'), salt).result().decode('utf-8')
 
 def verify_password(plain_password: str, hashed_password: str) -> bool:
-    return bcrypt.checkpw(plain_password.encode('utf-8'), hashed_password.encode('utf-8'))
+    import bcrypt
+
+    return _bcrypt_pool().submit(bcrypt.checkpw, plain_password.encode('utf-8'), hashed_password.encode('utf-8')).result()
+
+def needs_rehash(hashed_password: str) -> bool:
+    """True when a hash ($2b$<cost>$...) was made with another cost than BCRYPT_ROUNDS."""
+    try:
+        return int(hashed_password.split("$")[2]) != BCRYPT_ROUNDS
+    except (IndexError, ValueError):
+        return True
 
 def create_user(db: Session, username: str, password: str, email: str, role: UserRole):
     hashed_pw = hash_password(password)
@@ -20,11 +66,105 @@ def get_user_by_username(db: Session, username: str):
     return db.query(User).filter(User.username == username).first()
 
 def authenticate_user(db: Session, username: str, password: str):
+    """
+    Checks the password; on success a hash made with an outdated cost is
+    replaced while the plain password is at hand. Both outcomes are
+    audited, and committed.
+    """
     user = get_user_by_username(db, username)
     if user and verify_password(password, user.password_hash):
+        if needs_rehash(user.password_hash):
+            user.password_hash = hash_password(password)
+        record(db, "LOGIN", str(user.id), "user", user.id)
+        db.commit()
         return user
+    record(db, "LOGIN_FAILED", username, "user", user.id if user else None)
+    db.commit()
     return None
 
+def session_user(user: User) -> dict:
+    """What pages keep in st.session_state["user"]."""
+    return {"id": user.id, "username": user.username, "role": user.role.value}
+
+def _sign(user_id: int, expires_at: int, nonce: str, password_hash: str) -> str:
+    # Keyed on the password hash too, so changing the password ends existing sessions
+    message = f"{user_id}.{expires_at}.{nonce}.{password_hash}".encode()
+    return hmac.new(SESSION_SECRET.encode(), message, hashlib.sha256).hexdigest()
+
+def issue_session_token(user: User) -> str:
+    """Token for a user who just authenticated: <user id>.<expiry>.<nonce>.<signature>."""
+    expires_at = int(time.time()) + SESSION_TTL_SECONDS
+    nonce = secrets.token_urlsafe(12)
+    return f"{user.id}.{expires_at}.{nonce}.{_sign(user.id, expires_at, nonce, user.password_hash)}"
+
+def reissue_session_token(db: Session, user_id: int, previous: str = None):
+    """
+    Fresh token for a user logged in on the calling tab, None if the user
+    is gone. `previous`, the token it replaces, is revoked (committed).
+    """
+    user = db.get(User, user_id)
+    token = issue_session_token(user) if user else None
+    if previous:
+        revoke_session_token(db, previous)
+    return token
+
+def _parse_token(token: str):
+    """(user_id, expires_at, nonce, signature), or None for a malformed token."""
+    try:
+        user_id, expires_at, nonce, signature = token.split(".")
+        return int(user_id), int(expires_at), nonce, signature
+    except ValueError:
+        return None
+
+def token_expires_at(token: str) -> int:
+    """Expiry (Unix time) a token claims, 0 for a malformed one. Not verified."""
+    parsed = _parse_token(token)
+    return parsed[1] if parsed else 0
+
+def _revoke(db: Session, nonce: str, expires_at: int) -> bool:
+    """Records a token as used up and commits. False if it already was."""
+    global _last_prune
+    now = time.time()
+    if now - _last_prune > _PRUNE_SECONDS:
+        _last_prune = now
+        db.query(RevokedSessionToken).filter(RevokedSessionToken.expires_at <= int(now)) \
+            .delete(synchronize_session=False)
+    db.add(RevokedSessionToken(nonce=nonce, expires_at=expires_at))
+    try:
+        db.commit()
+    except IntegrityError:
+        db.rollback()
+        return False
+    return True
+
+def resume_session(db: Session, token: str):
+    """
+    Redeems a token: (session user dict, a fresh token for the redeeming
+    tab) if it is valid and unused, else None. Costs one user lookup, an
+    HMAC and the committed insert that uses it up, never a bcrypt check.
+    Of two tabs redeeming the same token, in any processes, one wins.
+    """
+    parsed = _parse_token(token)
+    if parsed is None:
+        return None
+    user_id, expires_at, nonce, signature = parsed
+    if expires_at <= time.time():
+        return None
+    user = db.get(User, user_id)
+    if not user or not hmac.compare_digest(signature, _sign(user_id, expires_at, nonce, user.password_hash)):
+        return None
+    # Read before the commit expires the user
+    resumed, fresh = session_user(user), issue_session_token(user)
+    if not _revoke(db, nonce, expires_at):
+        return None
+    return resumed, fresh
+
+def revoke_session_token(db: Session, token: str):
+    """Logout: the token stops working, in every process. Commits."""
+    parsed = _parse_token(token)
+    if parsed and parsed[1] > time.time():
+        _revoke(db, parsed[2], parsed[1])
+
 def seed_users(db: Session):
     # Check if admin exists
     admin = get_user_by_username(db, "admin")
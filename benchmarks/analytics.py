@@ -0,0 +1,121 @@
+"""
+Analytics page queries against the summary tables vs the same figures
+computed by scanning asset_requests, plus a consistency check: after
+submissions and batch decisions the incrementally maintained summaries
+must equal a full rebuild.
+
+    python -m benchmarks.analytics --requests 1000000
+"""
+import argparse
+import os
+import statistics
+import tempfile
+import time
+from datetime import date, datetime
+
+import numpy as np
+from sqlalchemy import create_engine, func, select
+from sqlalchemy.orm import sessionmaker
+
+from models import (Base, AssetRequest, InventoryItem, RequestStatus,
+                    ItemRequestStats, DailyRequestStats, ApproverStats, StockSummary)
+from migrations import upgrade_schema
+from approvals import decide_requests
+from audit import flush_audit
+from stats import record_submission, rebuild_stats
+from queries import (get_status_totals, get_daily_request_counts, get_demand_by,
+                     get_top_items, get_stock_summary, get_approver_latency)
+from benchmarks.common import timed
+from benchmarks.indexes import populate
+
+def dashboard_queries(db):
+    return {
+        "status totals": lambda: get_status_totals(db),
+        "daily counts (365d)": lambda: get_daily_request_counts(db, date(2024, 1, 1)),
+        "demand by dept": lambda: get_demand_by(db, "dept"),
+        "top items": lambda: get_top_items(db),
+        "stock by site": lambda: get_stock_summary(db, "site"),
+        "approver latency": lambda: get_approver_latency(db),
+    }
+
+def scan_queries(db):
+    # What the same figures cost without the summaries
+    return {
+        "status totals": lambda: db.query(AssetRequest.status, func.count(), func.sum(AssetRequest.qty_requested))
+                                   .group_by(AssetRequest.status).all(),
+        "daily counts (365d)": lambda: db.query(func.date(AssetRequest.created_at), AssetRequest.status, func.count())
+                                         .group_by(func.date(AssetRequest.created_at), AssetRequest.status).all(),
+        "demand by dept": lambda: db.query(InventoryItem.dept, func.sum(AssetRequest.qty_requested))
+                                    .join(AssetRequest.item).group_by(InventoryItem.dept).all(),
+    }
+
+def median_ms(query, repeat):
+    samples = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        query()
+        samples.append(time.perf_counter() - start)
+    return statistics.median(samples) * 1000
+
+def snapshot(db):
+    # Rows whose counters all went back to zero are equivalent to missing rows
+    tables = {}
+    for model in (ItemRequestStats, DailyRequestStats, ApproverStats, StockSummary):
+        keys = len(model.__table__.primary_key.columns)
+        rows = [tuple(float(f"{v:.9g}") if isinstance(v, float) else v for v in row)
+                for row in db.execute(select(*model.__table__.c))]
+        tables[model.__tablename__] = sorted((row for row in rows if any(row[keys:])), key=str)
+    return tables
+
+def check_consistency(db, rng, batches=20):
+    pending = [r for (r,) in db.query(AssetRequest.id).filter(AssetRequest.status == RequestStatus.PENDING).limit(2000)]
+    for item_id in rng.integers(1, 1000, size=200):
+        req = AssetRequest(user_id=21, item_id=int(item_id), qty_requested=1, status=RequestStatus.PENDING,
+                           purpose="bench", created_at=datetime.utcnow())
+        db.add(req)
+        record_submission(db, req)
+    db.commit()
+
+    decided = 0
+    for batch in np.array_split(np.array(pending), batches):
+        decision = RequestStatus.APPROVED if rng.random() < 0.7 else RequestStatus.REJECTED
+        ok, _ = decide_requests(db, [int(i) for i in batch], int(rng.integers(1, 21)), decision, skip_short=True)
+        decided += ok
+    incremental = snapshot(db)
+    rebuild_stats(db)
+    rebuilt = snapshot(db)
+    db.rollback()
+    for table in rebuilt:
+        assert incremental[table] == rebuilt[table], f"{table} drifted from a full rebuild"
+    assert decided > 0
+    print(f"OK: summaries match a full rebuild after 200 submissions and {decided} decided batches")
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--requests", type=int, default=200000)
+    parser.add_argument("--repeat", type=int, default=5)
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmp:
+        engine = create_engine(f"sqlite:///{os.path.join(tmp, 'bench.db')}")
+        Base.metadata.create_all(bind=engine)
+        populate(engine, args.requests)
+        _, backfill = timed(upgrade_schema, engine)
+        print(f"{args.requests:,} requests, summaries backfilled by upgrade_schema in {backfill:.2f}s")
+
+        db = sessionmaker(autocommit=False, autoflush=False, bind=engine)()
+        try:
+            scans = scan_queries(db)
+            for name, query in dashboard_queries(db).items():
+                line = f"{name:<22} summary {median_ms(query, args.repeat):8.2f} ms"
+                if name in scans:
+                    line += f" | scan {median_ms(scans[name], args.repeat):9.2f} ms"
+                print(line)
+            check_consistency(db, np.random.default_rng(1))
+        finally:
+            db.close()
+            flush_audit()
+            engine.dispose()
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,143 @@
+"""
+Audit pipeline: the cost an audited business transaction pays for its
+audit entry (inline insert vs. buffered batch), Admin Console page
+latency at the first and a deep page for each filter as the table grows
+(checked to use the (filter, id) indexes, never a sort), and monthly
+archiving. Also checks that rolled-back work leaves no entries.
+
+    python -m benchmarks.audit --rows 10000 1000000
+"""
+import argparse
+import os
+import random
+import statistics
+import tempfile
+import time
+from datetime import datetime, timedelta
+
+from sqlalchemy import func, insert, text, update
+
+import audit
+from audit import AUDIT_ACTIONS, AUDIT_ENTITIES, archive_audit_logs, flush_audit, read_audit_archive, record
+from models import AuditLog, InventoryItem
+from queries import AUDIT_PAGE_SIZE, get_audit_page
+from benchmarks.common import temp_session
+
+def populate(db, rows, months=12, seed=0):
+    """`rows` entries spread evenly over the last `months` months, oldest first."""
+    rng = random.Random(seed)
+    now = datetime.utcnow()
+    step = timedelta(days=30 * months) / rows
+    start = now - step * rows
+    batch = []
+    for i in range(rows):
+        entity = rng.choice(AUDIT_ENTITIES)
+        batch.append({"action": rng.choice(AUDIT_ACTIONS), "actor": str(rng.randint(1, 500)), "entity": entity,
+                      "entity_id": rng.randint(1, 5000), "timestamp": start + step * i, "details": '{"qty": 1}'})
+        if len(batch) == 50000:
+            db.execute(insert(AuditLog), batch)
+            batch = []
+    if batch:
+        db.execute(insert(AuditLog), batch)
+    db.commit()
+
+def audited_transactions(db, count, buffered):
+    """Per-transaction latency (ms) of a stock update audited inline or through the buffer."""
+    samples = []
+    for i in range(count):
+        start = time.perf_counter()
+        db.execute(update(InventoryItem).where(InventoryItem.id == 1).values(qty=InventoryItem.qty - 1))
+        if buffered:
+            record(db, "STOCK_RESERVED", "1", "item", 1, {"qty": 1})
+        else:
+            db.add(AuditLog(action="STOCK_RESERVED", actor="1", entity="item", entity_id=1, details='{"qty": 1}'))
+        db.commit()
+        samples.append((time.perf_counter() - start) * 1000)
+    return statistics.median(samples)
+
+def page_timings(db, repeat=20):
+    """{filter: (first page ms, deep page ms)}; the deep page starts halfway down the table."""
+    middle = db.query(func.max(AuditLog.id)).scalar() // 2
+    filters = {"none": {}, "action": {"action": "LOGIN"}, "actor": {"actor": "42"},
+               "entity": {"entity": "item"}, "entity_id": {"entity": "item", "entity_id": 7}}
+    timings = {}
+    for name, kwargs in filters.items():
+        result = []
+        for before in (None, middle):
+            start = time.perf_counter()
+            for _ in range(repeat):
+                get_audit_page(db, before=before, limit=AUDIT_PAGE_SIZE, **kwargs)
+            result.append((time.perf_counter() - start) / repeat * 1000)
+        timings[name] = tuple(result)
+
+        sql = db.query(AuditLog).filter(*[getattr(AuditLog, k) == v for k, v in kwargs.items()]) \
+            .filter(AuditLog.id < middle).order_by(AuditLog.id.desc()).limit(AUDIT_PAGE_SIZE)
+        compiled = sql.statement.compile(compile_kwargs={"literal_binds": True})
+        plan = " ".join(row[-1] for row in db.execute(text(f"EXPLAIN QUERY PLAN {compiled}")))
+        assert "TEMP B-TREE" not in plan and ("INDEX" in plan or "PRIMARY KEY" in plan or "INTEGER" in plan), \
+            f"{name}: {plan}"
+    return timings
+
+def offset_page(db, offset, repeat=5):
+    """The old way to page deep: ORDER BY timestamp with OFFSET."""
+    start = time.perf_counter()
+    for _ in range(repeat):
+        db.query(AuditLog).order_by(AuditLog.timestamp.desc()).offset(offset).limit(AUDIT_PAGE_SIZE).all()
+    return (time.perf_counter() - start) / repeat * 1000
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--rows", type=int, nargs="+", default=[10000, 1000000])
+    parser.add_argument("--transactions", type=int, default=500)
+    args = parser.parse_args()
+
+    with temp_session() as db:
+        db.add(InventoryItem(id=1, model="MDL-1", qty=10 ** 9))
+        db.commit()
+        inline = audited_transactions(db, args.transactions, buffered=False)
+        buffered = audited_transactions(db, args.transactions, buffered=True)
+        start = time.perf_counter()
+        written = flush_audit()
+        flush_ms = (time.perf_counter() - start) * 1000
+        assert written == args.transactions
+        assert db.query(AuditLog).count() == 2 * args.transactions
+        print(f"audited stock update: inline insert {inline:.3f} ms, buffered {buffered:.3f} ms per transaction; "
+              f"{written} buffered entries flushed in {flush_ms:.1f} ms")
+
+        # Rolled back: nothing written; committed later in another transaction: written once
+        record(db, "LOGIN", "1", "user", 1)
+        db.rollback()
+        record(db, "LOGOUT", "1", "user", 1)
+        db.commit()
+        flush_audit()
+        assert db.query(AuditLog).filter(AuditLog.action.in_(["LOGIN", "LOGOUT"])).count() == 1
+
+    for rows in args.rows:
+        with temp_session() as db:
+            populate(db, rows)
+            timings = page_timings(db)
+            print(f"{rows:>9,} entries: " + ", ".join(
+                f"{name} {first:.2f}/{deep:.2f} ms" for name, (first, deep) in timings.items())
+                  + f" (first/deep page) | OFFSET {rows // 2:,}: {offset_page(db, rows // 2):.1f} ms")
+
+    with temp_session() as db, tempfile.TemporaryDirectory() as directory:
+        populate(db, args.rows[0], months=12)
+        total = db.query(AuditLog).count()
+        start = time.perf_counter()
+        archived = archive_audit_logs(db, keep_months=6, directory=directory)
+        elapsed = time.perf_counter() - start
+        flush_audit()
+        kept = db.query(AuditLog).count() - 1  # The archive run audits itself
+        in_files = sum(sum(1 for _ in read_audit_archive(path)) for path in archived)
+        assert in_files == sum(archived.values()) and in_files + kept == total, (in_files, kept, total)
+        assert len(archived) in (6, 7), archived  # The oldest month is partial
+        cutoff = audit._add_months(audit._month_start(datetime.utcnow()), -5)
+        assert db.query(func.min(AuditLog.timestamp)).scalar() >= cutoff
+        assert archive_audit_logs(db, keep_months=6, directory=directory) == {}
+        size = sum(os.path.getsize(p) for p in archived)
+        print(f"archived {in_files:,} of {total:,} entries into {len(archived)} monthly files "
+              f"({size / 1024:.0f} KiB) in {elapsed:.2f}s")
+    print("OK: audit pages use the keyset indexes; archives hold exactly the entries removed")
+
+if __name__ == "__main__":
+    main()
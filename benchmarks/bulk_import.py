@@ -0,0 +1,81 @@
+"""
+Bulk import of several multi-sheet workbooks: sheet parsing throughput
+with 1..N pool workers, then a full import checked against ingesting the
+same rows as one upload (models repeated across sheets and files must
+end up as one item with the quantities added up).
+
+    python -m benchmarks.bulk_import --files 4 --sheets 3 --rows 20000 --workers 4
+"""
+import argparse
+import os
+import tempfile
+
+import pandas as pd
+from openpyxl import Workbook
+
+from bulk_import import SheetJob, bulk_import_files, parse_sheets
+from models import InventoryItem
+from utils import upsert_inventory_frame
+from benchmarks.common import temp_session, synthetic_inventory_sheet, timed
+
+def write_workbook(path, sheets):
+    wb = Workbook(write_only=True)
+    for name, df in sheets.items():
+        ws = wb.create_sheet(name)
+        ws.append(list(df.columns))
+        for row in df.itertuples(index=False):
+            ws.append([None if v is None else (v.item() if hasattr(v, "item") else v) for v in row])
+    wb.save(path)
+
+def inventory(db):
+    return sorted(db.query(InventoryItem.model, InventoryItem.qty, InventoryItem.site))
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--files", type=int, default=4)
+    parser.add_argument("--sheets", type=int, default=3)
+    parser.add_argument("--rows", type=int, default=20000, help="Rows per sheet")
+    parser.add_argument("--workers", type=int, default=os.cpu_count() or 1)
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmp:
+        paths, frames = [], []
+        for f in range(args.files):
+            sheets = {}
+            for s in range(args.sheets):
+                # Overlapping model ranges: 10% of each sheet repeats models of other sheets
+                df = synthetic_inventory_sheet(args.rows, seed=f * args.sheets + s)
+                offset = (f * args.sheets + s) * int(args.rows * 0.9)
+                df["Model "] = [f"MDL-{offset + i:07d}" for i in range(args.rows)]
+                sheets[f"Site {s}"] = df
+                frames.append(df)
+            paths.append(os.path.join(tmp, f"supplier_{f}.xlsx"))
+            write_workbook(paths[-1], sheets)
+
+        total_rows = args.files * args.sheets * args.rows
+        jobs = [SheetJob(os.path.basename(p), p, f"Site {s}") for p in paths for s in range(args.sheets)]
+        workers = 1
+        while workers <= args.workers:
+            parsed, elapsed = timed(lambda: [p.rows for p in parse_sheets(jobs, workers)])
+            assert sum(parsed) == total_rows
+            print(f"parse, {workers:>2} worker(s): {total_rows / elapsed:9,.0f} rows/s ({elapsed:.2f}s, incl. pool start-up)")
+            workers = workers * 2 if workers * 2 <= args.workers or workers == args.workers else args.workers
+
+        with temp_session() as db:
+            (success, msg, results), elapsed = timed(bulk_import_files, db, paths, workers=args.workers)
+            assert success, msg
+            print(f"bulk import, {args.workers} worker(s): {total_rows / elapsed:,.0f} rows/s ({elapsed:.2f}s)")
+            for r in results:
+                print(f"  {r.file}: {r.sheets} sheets, {r.rows:,} rows, added {r.added:,}, updated {r.updated:,}")
+            bulk = inventory(db)
+
+        with temp_session() as db:
+            upsert_inventory_frame(db, pd.concat(frames, ignore_index=True))
+            db.commit()
+            single = inventory(db)
+
+        assert bulk == single, "bulk import differs from a single upload of the same rows"
+        print(f"OK: {len(bulk):,} items, same as one upload of all {total_rows:,} rows")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,63 @@
+import os
+import tempfile
+import time
+from contextlib import contextmanager
+
+import numpy as np
+import pandas as pd
+from sqlalchemy import create_engine
+from sqlalchemy.orm import sessionmaker
+
+from models import Base
+from audit import flush_audit
+
+@contextmanager
+def temp_session():
+    """
+    Yields a session bound to a fresh SQLite file, so benchmarks never
+    touch data/inventory.db.
+    """
+    with tempfile.TemporaryDirectory() as tmp:
+        engine = create_engine(f"sqlite:///{os.path.join(tmp, 'bench.db')}")
+        Base.metadata.create_all(bind=engine)
+        db = sessionmaker(autocommit=False, autoflush=False, bind=engine)()
+        try:
+            yield db
+        finally:
+            db.close()
+            flush_audit()  # Before the file goes away
+            engine.dispose()
+
+def synthetic_inventory_sheet(rows: int, unique_models: int = None, seed: int = 0) -> pd.DataFrame:
+    """
+    Builds a DataFrame shaped like Inventory_dataset.xlsx (including the
+    trailing-space "Model " header). Each model is stocked at one site, so
+    rows repeating a model are the same item.
+    """
+    rng = np.random.default_rng(seed)
+    if unique_models is None:
+        model_ids = np.arange(rows)
+    else:
+        model_ids = rng.integers(0, unique_models, size=rows)
+    sites = np.array(["DTA", "DTA-2", "SEZ"])
+    depts = np.array(["SMT-Equipment", "Testing", "Quality", "Toolroom"])
+    return pd.DataFrame({
+        "#": np.arange(1, rows + 1),
+        "Type": "Machine",
+        "Manufacturer": [f"MFR-{m % 500}" for m in model_ids],
+        "Model ": [f"MDL-{m:07d}" for m in model_ids],
+        "Description": [f"Item {m}" for m in model_ids],
+        "Sum-Description": "Bench",
+        "QTY": rng.integers(0, 20, size=rows),
+        "Head Configuration": None,
+        "Dept": depts[rng.integers(0, len(depts), size=rows)],
+        "Status": "IDLE",
+        "Area": "Asset Room",
+        "Location": "Warehouse",
+        "Site": sites[model_ids % len(sites)],
+    })
+
+def timed(fn, *args, **kwargs):
+    start = time.perf_counter()
+    result = fn(*args, **kwargs)
+    return result, time.perf_counter() - start
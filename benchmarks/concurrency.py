@@ -0,0 +1,95 @@
+"""
+N simulated Streamlit users reading and writing the same SQLite database
+at once, with a plain engine (rollback journal, default pragmas) and
+with database.create_db_engine (WAL, synchronous=NORMAL, busy_timeout,
+mmap, cache).
+
+    python -m benchmarks.concurrency --users 16 --seconds 5
+"""
+import argparse
+import os
+import random
+import tempfile
+import threading
+import time
+from collections import Counter
+
+from sqlalchemy import create_engine
+from sqlalchemy.orm import sessionmaker
+
+from database import create_db_engine
+from models import Base, User, InventoryItem, AssetRequest, RequestStatus
+from queries import get_pending_page, count_pending_requests, get_user_requests
+
+def seed(Session, users, items):
+    db = Session()
+    db.add_all([User(id=i, username=f"user{i}", password_hash="x") for i in range(1, users + 1)])
+    db.add_all([InventoryItem(id=i, model=f"MDL-{i}", qty=1000) for i in range(1, items + 1)])
+    db.commit()
+    db.close()
+
+def simulated_user(Session, user_id, items, deadline, write_ratio, stats):
+    while time.perf_counter() < deadline:
+        db = Session()
+        start = time.perf_counter()
+        try:
+            if random.random() < write_ratio:
+                db.add(AssetRequest(user_id=user_id, item_id=random.randint(1, items), qty_requested=1,
+                                    purpose="bench", status=RequestStatus.PENDING))
+                db.commit()
+                kind = "write"
+            else:
+                # One page rerun worth of reads
+                # The Requester Portal catalog's load, as if its cache missed every time
+                db.query(InventoryItem).filter(InventoryItem.qty > 0).all()
+                count_pending_requests(db)
+                get_pending_page(db)
+                get_user_requests(db, user_id)
+                kind = "read"
+            stats[kind] += 1
+            stats[f"{kind}_time"] += time.perf_counter() - start
+        except Exception as e:
+            db.rollback()
+            stats[f"error: {type(e).__name__}"] += 1
+        finally:
+            db.close()
+
+def run(engine, users, items, seconds, write_ratio):
+    Base.metadata.create_all(bind=engine)
+    Session = sessionmaker(autocommit=False, autoflush=False, bind=engine)
+    seed(Session, users, items)
+    stats = Counter()
+    deadline = time.perf_counter() + seconds
+    threads = [threading.Thread(target=simulated_user, args=(Session, u, items, deadline, write_ratio, stats))
+               for u in range(1, users + 1)]
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+    engine.dispose()
+    return stats
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--users", type=int, default=16)
+    parser.add_argument("--items", type=int, default=500)
+    parser.add_argument("--seconds", type=float, default=5)
+    parser.add_argument("--write-ratio", type=float, default=0.2)
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmp:
+        variants = {
+            "default engine": create_engine(f"sqlite:///{os.path.join(tmp, 'default.db')}",
+                                            connect_args={"check_same_thread": False}),
+            "tuned engine": create_db_engine(f"sqlite:///{os.path.join(tmp, 'tuned.db')}"),
+        }
+        for name, engine in variants.items():
+            s = run(engine, args.users, args.items, args.seconds, args.write_ratio)
+            errors = {k: v for k, v in s.items() if k.startswith("error")}
+            print(f"{name:<15} reads {s['read'] / args.seconds:>7,.0f}/s "
+                  f"(avg {1000 * s['read_time'] / max(s['read'], 1):.1f} ms)  "
+                  f"writes {s['write'] / args.seconds:>7,.0f}/s "
+                  f"(avg {1000 * s['write_time'] / max(s['write'], 1):.1f} ms)  errors {errors or 0}")
+
+if __name__ == "__main__":
+    main()
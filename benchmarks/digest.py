@@ -0,0 +1,113 @@
+"""
+Approver digests over a synthetic pending queue: one outbox message per
+approver per period instead of one per request, built with a constant
+number of statements however many approvers and requests there are.
+Also checks that a rerun, a second process in the same period and a
+restart queue nothing more, and that the next period sends again.
+
+    python -m benchmarks.digest --requests 100000 --approvers 200
+"""
+import argparse
+from datetime import datetime, timedelta
+
+import numpy as np
+from sqlalchemy import event
+from sqlalchemy.orm import sessionmaker
+
+import digest
+from digest import DIGEST_INTERVAL_HOURS, DIGEST_MAX_ROWS, digest_period, send_digests
+from models import ApproverDigest, AssetRequest, OutboxMessage
+from benchmarks.common import temp_session, timed
+
+def populate(db, requests, approvers, seed=0):
+    """`requests` pending requests spread unevenly over `approvers` approver emails."""
+    rng = np.random.default_rng(seed)
+    # A few approvers get most of the queue, as in practice
+    weights = 1 / np.arange(1, approvers + 1)
+    assigned = rng.choice(approvers, size=requests, p=weights / weights.sum())
+    start = datetime(2025, 1, 1)
+    conn = db.connection()
+    conn.exec_driver_sql("INSERT INTO users (id, username, password_hash, role) VALUES (1, 'requester', 'x', 'REQUESTER')")
+    conn.exec_driver_sql("INSERT INTO inventory_items (id, manufacturer, model, description, qty) "
+                         "VALUES (1, 'MFR', 'MDL-1', 'Bench item', 10)")
+    conn.exec_driver_sql(
+        "INSERT INTO asset_requests (user_id, item_id, qty_requested, purpose, status, approver_email, created_at) "
+        "VALUES (1, 1, 1, 'bench', 'PENDING', ?, ?)",
+        [(f"approver{a}@example.com", start + timedelta(seconds=i)) for i, a in enumerate(assigned)],
+    )
+    db.commit()
+    return np.bincount(assigned, minlength=approvers)
+
+def count_statements(engine):
+    counter = {"statements": 0}
+    def before_execute(*_):
+        counter["statements"] += 1
+    event.listen(engine, "before_cursor_execute", before_execute)
+    return counter, lambda: event.remove(engine, "before_cursor_execute", before_execute)
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--requests", type=int, default=100000)
+    parser.add_argument("--approvers", type=int, default=200)
+    args = parser.parse_args()
+
+    with temp_session() as db:
+        per_approver = populate(db, args.requests, args.approvers)
+        active = int((per_approver > 0).sum())
+        # Mid-period, so the minutes added below stay in the same period
+        now = digest_period(datetime.utcnow()) + timedelta(hours=DIGEST_INTERVAL_HOURS / 2)
+        engine = db.get_bind()
+
+        # Selecting the digests is one statement; each approver then costs its own inserts
+        counter, stop = count_statements(engine)
+        (pending, elapsed_select) = timed(digest.get_pending_digests, db, digest_period(now))
+        selects = counter["statements"]
+        stop()
+        assert selects == 1, selects
+        assert len(pending) == active
+        assert all(total == per_approver[int(email[8:-12])] and len(rows) == min(total, DIGEST_MAX_ROWS)
+                   for email, (total, rows) in pending.items())
+        db.rollback()
+
+        (queued, skipped), elapsed = timed(send_digests, db, now)
+        assert (queued, skipped) == (active, 0), (queued, skipped)
+        messages = db.query(OutboxMessage).count()
+        assert messages == active
+        busiest = db.query(OutboxMessage).filter(OutboxMessage.to_email == "approver0@example.com").one()
+        assert busiest.subject.endswith(f"({per_approver[0]})") and "the oldest" in busiest.text_body
+        print(f"{args.requests:,} pending requests, {active} approvers: {messages} digest emails instead of "
+              f"{args.requests:,} ({args.requests / messages:,.0f}x fewer); selected in {elapsed_select * 1000:.0f} ms "
+              f"with {selects} statement, queued in {elapsed:.2f}s")
+
+        # Same period: a rerun or a restarted process queues nothing
+        assert send_digests(db, now + timedelta(minutes=1)) == (0, 0)
+        other = sessionmaker(bind=engine)()
+        assert send_digests(other, now + timedelta(minutes=2)) == (0, 0)
+        other.close()
+
+        # A process that read the queue before another committed loses on the unique key, per approver
+        db.query(ApproverDigest).filter(ApproverDigest.approver_email == "approver0@example.com").delete()
+        db.query(OutboxMessage).filter(OutboxMessage.to_email == "approver0@example.com").delete()
+        db.commit()
+        load = digest.get_pending_digests
+        def racing_load(*a):
+            digest.get_pending_digests = load
+            result = load(*a)
+            other = sessionmaker(bind=engine)()
+            assert send_digests(other, now + timedelta(minutes=3)) == (1, 0)
+            other.close()
+            return result
+        digest.get_pending_digests = racing_load
+        assert send_digests(db, now + timedelta(minutes=3)) == (0, 1)
+        assert db.query(OutboxMessage).filter(OutboxMessage.to_email == "approver0@example.com").count() == 1
+
+        # Next period: approvers whose requests are still pending get a new digest
+        db.query(AssetRequest).filter(AssetRequest.approver_email != "approver0@example.com") \
+            .update({AssetRequest.status: "APPROVED"})
+        db.commit()
+        assert send_digests(db, now + timedelta(hours=DIGEST_INTERVAL_HOURS)) == (1, 0)
+        assert db.query(OutboxMessage).count() == messages + 1
+    print("OK: one digest per approver per period, however often or wherever the job runs")
+
+if __name__ == "__main__":
+    main()
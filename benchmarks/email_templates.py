@@ -0,0 +1,56 @@
+"""
+Renders/sec of the email templates, against the old inline f-string
+body, plus a digest with many rows.
+
+    python -m benchmarks.email_templates --renders 5000 --digest-rows 2000
+"""
+import argparse
+from datetime import datetime
+
+from email_templates import render_email
+from utils import generate_request_email
+from benchmarks.common import timed
+
+def legacy_body(requester_name, item_details, qty_requested, purpose):
+    # Trimmed copy of the pre-template generate_email_body: one big f-string per call
+    return f"""
+    <html><head><style>
+        body {{ font-family: Arial, sans-serif; line-height: 1.6; color: #333; }}
+        .container {{ width: 80%; margin: auto; padding: 20px; border: 1px solid #ddd; }}
+        table {{ width: 100%; border-collapse: collapse; margin-top: 10px; }}
+    </style></head>
+    <body><div class="container">
+        <p>A new asset request has been submitted by <strong>{requester_name}</strong>.</p>
+        <table>
+            <tr><th>Request Date</th><td>{datetime.now().strftime('%Y-%m-%d %H:%M:%S')}</td></tr>
+            <tr><th>Requester</th><td>{requester_name}</td></tr>
+            <tr><th>Item Requested</th><td>{item_details}</td></tr>
+            <tr><th>Quantity Needed</th><td>{qty_requested}</td></tr>
+            <tr><th>Purpose / Justification</th><td>{purpose}</td></tr>
+        </table>
+    </div></body></html>
+    """
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--renders", type=int, default=5000)
+    parser.add_argument("--digest-rows", type=int, default=2000)
+    args = parser.parse_args()
+
+    args_ = ("<script>alert(1)</script>", "Dell Latitude 5420 (Laptop)", 2, "New hires & contractors")
+    for name, render in (("f-string (legacy)", legacy_body), ("template html+text", generate_request_email)):
+        _, elapsed = timed(lambda: [render(*args_) for _ in range(args.renders)])
+        print(f"{name:<20} {args.renders / elapsed:>10,.0f} renders/s")
+
+    rows = [{"id": i, "created_at": datetime(2024, 1, 1), "requester_name": f"user{i}",
+             "item_details": f"MFR MDL-{i}", "qty_requested": 1, "purpose": "Line <b>extension</b>"}
+            for i in range(args.digest_rows)]
+    render_email("digest", requests=rows[:1])
+    _, elapsed = timed(render_email, "digest", requests=rows)
+    print(f"{'digest':<20} {args.digest_rows / elapsed:>10,.0f} rows/s ({elapsed * 1000:.1f} ms for {args.digest_rows} rows)")
+
+    html, _ = generate_request_email(*args_)
+    assert "<script>" not in html, "requester input was not escaped"
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,135 @@
+"""
+Forecast job over a synthetic request history: the first run over the
+whole history, then incremental runs that only read the approvals logged
+since the previous one. Each incremental result is checked against a
+from-scratch run at the same instant, and reorder alerts against the
+outbox (one per admin, not repeated while an item stays at risk).
+
+    python -m benchmarks.forecast --requests 1000000 --new 2000
+"""
+import argparse
+import os
+import tempfile
+from datetime import timedelta
+
+import numpy as np
+from sqlalchemy import create_engine, delete, func, select
+from sqlalchemy.orm import sessionmaker
+
+import forecast
+from forecast import run_forecast
+from models import Base, ApprovalLog, ForecastRun, ItemForecast, OutboxMessage, User, UserRole
+from benchmarks.common import timed
+from benchmarks.indexes import populate
+
+def add_approvals(engine, count, start, hours, items, seed):
+    """`count` new approved requests decided over `hours` hours after `start`."""
+    rng = np.random.default_rng(seed)
+    with engine.begin() as conn:
+        next_id = conn.exec_driver_sql("SELECT MAX(id) FROM asset_requests").scalar() + 1
+        stamps = [start + timedelta(seconds=int(s)) for s in np.sort(rng.integers(0, hours * 3600, size=count))]
+        item_ids = rng.integers(1, items + 1, size=count)
+        conn.exec_driver_sql(
+            "INSERT INTO asset_requests (id, user_id, item_id, qty_requested, status, created_at) VALUES (?, 1, ?, 1, 'APPROVED', ?)",
+            [(next_id + i, int(it), s) for i, (it, s) in enumerate(zip(item_ids, stamps))],
+        )
+        conn.exec_driver_sql(
+            "INSERT INTO approval_logs (request_id, approver_id, decision, timestamp) VALUES (?, 1, 'APPROVED', ?)",
+            [(next_id + i, s) for i, s in enumerate(stamps)],
+        )
+    return stamps[-1]
+
+def forecasts(db):
+    return dict(db.execute(select(ItemForecast.item_id, ItemForecast.consumption_rate)).all())
+
+def from_scratch(db, now):
+    """Forecast rates recomputed over the whole history, leaving the stored state as it was."""
+    saved = db.execute(select(ItemForecast.__table__)).mappings().all()
+    runs = db.execute(select(ForecastRun.__table__)).mappings().all()
+    db.execute(delete(ItemForecast))
+    db.execute(delete(ForecastRun))
+    ok, msg, _ = run_forecast(db, now=now, notify=False)
+    assert ok, msg
+    rates = forecasts(db)
+    db.execute(delete(ItemForecast))
+    db.execute(delete(ForecastRun))
+    if saved:
+        db.execute(ItemForecast.__table__.insert(), [dict(r) for r in saved])
+    db.execute(ForecastRun.__table__.insert(), [dict(r) for r in runs])
+    db.commit()
+    return rates
+
+# Also checked on every invocation: few approvals per item, so most decayed sums are tiny
+SMALL = argparse.Namespace(requests=20000, items=1000, new=500, runs=2)
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--requests", type=int, default=1000000)
+    parser.add_argument("--items", type=int, default=20000)
+    parser.add_argument("--new", type=int, default=2000, help="Approvals added before each incremental run")
+    parser.add_argument("--runs", type=int, default=3)
+    args = parser.parse_args()
+
+    for scale in (SMALL, args):
+        check(scale)
+    print("OK: incremental forecasts match full recomputes; alerts are sent once per at-risk item")
+
+def check(args):
+    with tempfile.TemporaryDirectory() as tmp:
+        engine = create_engine(f"sqlite:///{os.path.join(tmp, 'bench.db')}")
+        Base.metadata.create_all(bind=engine)
+        populate(engine, args.requests, items=args.items)
+        db = sessionmaker(bind=engine)()
+        try:
+            db.query(User).filter(User.id <= 2).update({User.role: UserRole.ADMIN, User.email: "admin@example.com"})
+            db.commit()
+            approvals = db.query(func.count(ApprovalLog.id)).filter(ApprovalLog.decision == "APPROVED").scalar()
+            now = db.query(func.max(ApprovalLog.timestamp)).scalar() + timedelta(hours=1)
+
+            (ok, msg, first), elapsed = timed(run_forecast, db, now)
+            assert ok, msg
+            assert first.approvals == approvals
+            alerts = db.query(OutboxMessage).count()
+            assert (alerts == 2) == bool(first.alerts), (alerts, first)
+            print(f"first run: {approvals:,} approvals of {args.requests:,} requests in {elapsed:.2f}s "
+                  f"({approvals / elapsed:,.0f}/s); {first.items:,} items, {first.at_risk:,} at risk, "
+                  f"{first.alerts:,} alerted")
+
+            for run in range(args.runs):
+                now = add_approvals(engine, args.new, now, 24, args.items, seed=run + 1) + timedelta(minutes=5)
+                (ok, msg, summary), elapsed = timed(run_forecast, db, now)
+                assert ok, msg
+                assert summary.approvals == args.new
+                incremental = forecasts(db)
+                expected = from_scratch(db, now)
+                assert incremental.keys() == expected.keys()
+                worst = max(abs(incremental[i] - expected[i]) / expected[i] for i in expected)
+                assert worst < 1e-9, worst
+                print(f"incremental run {run + 1}: {args.new:,} new approvals in {elapsed:.3f}s, "
+                      f"{summary.alerts:,} new alert(s); matches a full recompute (max rel. diff {worst:.1e})")
+
+            # Alerts go out once per item while it stays at risk
+            sent = db.query(OutboxMessage).count()
+            ok, msg, again = run_forecast(db, now + timedelta(minutes=1))
+            assert ok and again.approvals == 0 and again.alerts == 0 and db.query(OutboxMessage).count() == sent
+            alerted = db.query(ItemForecast).filter(ItemForecast.alerted_at.isnot(None)).count()
+            assert alerted == again.at_risk, (alerted, again)
+
+            # Another run commits while this one is computing: this one must not count the approvals again
+            load = forecast.iter_new_approvals
+            def racing_load(*a):
+                forecast.iter_new_approvals = load
+                other = sessionmaker(bind=engine)()
+                assert run_forecast(other, now + timedelta(minutes=2))[0]
+                other.close()
+                return load(*a)
+            forecast.iter_new_approvals = racing_load
+            runs = db.query(ForecastRun).count()
+            ok, msg, _ = run_forecast(db, now + timedelta(minutes=2))
+            assert not ok and db.query(ForecastRun).count() == runs + 1, msg
+        finally:
+            db.close()
+            engine.dispose()
+
+if __name__ == "__main__":
+    main()
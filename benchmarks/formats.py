@@ -0,0 +1,98 @@
+"""
+Inventory import throughput by file format (the same rows as .xlsx, CSV
+and Parquet through ingest_inventory_stream), and streaming exports of
+asset_requests against loading the whole table with pandas: time and
+peak Python memory. Also checks that every format ingests to the same
+inventory and that re-ingesting an export of it changes nothing.
+
+    python -m benchmarks.formats --rows 50000 --requests 1000000
+"""
+import argparse
+import os
+import tempfile
+import tracemalloc
+
+import pandas as pd
+import pyarrow.parquet as pq
+from sqlalchemy import create_engine
+from sqlalchemy.orm import sessionmaker
+
+from exports import export_table
+from audit import flush_audit
+from models import Base, InventoryItem
+from utils import ingest_inventory_stream
+from benchmarks.common import temp_session, synthetic_inventory_sheet, timed
+from benchmarks.indexes import populate
+from benchmarks.stream_ingest import write_sheet
+
+def peak_memory(fn, *args):
+    tracemalloc.start()
+    result, elapsed = timed(fn, *args)
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    return result, elapsed, peak
+
+def inventory(db):
+    return sorted(db.query(InventoryItem.model, InventoryItem.qty, InventoryItem.site, InventoryItem.content_hash))
+
+def compare_imports(tmp, rows):
+    df = synthetic_inventory_sheet(rows)
+    paths = {"xlsx": os.path.join(tmp, "inventory.xlsx")}
+    write_sheet(paths["xlsx"], rows)
+    paths["csv"] = os.path.join(tmp, "inventory.csv")
+    df.to_csv(paths["csv"], index=False)
+    paths["parquet"] = os.path.join(tmp, "inventory.parquet")
+    df.to_parquet(paths["parquet"], index=False)
+
+    results = {}
+    for fmt, path in paths.items():
+        with temp_session() as db:
+            (success, msg), elapsed = timed(ingest_inventory_stream, db, path)
+            assert success, msg
+            results[fmt] = inventory(db)
+        print(f"import {fmt:>7}: {rows / elapsed:9,.0f} rows/s ({elapsed:.2f}s)")
+    assert results["csv"] == results["xlsx"] == results["parquet"], "formats ingest differently"
+
+    # An exported inventory re-ingests as unchanged
+    with temp_session() as db:
+        ingest_inventory_stream(db, paths["parquet"])
+        for fmt in ("csv", "parquet"):
+            out = os.path.join(tmp, f"export.{fmt}")
+            export_table(db, "inventory_items", out, fmt)
+            success, msg = ingest_inventory_stream(db, out)
+            assert success and "Added 0, Updated 0" in msg, msg
+    print("OK: every format ingests to the same inventory; re-ingesting an export changes nothing")
+
+def compare_exports(tmp, requests):
+    engine = create_engine(f"sqlite:///{os.path.join(tmp, 'history.db')}")
+    Base.metadata.create_all(bind=engine)
+    populate(engine, requests)
+    db = sessionmaker(bind=engine)()
+    try:
+        _, elapsed, peak = peak_memory(lambda: pd.read_sql_table("asset_requests", engine))
+        print(f"read_sql_table (whole table): {elapsed:.2f}s, peak {peak / 2**20:,.1f} MiB")
+        for fmt in ("parquet", "csv"):
+            out = os.path.join(tmp, f"asset_requests.{fmt}")
+            count, elapsed, peak = peak_memory(export_table, db, "asset_requests", out, fmt)
+            assert count == requests
+            size = os.path.getsize(out)
+            print(f"export {fmt:>7}: {count / elapsed:9,.0f} rows/s ({elapsed:.2f}s), "
+                  f"peak {peak / 2**20:,.1f} MiB, file {size / 2**20:,.1f} MiB")
+        assert pq.ParquetFile(os.path.join(tmp, "asset_requests.parquet")).metadata.num_rows == requests
+    finally:
+        db.close()
+        flush_audit()
+        engine.dispose()
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--rows", type=int, default=50000)
+    parser.add_argument("--requests", type=int, default=1000000)
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmp:
+        compare_imports(tmp, args.rows)
+        compare_exports(tmp, args.requests)
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,82 @@
+"""
+Cold-start import cost of app.py and each page: the script's top-level
+imports are run in a fresh interpreter under `python -X importtime`, and
+the total plus the heaviest modules are reported (interpreter start-up
+imports excluded), along with which of the heavy dependencies got
+loaded. Medians over --repeat runs. Fails if the login page (app.py)
+loads a dependency only other features need.
+
+    python -m benchmarks.import_time [--repeat 5] [--json results.json]
+"""
+import argparse
+import ast
+import glob
+import json
+import os
+import statistics
+import subprocess
+import sys
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+ENTRY_POINTS = ["app.py"] + sorted(glob.glob("pages/*.py", root_dir=ROOT))
+# Loaded only by the features that use them; app.py (the login form) needs none
+HEAVY = ["pandas", "numpy", "pyarrow", "openpyxl", "smtplib", "email.mime.multipart", "bcrypt", "jinja2",
+         "sqlalchemy.dialects.sqlite"]
+
+def top_level_imports(path) -> str:
+    """The script's module-level import statements, as source."""
+    with open(os.path.join(ROOT, path)) as f:
+        source = f.read()
+    tree = ast.parse(source)
+    return "\n".join(ast.get_source_segment(source, node) for node in tree.body
+                     if isinstance(node, (ast.Import, ast.ImportFrom)))
+
+def profile(code: str, startup=frozenset()):
+    """
+    Runs `code` cold; returns ({top-level package: cumulative us}, total
+    us, loaded modules), leaving out the packages named in `startup`.
+    """
+    probe = code + "\nimport sys\nprint(' '.join(sys.modules))"
+    proc = subprocess.run([sys.executable, "-X", "importtime", "-c", probe], cwd=ROOT,
+                          capture_output=True, text=True, check=True)
+    packages = {}
+    for line in proc.stderr.splitlines():
+        if not line.startswith("import time:") or "|" not in line or "cumulative" in line:
+            continue
+        _, cumulative, name = line[len("import time:"):].split("|")
+        depth = len(name) - len(name.lstrip())
+        if depth == 1 and name.strip() not in startup:  # Imported by the script, cumulative covers its subtree
+            packages[name.strip()] = packages.get(name.strip(), 0) + int(cumulative)
+    return packages, sum(packages.values()), set(proc.stdout.split())
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--repeat", type=int, default=5)
+    parser.add_argument("--top", type=int, default=5)
+    parser.add_argument("--json", help="Also write the results to this file")
+    args = parser.parse_args()
+
+    startup = frozenset(profile("pass")[0])
+    results = {}
+    for entry in ENTRY_POINTS:
+        code = top_level_imports(entry)
+        runs = [profile(code, startup) for _ in range(args.repeat)]
+        total = statistics.median(r[1] for r in runs)
+        packages = {name: statistics.median(r[0].get(name, 0) for r in runs) for name in runs[0][0]}
+        loaded = [m for m in HEAVY if m in runs[0][2]]
+        heaviest = sorted(packages.items(), key=lambda kv: -kv[1])[:args.top]
+        results[entry] = {"total_ms": total / 1000, "heaviest_ms": {k: v / 1000 for k, v in heaviest}, "loaded": loaded}
+        print(f"{entry:<32} {total / 1000:7.0f} ms  "
+              + ", ".join(f"{k} {v / 1000:.0f}" for k, v in heaviest)
+              + f"  | loads: {' '.join(loaded) or '-'}")
+
+    if args.json:
+        with open(args.json, "w") as f:
+            json.dump(results, f, indent=2)
+
+    eager = results["app.py"]["loaded"]
+    assert not eager, f"app.py imports {', '.join(eager)} at start-up"
+    print("OK: the login page loads none of " + ", ".join(HEAVY))
+
+if __name__ == "__main__":
+    main()
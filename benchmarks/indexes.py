@@ -0,0 +1,112 @@
+"""
+Portal query times on a large asset_requests table without and with the
+indexes from models.py (created through migrations.upgrade_schema, the
+same path existing databases take).
+
+    python -m benchmarks.indexes --requests 1000000
+"""
+import argparse
+import os
+import statistics
+import tempfile
+import time
+from datetime import datetime, timedelta
+
+import numpy as np
+from sqlalchemy import create_engine
+from sqlalchemy.orm import sessionmaker
+
+from models import Base, InventoryItem, AssetRequest, ApprovalLog, AuditLog, RequestStatus
+from migrations import upgrade_schema
+
+def populate(engine, requests, users=2000, items=20000, seed=0):
+    rng = np.random.default_rng(seed)
+    start = datetime(2024, 1, 1)
+    created = [start + timedelta(seconds=int(s)) for s in np.sort(rng.integers(0, 86400 * 700, size=requests))]
+    statuses = rng.choice(["APPROVED", "REJECTED", "PENDING"], size=requests, p=[0.88, 0.10, 0.02])
+    user_ids = rng.integers(1, users + 1, size=requests)
+    item_ids = rng.integers(1, items + 1, size=requests)
+
+    with engine.begin() as conn:
+        conn.exec_driver_sql(
+            "INSERT INTO users (id, username, password_hash, role) VALUES (?, ?, 'x', ?)",
+            [(i, f"user{i}", "APPROVER" if i <= 20 else "REQUESTER") for i in range(1, users + 1)],
+        )
+        conn.exec_driver_sql(
+            "INSERT INTO inventory_items (id, model, qty) VALUES (?, ?, ?)",
+            [(i, f"MDL-{i:07d}", int(q)) for i, q in zip(range(1, items + 1), rng.integers(0, 50, size=items))],
+        )
+        conn.exec_driver_sql(
+            "INSERT INTO asset_requests (id, user_id, item_id, qty_requested, status, created_at) VALUES (?, ?, ?, 1, ?, ?)",
+            [(i + 1, int(u), int(it), s, c) for i, (u, it, s, c) in enumerate(zip(user_ids, item_ids, statuses, created))],
+        )
+        decided = np.flatnonzero(statuses != "PENDING")
+        conn.exec_driver_sql(
+            "INSERT INTO approval_logs (request_id, approver_id, decision, timestamp) VALUES (?, ?, ?, ?)",
+            [(int(i) + 1, int(rng.integers(1, 21)), statuses[i], created[i] + timedelta(hours=4)) for i in decided],
+        )
+        conn.exec_driver_sql(
+            "INSERT INTO audit_logs (action, actor, timestamp) VALUES ('INVENTORY_UPLOAD', 'SYSTEM', ?)",
+            [(c,) for c in created[::100]],
+        )
+
+def drop_indexes(engine):
+    with engine.begin() as conn:
+        for table in Base.metadata.sorted_tables:
+            for index in table.indexes:
+                index.drop(bind=conn, checkfirst=True)
+
+def page_queries(db):
+    # The queries the three portal pages run on every rerun
+    return {
+        "requester: available items": lambda: db.query(InventoryItem).filter(InventoryItem.qty > 0).all(),
+        "requester: my requests": lambda: db.query(AssetRequest).filter(AssetRequest.user_id == 42).order_by(AssetRequest.created_at.desc()).all(),
+        "approver: pending count": lambda: db.query(AssetRequest).filter(AssetRequest.status == RequestStatus.PENDING).count(),
+        "approver: first pending page": lambda: db.query(AssetRequest).filter(AssetRequest.status == RequestStatus.PENDING).order_by(AssetRequest.created_at, AssetRequest.id).limit(25).all(),
+        "approver: history": lambda: db.query(ApprovalLog).filter(ApprovalLog.approver_id == 7).order_by(ApprovalLog.timestamp.desc()).limit(50).all(),
+        "admin: audit logs": lambda: db.query(AuditLog).order_by(AuditLog.id.desc()).limit(100).all(),
+        "admin: audit logs by action": lambda: db.query(AuditLog).filter(AuditLog.action == "INVENTORY_UPLOAD").order_by(AuditLog.id.desc()).limit(100).all(),
+    }
+
+def time_queries(engine, repeat):
+    db = sessionmaker(bind=engine)()
+    results = {}
+    try:
+        for name, query in page_queries(db).items():
+            samples = []
+            for _ in range(repeat):
+                start = time.perf_counter()
+                query()
+                samples.append(time.perf_counter() - start)
+                db.expunge_all()
+            results[name] = statistics.median(samples)
+    finally:
+        db.close()
+    return results
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--requests", type=int, default=1_000_000)
+    parser.add_argument("--repeat", type=int, default=5)
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmp:
+        engine = create_engine(f"sqlite:///{os.path.join(tmp, 'bench.db')}")
+        Base.metadata.create_all(bind=engine)
+        drop_indexes(engine)
+        populate(engine, args.requests)
+
+        before = time_queries(engine, args.repeat)
+        start = time.perf_counter()
+        upgrade_schema(engine)
+        migrate_time = time.perf_counter() - start
+        after = time_queries(engine, args.repeat)
+        engine.dispose()
+
+    print(f"{args.requests:,} requests, migration took {migrate_time:.2f}s")
+    print(f"{'query':<30} {'before ms':>10} {'after ms':>10}")
+    for name in before:
+        print(f"{name:<30} {before[name] * 1000:>10.2f} {after[name] * 1000:>10.2f}")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,78 @@
+"""
+Rows/sec of the bulk inventory upsert against the original per-row loop.
+
+    python -m benchmarks.ingest --rows 20000
+"""
+import argparse
+
+import pandas as pd
+
+from models import InventoryItem
+from utils import upsert_inventory_frame
+from benchmarks.common import temp_session, synthetic_inventory_sheet, timed
+
+def legacy_upsert(db, df):
+    # The pre-bulk ingest loop: one SELECT per row
+    added_count = 0
+    updated_count = 0
+    for _, row in df.iterrows():
+        model_val = str(row.get("Model ", "")).strip()
+        if not model_val or model_val == "nan":
+            continue
+        existing_item = db.query(InventoryItem).filter(InventoryItem.model == model_val).first()
+        item_data = {
+            "type": row.get("Type"),
+            "manufacturer": row.get("Manufacturer"),
+            "model": model_val,
+            "description": row.get("Description"),
+            "sum_description": row.get("Sum-Description"),
+            "qty": int(row.get("QTY", 0)) if pd.notna(row.get("QTY")) else 0,
+            "head_configuration": str(row.get("Head Configuration")) if pd.notna(row.get("Head Configuration")) else None,
+            "dept": row.get("Dept"),
+            "status": row.get("Status"),
+            "area": row.get("Area"),
+            "location": row.get("Location"),
+            "site": row.get("Site")
+        }
+        if existing_item:
+            for key, value in item_data.items():
+                setattr(existing_item, key, value)
+            updated_count += 1
+        else:
+            db.add(InventoryItem(**item_data))
+            added_count += 1
+    return added_count, updated_count
+
+def run(upsert, df):
+    with temp_session() as db:
+        # First pass inserts, second pass updates everything (every row
+        # changes, unchanged rows would be skipped)
+        (added, _), insert_time = timed(upsert, db, df)
+        db.commit()
+        (_, updated), update_time = timed(upsert, db, df.assign(QTY=df["QTY"] + 1))
+        db.commit()
+    return {
+        "added": added,
+        "updated": updated,
+        "insert_rows_per_sec": len(df) / insert_time,
+        "update_rows_per_sec": len(df) / update_time,
+    }
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--rows", type=int, default=20000)
+    parser.add_argument("--skip-legacy", action="store_true")
+    args = parser.parse_args()
+
+    df = synthetic_inventory_sheet(args.rows)
+    variants = {"bulk": upsert_inventory_frame}
+    if not args.skip_legacy:
+        variants["legacy"] = legacy_upsert
+
+    for name, upsert in variants.items():
+        r = run(upsert, df)
+        print(f"{name:>7}: added={r['added']} updated={r['updated']} "
+              f"insert={r['insert_rows_per_sec']:,.0f} rows/s update={r['update_rows_per_sec']:,.0f} rows/s")
+
+if __name__ == "__main__":
+    main()
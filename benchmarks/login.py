@@ -0,0 +1,122 @@
+"""
+Login throughput during a spike: concurrent logins per bcrypt cost and
+bcrypt pool size, with the latency of an ordinary rerun (a short burst
+of Python work) measured alongside, then returning users resuming from a
+single-use session token. Also checks rehash-on-login when the cost policy changes.
+
+    python -m benchmarks.login --logins 64 --sessions 16
+"""
+import argparse
+import statistics
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+import bcrypt
+
+import auth
+from models import User, UserRole
+from benchmarks.common import temp_session
+
+PASSWORD = "correct horse"
+
+def set_policy(rounds, workers):
+    auth.BCRYPT_ROUNDS = rounds
+    auth.AUTH_WORKERS = workers
+    if auth._pool is not None:
+        auth._pool.shutdown()
+        auth._pool = None
+
+def add_users(db, count, rounds):
+    # One hash shared by every user: only the cost matters here
+    hashed = bcrypt.hashpw(PASSWORD.encode(), bcrypt.gensalt(rounds)).decode()
+    db.bulk_insert_mappings(User, [{"username": f"u{i}", "password_hash": hashed, "role": UserRole.REQUESTER}
+                                   for i in range(count)])
+    db.commit()
+
+def rerun_latencies(stop):
+    """Stand-in for other users' reruns: 2 ms of pure Python, every 10 ms."""
+    samples = []
+    while not stop.is_set():
+        start = time.perf_counter()
+        deadline = start + 0.002
+        while time.perf_counter() < deadline:
+            pass
+        samples.append(time.perf_counter() - start)
+        time.sleep(0.01)
+    return samples
+
+def login_spike(session_factory, logins, sessions):
+    def login(i):
+        db = session_factory()
+        try:
+            user = auth.authenticate_user(db, f"u{i % 100}", PASSWORD)
+            assert user is not None
+            return auth.issue_session_token(user)
+        finally:
+            db.close()
+
+    stop = threading.Event()
+    with ThreadPoolExecutor(max_workers=1) as probe:
+        latencies = probe.submit(rerun_latencies, stop)
+        start = time.perf_counter()
+        with ThreadPoolExecutor(max_workers=sessions) as spike:
+            tokens = list(spike.map(login, range(logins)))
+        elapsed = time.perf_counter() - start
+        stop.set()
+        samples = sorted(latencies.result())
+    p95 = samples[int(len(samples) * 0.95)] if samples else 0
+    return tokens, logins / elapsed, statistics.median(samples) * 1000 if samples else 0, p95 * 1000
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--logins", type=int, default=64)
+    parser.add_argument("--sessions", type=int, default=16, help="Concurrent login attempts")
+    parser.add_argument("--rounds", type=int, nargs="+", default=[10, 11, 12])
+    parser.add_argument("--workers", type=int, nargs="+", default=[1, 2, 4])
+    args = parser.parse_args()
+
+    with temp_session() as db:
+        factory = lambda: type(db)(bind=db.get_bind())
+        add_users(db, 100, min(args.rounds))
+        tokens = []
+        for rounds in args.rounds:
+            db.query(User).update({User.password_hash: bcrypt.hashpw(PASSWORD.encode(), bcrypt.gensalt(rounds)).decode()})
+            db.commit()
+            for workers in args.workers:
+                set_policy(rounds, workers)
+                tokens, rate, p50, p95 = login_spike(factory, args.logins, args.sessions)
+                print(f"cost {rounds}, {workers} bcrypt worker(s): {rate:7.1f} logins/s, "
+                      f"rerun latency p50 {p50:5.1f} ms, p95 {p95:6.1f} ms")
+
+        # Returning users on a new tab: the token replaces the password check, once
+        start = time.perf_counter()
+        fresh = []
+        for token in tokens:
+            resumed = auth.resume_session(db, token)
+            assert resumed
+            fresh.append(resumed[1])
+        rate = len(tokens) / (time.perf_counter() - start)
+        other = factory()  # Another process: only the database is shared
+        assert not any(auth.resume_session(other, token) for token in tokens), "token redeemed twice"
+        # Logout in one process ends the token everywhere
+        auth.revoke_session_token(db, fresh[0])
+        assert auth.resume_session(other, fresh[0]) is None and auth.resume_session(other, fresh[1])
+        # A tab replacing its aging token revokes the old one
+        replaced = auth.reissue_session_token(db, 1, previous=fresh[2])
+        assert auth.resume_session(other, fresh[2]) is None and auth.resume_session(other, replaced)
+        other.close()
+        print(f"session token resume: {rate:,.0f}/s (one lookup + HMAC + insert); "
+              "each token works once, logouts and replaced tokens apply to every process")
+
+        # Policy change: an old-cost hash is replaced on the next login, and only once
+        set_policy(min(args.rounds), 2)
+        db.query(User).update({User.password_hash: bcrypt.hashpw(PASSWORD.encode(), bcrypt.gensalt(max(args.rounds))).decode()})
+        db.commit()
+        user = auth.authenticate_user(db, "u1", PASSWORD)
+        assert not auth.needs_rehash(user.password_hash) and user.password_hash.startswith(f"$2b${min(args.rounds):02d}$")
+        assert auth.authenticate_user(db, "u1", PASSWORD) and auth.authenticate_user(db, "u1", "wrong") is None
+        print("OK: outdated hashes are rehashed to the current cost on login")
+
+if __name__ == "__main__":
+    main()
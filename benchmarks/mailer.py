@@ -0,0 +1,50 @@
+"""
+Emails/sec against the local SMTP sink: one connection per email (the
+old send_email_notification) versus the pooled transport.
+
+    python -m benchmarks.mailer --messages 500
+"""
+import argparse
+import smtplib
+from email.mime.text import MIMEText
+
+from mailer import MailTransport
+from benchmarks.common import timed
+from benchmarks.smtp_sink import SMTPSink
+
+def per_connection(config, messages):
+    for m in messages:
+        server = smtplib.SMTP(config["server"], config["port"])
+        msg = MIMEText(m["body"])
+        msg["From"], msg["To"], msg["Subject"] = config["email"], m["to_email"], m["subject"]
+        server.send_message(msg)
+        server.quit()
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--messages", type=int, default=500)
+    args = parser.parse_args()
+
+    sink = SMTPSink().start()
+    config = {"server": "127.0.0.1", "port": sink.port, "email": "sink@example.com",
+              "password": None, "use_tls": False}
+    messages = [{"to_email": f"user{i}@example.com", "subject": "Request Approved", "body": f"Body {i}"}
+                for i in range(args.messages)]
+
+    def pooled_single(transport):
+        for m in messages:
+            transport.send(m["to_email"], m["subject"], m["body"])
+
+    variants = [
+        ("per-email connection", lambda: per_connection(config, messages)),
+        ("pooled send()", lambda: pooled_single(MailTransport(config))),
+        ("pooled send_many()", lambda: MailTransport(config).send_many(messages)),
+    ]
+    for name, run in variants:
+        before = sink.connections
+        _, elapsed = timed(run)
+        print(f"{name:<22} {args.messages / elapsed:>8,.0f} emails/s over {sink.connections - before} connections")
+    sink.shutdown()
+
+if __name__ == "__main__":
+    main()
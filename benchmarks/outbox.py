@@ -0,0 +1,59 @@
+"""
+Outbox delivery throughput against the local SMTP sink, with every Nth
+send failing once so retries are exercised.
+
+    python -m benchmarks.outbox --messages 500
+"""
+import argparse
+import os
+import threading
+
+from sqlalchemy import func
+
+import outbox
+from models import OutboxMessage, OutboxStatus
+from benchmarks.common import temp_session, timed
+from benchmarks.smtp_sink import SMTPSink
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--messages", type=int, default=500)
+    parser.add_argument("--fail-every", type=int, default=10)
+    args = parser.parse_args()
+
+    sink = SMTPSink(fail_every=args.fail_every).start()
+    os.environ.update({
+        "SMTP_SERVER": "127.0.0.1", "SMTP_PORT": str(sink.port),
+        "SMTP_USE_TLS": "false", "SMTP_EMAIL": "sink@example.com", "SMTP_PASSWORD": "",
+    })
+    # Retry immediately instead of waiting out the backoff
+    outbox.BACKOFF_BASE_SECONDS = 0
+
+    with temp_session() as db:
+        for i in range(args.messages):
+            outbox.enqueue_notification(db, f"user{i}@example.com", "Request Approved", f"Body {i}")
+        db.commit()
+
+        Session = lambda: type(db)(bind=db.get_bind())
+        stop = threading.Event()
+
+        def drain():
+            worker = threading.Thread(target=outbox.run_outbox_worker, args=(Session, 0.05, stop))
+            worker.start()
+            while db.query(OutboxMessage).filter(OutboxMessage.status == OutboxStatus.PENDING).count():
+                stop.wait(0.05)
+            stop.set()
+            worker.join()
+
+        _, elapsed = timed(drain)
+        counts = dict(db.query(OutboxMessage.status, func.count()).group_by(OutboxMessage.status).all())
+        retried = db.query(OutboxMessage).filter(OutboxMessage.attempts > 1).count()
+
+    sink.shutdown()
+    sent = counts.get(OutboxStatus.SENT, 0)
+    print(f"{sent}/{args.messages} sent in {elapsed:.2f}s ({sent / elapsed:,.0f} msg/s), "
+          f"{retried} retried, {len(sink.messages)} received by sink over {sink.connections} connections")
+    assert sent == args.messages == len(sink.messages)
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,95 @@
+"""
+Counts SQL statements per page render with Streamlit's AppTest harness
+and checks the count does not grow with the number of requests shown.
+
+    python -m benchmarks.page_statements
+"""
+import argparse
+import os
+import tempfile
+import threading
+from datetime import datetime, timedelta
+
+BACKGROUND_THREADS = {"digest-scheduler", "outbox-worker", "audit-flusher"}
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+PAGES = {
+    "Requester Portal": ("pages/1_Requester_Portal.py", {"id": 3, "username": "user", "role": "REQUESTER"}),
+    "Approver Portal": ("pages/2_Approver_Portal.py", {"id": 2, "username": "manager", "role": "APPROVER"}),
+    "Admin Console": ("pages/3_Admin_Console.py", {"id": 1, "username": "admin", "role": "ADMIN"}),
+    "Analytics": ("pages/4_Analytics.py", {"id": 2, "username": "manager", "role": "APPROVER"}),
+}
+
+def seed(db, requests):
+    from models import User, UserRole, InventoryItem, AssetRequest, ApprovalLog, AuditLog, RequestStatus
+    from stats import rebuild_stats
+
+    db.add_all([
+        User(id=1, username="admin", password_hash="x", role=UserRole.ADMIN),
+        User(id=2, username="manager", password_hash="x", role=UserRole.APPROVER),
+        User(id=3, username="user", password_hash="x", role=UserRole.REQUESTER),
+    ])
+    db.add_all([User(id=10 + i, username=f"req{i}", password_hash="x") for i in range(requests)])
+    db.add_all([InventoryItem(id=i + 1, model=f"MDL-{i}", manufacturer="MFR", qty=10) for i in range(requests)])
+    start = datetime(2024, 1, 1)
+    for i in range(requests):
+        db.add(AssetRequest(id=2 * i + 1, user_id=10 + i, item_id=i + 1, qty_requested=1,
+                            status=RequestStatus.PENDING, created_at=start + timedelta(minutes=i)))
+        db.add(AssetRequest(id=2 * i + 2, user_id=3, item_id=i + 1, qty_requested=1,
+                            status=RequestStatus.APPROVED, created_at=start + timedelta(minutes=i)))
+        db.add(ApprovalLog(request_id=2 * i + 2, approver_id=2, decision="APPROVED"))
+        db.add(AuditLog(action="INVENTORY_UPLOAD", actor="SYSTEM"))
+    db.flush()
+    # Rows above bypass the portals, so derive the dashboard summaries once
+    rebuild_stats(db)
+    db.commit()
+
+def count_statements(requests):
+    """Renders every page against a fresh database holding `requests` requests."""
+    from sqlalchemy import create_engine, event
+    from sqlalchemy.orm import sessionmaker
+    from streamlit.testing.v1 import AppTest
+    import database
+
+    counts = {}
+    with tempfile.TemporaryDirectory() as tmp:
+        engine = create_engine(f"sqlite:///{os.path.join(tmp, 'bench.db')}", connect_args={"check_same_thread": False})
+        database.engine = engine
+        database.SessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=engine)
+        database.init_db()
+        db = database.SessionLocal()
+        seed(db, requests)
+        db.close()
+
+        statements = []
+        def before_execute(*args):
+            # Background workers a page starts (e.g. the digest scheduler) aren't part of its render
+            if threading.current_thread().name not in BACKGROUND_THREADS:
+                statements.append(args[2])
+        event.listen(engine, "before_cursor_execute", before_execute)
+        for name, (path, user) in PAGES.items():
+            at = AppTest.from_file(os.path.join(ROOT, path), default_timeout=60)
+            at.session_state["user"] = user
+            statements.clear()
+            at.run()
+            assert not at.exception, at.exception
+            counts[name] = len(statements)
+        engine.dispose()
+    return counts
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--small", type=int, default=5)
+    parser.add_argument("--large", type=int, default=200)
+    args = parser.parse_args()
+
+    small = count_statements(args.small)
+    large = count_statements(args.large)
+    for name in PAGES:
+        print(f"{name:<18} {args.small:>5} requests: {small[name]:>3} statements | "
+              f"{args.large:>5} requests: {large[name]:>3} statements")
+    assert small == large, "statement count grows with the number of requests (N+1 query)"
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,54 @@
+"""
+Search index build time and query latency over a large synthetic
+catalog (prefix, multi-term and misspelled queries).
+
+    python -m benchmarks.search --items 50000
+"""
+import argparse
+import statistics
+import time
+
+import numpy as np
+
+from search import SearchIndex
+from benchmarks.common import timed
+
+WORDS = ["conveyor", "reflow", "oven", "dispensing", "screwing", "router", "charger", "refrigerator",
+         "inspection", "drilling", "soldering", "microscope", "analyzer", "loader", "printer"]
+QUERIES = ["conv", "reflow oven", "dispensng", "MDL-0012", "mfr-42 router", "sez charger", "microscop", "zzz"]
+
+def synthetic_docs(items, seed=0):
+    rng = np.random.default_rng(seed)
+    words = np.array(WORDS)
+    sites = np.array(["DTA", "DTA-2", "SEZ"])
+    for i in range(1, items + 1):
+        a, b = words[rng.integers(0, len(words), size=2)]
+        yield i, {
+            "model": f"MDL-{i:07d}",
+            "manufacturer": f"MFR-{i % 500}",
+            "type": "Machine",
+            "description": f"{a.title()} {b}",
+            "sum_description": a.title(),
+            "location": "Warehouse",
+            "site": sites[i % 3],
+        }
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--items", type=int, default=50000)
+    parser.add_argument("--repeat", type=int, default=20)
+    args = parser.parse_args()
+
+    index, build = timed(SearchIndex, synthetic_docs(args.items))
+    print(f"built index over {args.items:,} items in {build:.2f}s ({len(index.tokens):,} tokens)")
+    for query in QUERIES:
+        samples = []
+        for _ in range(args.repeat):
+            start = time.perf_counter()
+            hits = index.search(query, limit=20)
+            samples.append(time.perf_counter() - start)
+        print(f"{query!r:<16} {len(hits):>3} hits  p50 {statistics.median(samples) * 1000:7.2f} ms  "
+              f"max {max(samples) * 1000:7.2f} ms")
+
+if __name__ == "__main__":
+    main()
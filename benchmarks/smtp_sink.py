@@ -0,0 +1,99 @@
+"""
+Minimal local SMTP server that accepts and counts messages, for testing
+mail delivery offline. Optionally fails every Nth delivery attempt with a 451 to
+exercise retries.
+
+    python -m benchmarks.smtp_sink --port 8025
+
+Point the app at it with SMTP_SERVER=localhost SMTP_PORT=8025
+SMTP_USE_TLS=false SMTP_EMAIL=sink@example.com (no password).
+"""
+import argparse
+import socketserver
+import threading
+
+class SMTPSink(socketserver.ThreadingTCPServer):
+    daemon_threads = True
+    allow_reuse_address = True
+
+    def __init__(self, address=("127.0.0.1", 0), fail_every: int = 0):
+        super().__init__(address, _SMTPHandler)
+        self.fail_every = fail_every
+        self.messages = []
+        self.attempts = 0
+        self.connections = 0
+        self.lock = threading.Lock()
+
+    @property
+    def port(self):
+        return self.server_address[1]
+
+    def start(self):
+        threading.Thread(target=self.serve_forever, daemon=True).start()
+        return self
+
+    def accept(self, mail_from, rcpt_to, data):
+        with self.lock:
+            self.attempts += 1
+            if self.fail_every and self.attempts % self.fail_every == 0:
+                return False
+            self.messages.append((mail_from, rcpt_to, data))
+            return True
+
+class _SMTPHandler(socketserver.StreamRequestHandler):
+    def reply(self, line):
+        self.wfile.write(line.encode() + b"\r\n")
+
+    def handle(self):
+        with self.server.lock:
+            self.server.connections += 1
+        self.reply("220 smtp-sink ready")
+        mail_from, rcpt_to = None, []
+        while True:
+            line = self.rfile.readline()
+            if not line:
+                return
+            command = line.decode(errors="replace").strip()
+            verb = command[:4].upper()
+            if verb in ("HELO", "EHLO"):
+                self.reply("250 smtp-sink")
+            elif verb == "MAIL":
+                mail_from, rcpt_to = command[10:], []
+                self.reply("250 OK")
+            elif verb == "RCPT":
+                rcpt_to.append(command[8:])
+                self.reply("250 OK")
+            elif verb == "DATA":
+                self.reply("354 End data with <CR><LF>.<CR><LF>")
+                data = []
+                for raw in self.rfile:
+                    if raw in (b".\r\n", b".\n"):
+                        break
+                    data.append(raw)
+                if self.server.accept(mail_from, rcpt_to, b"".join(data)):
+                    self.reply("250 OK queued")
+                else:
+                    self.reply("451 Temporary failure, try again")
+            elif verb in ("RSET", "NOOP"):
+                self.reply("250 OK")
+            elif verb == "QUIT":
+                self.reply("221 Bye")
+                return
+            else:
+                self.reply("502 Command not implemented")
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--port", type=int, default=8025)
+    parser.add_argument("--fail-every", type=int, default=0)
+    args = parser.parse_args()
+
+    sink = SMTPSink(("127.0.0.1", args.port), fail_every=args.fail_every)
+    print(f"SMTP sink listening on 127.0.0.1:{sink.port}, Ctrl+C to stop.")
+    try:
+        sink.serve_forever()
+    except KeyboardInterrupt:
+        print(f"Received {len(sink.messages)} messages over {sink.connections} connections.")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,101 @@
+"""
+Concurrent approval stress check: many threads approve requests for the
+same few items (each thread with its own session, as Streamlit workers
+have) and the run asserts stock is never oversold and no request is
+decided twice.
+
+    python -m benchmarks.stock_stress --threads 16 --requests 400
+"""
+import argparse
+import os
+import random
+import tempfile
+import threading
+from collections import Counter
+
+from sqlalchemy import create_engine, func
+from sqlalchemy.orm import sessionmaker
+
+from models import Base, User, UserRole, InventoryItem, AssetRequest, ApprovalLog, RequestStatus
+from approvals import decide_requests
+from audit import flush_audit
+from benchmarks.common import timed
+
+def seed(Session, items, stock, requests):
+    db = Session()
+    db.add(User(id=1, username="approver", password_hash="x", role=UserRole.APPROVER))
+    db.add(User(id=2, username="requester", password_hash="x", email="r@example.com"))
+    db.add_all([InventoryItem(id=i, model=f"MDL-{i}", qty=stock) for i in range(1, items + 1)])
+    db.add_all([
+        AssetRequest(id=r, user_id=2, item_id=random.randint(1, items), qty_requested=random.randint(1, 3),
+                     status=RequestStatus.PENDING)
+        for r in range(1, requests + 1)
+    ])
+    db.commit()
+    db.close()
+
+def approver(Session, request_ids, batch, outcomes):
+    db = Session()
+    try:
+        for start in range(0, len(request_ids), batch):
+            success, msg = decide_requests(db, request_ids[start:start + batch], 1, RequestStatus.APPROVED,
+                                              skip_short=True)
+            outcomes["committed" if success else "refused"] += 1
+    finally:
+        db.close()
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--threads", type=int, default=16)
+    parser.add_argument("--requests", type=int, default=400)
+    parser.add_argument("--items", type=int, default=5)
+    parser.add_argument("--stock", type=int, default=60)
+    parser.add_argument("--batch", type=int, default=3)
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmp:
+        engine = create_engine(f"sqlite:///{os.path.join(tmp, 'stress.db')}",
+                               connect_args={"check_same_thread": False, "timeout": 30})
+        Base.metadata.create_all(bind=engine)
+        Session = sessionmaker(autocommit=False, autoflush=False, bind=engine)
+        seed(Session, args.items, args.stock, args.requests)
+
+        # Every thread works through all requests in its own order, so the
+        # same request is regularly approved by several threads at once
+        outcomes = Counter()
+        ids = list(range(1, args.requests + 1))
+        threads = []
+        for _ in range(args.threads):
+            order = ids[:]
+            random.shuffle(order)
+            threads.append(threading.Thread(target=approver, args=(Session, order, args.batch, outcomes)))
+
+        def run():
+            for t in threads:
+                t.start()
+            for t in threads:
+                t.join()
+
+        _, elapsed = timed(run)
+
+        db = Session()
+        for item in db.query(InventoryItem):
+            approved = db.query(func.coalesce(func.sum(AssetRequest.qty_requested), 0)).filter(
+                AssetRequest.item_id == item.id, AssetRequest.status == RequestStatus.APPROVED).scalar()
+            assert item.qty >= 0, f"item {item.id} oversold: qty={item.qty}"
+            assert item.qty + approved == args.stock, f"item {item.id}: qty {item.qty} + approved {approved} != {args.stock}"
+
+        decisions = dict(db.query(ApprovalLog.request_id, func.count()).group_by(ApprovalLog.request_id).all())
+        assert all(n == 1 for n in decisions.values()), "a request was decided more than once"
+        approved_count = db.query(AssetRequest).filter(AssetRequest.status == RequestStatus.APPROVED).count()
+        assert approved_count > 0, "no approval went through"
+        db.close()
+        flush_audit()
+        engine.dispose()
+
+    print(f"{args.threads} threads, {sum(outcomes.values())} decision calls in {elapsed:.2f}s; "
+          f"{approved_count} approved; outcomes: {dict(outcomes)}")
+    print("OK: no oversold items, no double decisions")
+
+if __name__ == "__main__":
+    main()
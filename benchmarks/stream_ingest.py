@@ -0,0 +1,81 @@
+"""
+Peak Python memory of ingest_inventory_excel (whole-sheet read) against
+ingest_inventory_stream (openpyxl read-only, chunked commits), then a
+check that the stream's peak doesn't grow with the file: CSV uploads of
+--rows and 4x as many rows, into an empty database and again as a full
+export over the items they wrote, must peak at about the same memory.
+
+    python -m benchmarks.stream_ingest --rows 50000
+"""
+import argparse
+import os
+import tempfile
+import tracemalloc
+
+from openpyxl import Workbook
+
+from utils import ingest_inventory_excel, ingest_inventory_stream
+from benchmarks.common import temp_session, synthetic_inventory_sheet, timed
+
+# Allowed growth of the stream's peak from --rows to 4x as many rows
+SCALING_TOLERANCE = 1.25
+
+def write_sheet(path, rows):
+    df = synthetic_inventory_sheet(rows)
+    wb = Workbook(write_only=True)
+    ws = wb.create_sheet()
+    ws.append(list(df.columns))
+    for row in df.itertuples(index=False):
+        ws.append([None if v is None else (v.item() if hasattr(v, "item") else v) for v in row])
+    wb.save(path)
+
+def traced(ingest, db, path, **kwargs):
+    tracemalloc.start()
+    (success, msg), elapsed = timed(ingest, db, path, **kwargs)
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    assert success, msg
+    return elapsed, peak
+
+def measure(ingest, path, **kwargs):
+    with temp_session() as db:
+        return traced(ingest, db, path, **kwargs)
+
+def stream_peaks(path, chunk_size):
+    """Peaks of a first upload of `path` and of a full-export re-upload over it."""
+    with temp_session() as db:
+        _, first = traced(ingest_inventory_stream, db, path, chunk_size=chunk_size)
+        _, again = traced(ingest_inventory_stream, db, path, chunk_size=chunk_size, full_export=True)
+    return first, again
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--rows", type=int, default=50000)
+    parser.add_argument("--chunk-size", type=int, default=5000)
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmp:
+        path = os.path.join(tmp, "inventory.xlsx")
+        write_sheet(path, args.rows)
+
+        for name, ingest, kwargs in [
+            ("excel", ingest_inventory_excel, {}),
+            ("stream", ingest_inventory_stream, {"chunk_size": args.chunk_size}),
+        ]:
+            elapsed, peak = measure(ingest, path, **kwargs)
+            print(f"{name:>6}: {args.rows / elapsed:,.0f} rows/s, peak {peak / 2**20:,.1f} MiB")
+
+        peaks = {}
+        for rows in (args.rows, args.rows * 4):
+            path = os.path.join(tmp, f"inventory-{rows}.csv")
+            synthetic_inventory_sheet(rows).to_csv(path, index=False)
+            peaks[rows] = stream_peaks(path, args.chunk_size)
+            print(f"stream csv {rows:>9,} rows: peak {peaks[rows][0] / 2**20:,.1f} MiB, "
+                  f"full-export re-upload {peaks[rows][1] / 2**20:,.1f} MiB")
+        small, large = peaks.values()
+        for kind, before, after in zip(("upload", "re-upload"), small, large):
+            assert after <= before * SCALING_TOLERANCE, f"{kind} peak grew from {before:,} to {after:,} bytes"
+    print("OK: streaming ingest peaks at the same memory however many rows the file has")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,80 @@
+"""
+Upgrade of the shipped database followed by a re-upload of the shipped
+sheet: upgrade_schema merges items repeating a natural key without
+losing stock or requests, and re-ingesting Inventory_dataset.xlsx then
+leaves every item of the sheet at exactly the sheet's quantity.
+Works on a copy; data/inventory.db is never touched.
+
+    python -m benchmarks.upgrade
+"""
+import argparse
+import os
+import shutil
+import tempfile
+
+from sqlalchemy import text
+from sqlalchemy.orm import sessionmaker
+
+from audit import flush_audit
+from database import create_db_engine
+from migrations import upgrade_schema
+from utils import collapse_inventory_items, ingest_inventory_excel, read_inventory_file
+from validation import item_keys, validate_inventory_frame
+from benchmarks.common import timed
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+def snapshot(conn):
+    return conn.execute(text(
+        "SELECT COUNT(*), COALESCE(SUM(qty), 0), "
+        "(SELECT COUNT(*) FROM asset_requests WHERE item_id NOT IN (SELECT id FROM inventory_items)), "
+        "(SELECT COUNT(*) FROM (SELECT 1 FROM inventory_items GROUP BY model, site, location HAVING COUNT(*) > 1)) "
+        "FROM inventory_items"
+    )).one()
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--database", default=os.path.join(ROOT, "data", "inventory.db"))
+    parser.add_argument("--sheet", default=os.path.join(ROOT, "Inventory_dataset.xlsx"))
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmp:
+        path = os.path.join(tmp, "inventory.db")
+        shutil.copy(args.database, path)
+        engine = create_db_engine(f"sqlite:///{path}")
+        try:
+            with engine.connect() as conn:
+                items, stock, orphans, duplicates = snapshot(conn)
+            (_, _, merged, _), elapsed = timed(upgrade_schema, engine)
+            with engine.connect() as conn:
+                after = snapshot(conn)
+            removed = sum(len(ids) for ids in merged.values())
+            assert after == (items - removed, stock, orphans, 0), (after, items, removed, stock, orphans)
+            assert upgrade_schema(engine)[2] == {}, "second upgrade merged again"
+            print(f"upgrade: {duplicates} duplicated key(s) merged ({removed} rows into {len(merged)}) in {elapsed:.2f}s; "
+                  f"stock {stock} and requests kept")
+
+            # The sheet's own totals per item, as ingest collapses them
+            sheet = collapse_inventory_items(validate_inventory_frame(read_inventory_file(args.sheet)).items)
+            expected = dict(zip(item_keys(sheet), sheet["qty"]))
+            db = sessionmaker(bind=engine)()
+            try:
+                success, msg = ingest_inventory_excel(db, args.sheet)
+                assert success, msg
+                stored = {}
+                for model, site, location, qty in db.execute(text("SELECT model, site, location, qty FROM inventory_items")):
+                    stored[(model, site, location)] = qty
+            finally:
+                db.close()
+            wrong = {k: (stored.get(k), q) for k, q in expected.items() if stored.get(k) != q}
+            assert not wrong, list(wrong.items())[:5]
+            total = sum(stored[k] for k in expected)
+            assert total == sum(expected.values())
+            print(f"re-ingest: {msg} {len(expected)} items at the sheet's quantities ({total} units)")
+        finally:
+            flush_audit()  # Before the file goes away
+            engine.dispose()
+    print("OK: the upgrade merges duplicates without losing stock; re-ingesting the sheet reproduces its totals")
+
+if __name__ == "__main__":
+    main()
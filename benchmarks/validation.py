@@ -0,0 +1,44 @@
+"""
+Validation time of a raw inventory sheet with injected bad rows (missing
+models, non-numeric, fractional and negative quantities, duplicate
+models, messy headers), checking every bad row is reported.
+
+    python -m benchmarks.validation --rows 100000
+"""
+import argparse
+
+import numpy as np
+
+from validation import validate_inventory_frame
+from benchmarks.common import synthetic_inventory_sheet, timed
+
+def messy_sheet(rows, seed=0):
+    df = synthetic_inventory_sheet(rows, unique_models=int(rows * 0.9), seed=seed)
+    df = df.rename(columns={"Model ": " MODEL", "QTY": "Quantity", "Sum-Description": "sum description"})
+    df["Quantity"] = df["Quantity"].astype(object)
+    rng = np.random.default_rng(seed)
+    bad = rng.choice(rows, size=rows // 100 * 4, replace=False).reshape(4, -1)
+    df.loc[bad[0], " MODEL"] = "  "
+    df.loc[bad[1], "Quantity"] = "n/a pcs"
+    df.loc[bad[2], "Quantity"] = 2.5
+    df.loc[bad[3], "Quantity"] = -3
+    return df, {"Model is missing": len(bad[0]), "QTY is not a number": len(bad[1]),
+                "QTY is not a whole number": len(bad[2]), "QTY is negative": len(bad[3])}
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--rows", type=int, default=100000)
+    args = parser.parse_args()
+
+    df, expected = messy_sheet(args.rows)
+    report, elapsed = timed(validate_inventory_frame, df)
+    found = report.errors["Error"].value_counts().to_dict()
+    print(f"validated {args.rows:,} rows in {elapsed:.3f}s: {len(report.items):,} valid, "
+          f"{len(report.errors):,} rejected, {report.duplicates:,} duplicate models, unknown columns {report.unknown_columns}")
+    assert found == expected, (found, expected)
+    assert len(report.items) + len(report.errors) == args.rows
+    assert not report.missing_columns
+    print("OK: every injected bad row reported")
+
+if __name__ == "__main__":
+    main()
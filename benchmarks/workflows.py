@@ -0,0 +1,278 @@
+"""
+End-to-end timings of the portal workflows at several data sizes, for
+comparing commits. Each scale gets a fresh database of synthetic users,
+items, requests, approvals and audit entries (benchmarks.indexes.populate),
+then times, headlessly:
+
+  - the core operations called directly: Excel ingest, catalog load,
+    pending queue, request history and audit view;
+  - every page rendered through Streamlit's AppTest harness (first render
+    and reruns, with the statements and SQL time per rerun from metrics.py);
+  - approving from the Approver Portal, one request and a whole page.
+
+Results go to a JSON file; --compare prints the change against an earlier
+one and exits non-zero if anything got slower than --tolerance allows.
+
+    python -m benchmarks.workflows --scales 10000 100000 1000000 --json results.json
+    python -m benchmarks.workflows --scales 10000 --compare results.json
+"""
+import argparse
+import io
+import json
+import os
+import platform
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+from datetime import datetime
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+PAGES = {
+    "Requester Portal": ("pages/1_Requester_Portal.py", "requester"),
+    "Approver Portal": ("pages/2_Approver_Portal.py", "approver"),
+    "Admin Console": ("pages/3_Admin_Console.py", "admin"),
+    "Analytics": ("pages/4_Analytics.py", "approver"),
+}
+# Users populate() creates: ids 1-20 are approvers, the rest requesters
+USERS = {
+    "admin": {"id": 1, "username": "user1", "role": "ADMIN"},
+    "approver": {"id": 2, "username": "user2", "role": "APPROVER"},
+    "requester": {"id": 42, "username": "user42", "role": "REQUESTER"},
+}
+
+def summarize(samples):
+    """Milliseconds: median and 95th percentile of the samples (seconds)."""
+    ordered = sorted(samples)
+    return {
+        "median_ms": round(statistics.median(ordered) * 1000, 3),
+        "p95_ms": round(ordered[min(len(ordered) - 1, int(len(ordered) * 0.95))] * 1000, 3),
+        "runs": len(ordered),
+    }
+
+def measure(fn, repeat):
+    samples = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        fn()
+        samples.append(time.perf_counter() - start)
+    return summarize(samples)
+
+def build_database(engine, scale, seed=0):
+    """Synthetic data for `scale` requests, with enough stock that approvals go through."""
+    from models import Base
+    from stats import rebuild_stats
+    from sqlalchemy.orm import sessionmaker
+    from benchmarks.indexes import populate
+
+    Base.metadata.create_all(bind=engine)
+    populate(engine, scale, users=max(100, min(scale // 50, 20000)), items=max(100, min(scale // 5, 50000)), seed=seed)
+    with engine.begin() as conn:
+        conn.exec_driver_sql("UPDATE users SET role = 'ADMIN' WHERE id = ?", (USERS["admin"]["id"],))
+        conn.exec_driver_sql("UPDATE inventory_items SET qty = qty + 1000")
+    db = sessionmaker(bind=engine)()
+    try:
+        # populate() writes around the portals, so derive the dashboard summaries once
+        rebuild_stats(db)
+        db.commit()
+    finally:
+        db.close()
+
+def time_operations(db, ingest_rows, repeat):
+    from catalog import get_catalog, invalidate_catalog
+    from queries import count_pending_requests, get_audit_page, get_pending_page, get_user_requests
+    from utils import ingest_inventory_excel
+    from benchmarks.common import synthetic_inventory_sheet
+
+    def catalog_load():
+        invalidate_catalog()
+        get_catalog(db)
+
+    results = {
+        "catalog load": measure(catalog_load, repeat),
+        "pending queue": measure(lambda: (count_pending_requests(db), get_pending_page(db)), repeat),
+        "request history": measure(lambda: get_user_requests(db, USERS["requester"]["id"]), repeat),
+        "audit view": measure(lambda: get_audit_page(db), repeat),
+    }
+    db.expunge_all()
+
+    # Half the sheet updates existing models (MDL-0000000...), half adds new ones
+    sheet = synthetic_inventory_sheet(ingest_rows, seed=1)
+    sheet["Model "] = [f"MDL-{i:07d}" for i in range(1, ingest_rows // 2 + 1)] + \
+        [f"NEW-{i:07d}" for i in range(ingest_rows - ingest_rows // 2)]
+    workbook = io.BytesIO()
+    sheet.to_excel(workbook, index=False)
+    workbook.seek(0)
+    start = time.perf_counter()
+    success, msg = ingest_inventory_excel(db, workbook, user_id=USERS["admin"]["id"])
+    elapsed = time.perf_counter() - start
+    assert success, msg
+    results["excel ingest"] = {**summarize([elapsed]), "rows": ingest_rows,
+                               "rows_per_s": round(ingest_rows / elapsed)}
+    return results
+
+def time_pages(repeat):
+    """Page runs, with the statements and SQL time per rerun the page's own instrumentation recorded."""
+    from streamlit.testing.v1 import AppTest
+    from metrics import page_summary, reset_metrics
+
+    results = {}
+    for name, (path, user) in PAGES.items():
+        at = AppTest.from_file(os.path.join(ROOT, path), default_timeout=300)
+        at.session_state["user"] = USERS[user]
+        start = time.perf_counter()
+        at.run()
+        first = time.perf_counter() - start
+        assert not at.exception, (name, at.exception)
+        reset_metrics()
+        results[name] = {**measure(at.run, repeat), "first_ms": round(first * 1000, 3)}
+        assert not at.exception, (name, at.exception)
+        recorded = next(row for row in page_summary() if row["Page"] == name)
+        results[name].update(statements=recorded["Statements/run"], sql_ms=round(recorded["SQL ms/run"], 3))
+    return results
+
+def time_approvals(repeat):
+    """Approve buttons on the Approver Portal; each click includes the page's rerun afterwards."""
+    from streamlit.testing.v1 import AppTest
+    import database
+    from models import ApprovalLog
+
+    def approved():
+        db = database.SessionLocal()
+        try:
+            return db.query(ApprovalLog).count()
+        finally:
+            db.close()
+
+    def button(at, label):
+        return next(b for b in at.button if b.label == label)
+
+    at = AppTest.from_file(os.path.join(ROOT, PAGES["Approver Portal"][0]), default_timeout=300)
+    at.session_state["user"] = USERS["approver"]
+    at.run()
+    before = approved()
+    samples = []
+    for _ in range(repeat):
+        click = button(at, "✅ Approve").click()
+        start = time.perf_counter()
+        click.run()
+        samples.append(time.perf_counter() - start)
+        assert not at.exception and not at.error, (at.exception, [e.value for e in at.error])
+    results = {"approve one": summarize(samples)}
+
+    # Select all: every request on the page
+    selected = sum(1 for b in at.button if b.label == "✅ Approve")
+    at.checkbox(key="batch_select_all").check().run()
+    click = button(at, "✅ Approve Selected").click()
+    start = time.perf_counter()
+    click.run()
+    elapsed = time.perf_counter() - start
+    assert not at.exception and not at.error, (at.exception, [e.value for e in at.error])
+    assert approved() == before + repeat + selected, (approved(), before, repeat, selected)
+    results["approve page"] = {**summarize([elapsed]), "requests": selected}
+    return results
+
+def run_scale(scale, ingest_rows, repeat):
+    import database
+    from audit import flush_audit
+    from sqlalchemy.orm import sessionmaker
+
+    with tempfile.TemporaryDirectory() as tmp:
+        engine = database.create_db_engine(f"sqlite:///{os.path.join(tmp, 'bench.db')}")
+        # The pages, and workers they started at an earlier scale, reach the database through database.get_engine()
+        database.engine = engine
+        start = time.perf_counter()
+        build_database(engine, scale)
+        generated = time.perf_counter() - start
+        try:
+            results = time_pages(repeat)
+            results.update(time_approvals(repeat))
+            db = sessionmaker(bind=engine)()
+            try:
+                results.update(time_operations(db, ingest_rows, repeat))
+            finally:
+                db.close()
+        finally:
+            flush_audit()  # Before the file goes away
+            engine.dispose()
+    return {"generate_s": round(generated, 2), "timings": results}
+
+def git_commit():
+    try:
+        commit = subprocess.run(["git", "rev-parse", "--short", "HEAD"], cwd=ROOT, capture_output=True,
+                                text=True, check=True).stdout.strip()
+        dirty = bool(subprocess.run(["git", "status", "--porcelain", "--untracked-files=no"], cwd=ROOT,
+                                    capture_output=True, text=True).stdout.strip())
+        return commit + ("-dirty" if dirty else "")
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+def compare(results, baseline, tolerance):
+    """Prints median changes against `baseline`; returns the timings slower than tolerance allows."""
+    print(f"\nagainst {baseline.get('commit')} ({baseline.get('created')}):")
+    regressions = []
+    if not results["scales"].keys() & baseline.get("scales", {}).keys():
+        print("  no scales in common")
+    for scale, current in results["scales"].items():
+        previous = baseline.get("scales", {}).get(scale)
+        if not previous:
+            continue
+        for name, timing in current["timings"].items():
+            before = previous["timings"].get(name)
+            if not before or not before["median_ms"]:
+                continue
+            ratio = timing["median_ms"] / before["median_ms"]
+            # Sub-millisecond differences are timer noise whatever the ratio
+            slower = ratio > 1 + tolerance and timing["median_ms"] - before["median_ms"] > 1
+            if slower:
+                regressions.append((scale, name))
+            print(f"{int(scale):>9,}  {name:<18} {before['median_ms']:>10.1f} -> {timing['median_ms']:>10.1f} ms "
+                  f"({ratio:.2f}x){'  SLOWER' if slower else ''}")
+    return regressions
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--scales", type=int, nargs="+", default=[10000, 100000, 1000000],
+                        help="Requests in the synthetic database, one run per value")
+    parser.add_argument("--repeat", type=int, default=5, help="Timed runs per operation")
+    parser.add_argument("--ingest-rows", type=int, help="Rows in the ingested workbook (default: scale / 10, "
+                                                         "at most 20,000)")
+    parser.add_argument("--json", help="Write the results to this file")
+    parser.add_argument("--compare", help="Results file of an earlier run to compare against")
+    parser.add_argument("--tolerance", type=float, default=0.2, help="Allowed slowdown of a median (0.2 = 20%%)")
+    args = parser.parse_args()
+    # Keep the pages' metrics in memory instead of writing data/metrics.prom
+    os.environ.setdefault("METRICS_FILE", "")
+
+    results = {
+        "commit": git_commit(),
+        "created": datetime.now().isoformat(timespec="seconds"),
+        "python": platform.python_version(),
+        "cpus": os.cpu_count(),
+        "repeat": args.repeat,
+        "scales": {},
+    }
+    for scale in args.scales:
+        ingest_rows = args.ingest_rows or max(100, min(scale // 10, 20000))
+        current = results["scales"][str(scale)] = run_scale(scale, ingest_rows, args.repeat)
+        print(f"{scale:,} requests (generated in {current['generate_s']:.1f}s):")
+        for name, timing in current["timings"].items():
+            print(f"  {name:<18} median {timing['median_ms']:>9.1f} ms  p95 {timing['p95_ms']:>9.1f} ms"
+                  + (f"  first {timing['first_ms']:.1f} ms" if "first_ms" in timing else "")
+                  + (f"  {timing['statements']:g} statements, {timing['sql_ms']:.1f} ms SQL" if "sql_ms" in timing else ""))
+
+    if args.json:
+        with open(args.json, "w") as f:
+            json.dump(results, f, indent=2)
+        print(f"Results written to {args.json}")
+    if args.compare:
+        with open(args.compare) as f:
+            regressions = compare(results, json.load(f), args.tolerance)
+        if regressions:
+            print(f"{len(regressions)} timing(s) more than {args.tolerance:.0%} slower")
+            sys.exit(1)
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,210 @@
+"""
+Bulk import of several inventory workbooks, every sheet of each. Sheets
+are read and validated in a process pool (Excel parsing is CPU-bound and
+scales with cores); a single writer in the calling process applies the
+parsed rows in file and sheet order with the same batched upserts as a
+single upload, so the whole import behaves like one upload spread over
+many sheets: a model listed at the same site and location on several
+sheets is one item whose quantities add up.
+
+    python bulk_import.py site_a.xlsx site_b.xlsx [--workers 4] [--full-export]
+"""
+import io
+import multiprocessing
+import os
+from collections import deque, namedtuple
+from concurrent.futures import ProcessPoolExecutor
+import pandas as pd
+from sqlalchemy.orm import Session
+from audit import record
+from catalog import invalidate_catalog
+from stats import refresh_stock_summary
+from validation import ERROR_COLUMNS, validate_inventory_frame
+from utils import (IngestDiff, IngestUpload, iter_inventory_sheet, list_inventory_sheets, upsert_inventory_items,
+                   zero_missing_items, _upload_message)
+
+IMPORT_WORKERS = int(os.getenv("IMPORT_WORKERS", os.cpu_count() or 1))
+
+SheetJob = namedtuple("SheetJob", ["file", "source", "sheet"])
+ParsedSheet = namedtuple("ParsedSheet", ["file", "sheet", "rows", "items", "errors", "error"])
+FileResult = namedtuple("FileResult", ["file", "sheets", "rows", "added", "updated", "skipped", "errors", "problems"])
+
+def _open(name: str, source):
+    """Paths are opened by the reader; uploaded bytes are wrapped so the reader sees the file name."""
+    if isinstance(source, bytes):
+        buffer = io.BytesIO(source)
+        buffer.name = name
+        return buffer
+    return source
+
+def parse_sheet(job: SheetJob) -> ParsedSheet:
+    """
+    Pool worker: reads and validates one sheet. Failures are returned in
+    `error` rather than raised, so one unreadable sheet doesn't cancel
+    the rest of the import.
+    """
+    rows = 0
+    items, errors = [], []
+    try:
+        for chunk, _ in iter_inventory_sheet(_open(job.file, job.source), sheet=job.sheet):
+            report = validate_inventory_frame(chunk)
+            if report.missing_columns:
+                missing = ", ".join(c.title() for c in report.missing_columns)
+                return ParsedSheet(job.file, job.sheet, len(chunk), None, None, f"Missing required column(s): {missing}")
+            rows += len(chunk)
+            items.append(report.items)
+            if len(report.errors):
+                errors.append(report.errors.assign(Sheet=job.sheet))
+    except Exception as e:
+        return ParsedSheet(job.file, job.sheet, rows, None, None, str(e))
+    items = pd.concat(items, ignore_index=True) if items else pd.DataFrame()
+    errors = pd.concat(errors, ignore_index=True) if errors else None
+    return ParsedSheet(job.file, job.sheet, rows, items, errors, None)
+
+def parse_sheets(jobs: list, workers: int = IMPORT_WORKERS):
+    """
+    Yields a ParsedSheet per job, in job order. At most two sheets per
+    worker are parsed ahead of the consumer, which bounds memory when the
+    writer is the slower side.
+    """
+    if workers <= 1 or len(jobs) <= 1:
+        yield from map(parse_sheet, jobs)
+        return
+
+    # spawn: forking the multi-threaded Streamlit server isn't safe
+    context = multiprocessing.get_context("spawn")
+    with ProcessPoolExecutor(max_workers=min(workers, len(jobs)), mp_context=context) as pool:
+        queued = iter(jobs)
+        pending = deque(pool.submit(parse_sheet, job) for _, job in zip(range(workers * 2), queued))
+        while pending:
+            parsed = pending.popleft().result()
+            job = next(queued, None)
+            if job is not None:
+                pending.append(pool.submit(parse_sheet, job))
+            yield parsed
+
+def plan_jobs(files, problems: dict) -> list:
+    """
+    One SheetJob per sheet of every file. `files` are paths or uploaded
+    file objects (read into bytes so they can be sent to the workers);
+    files whose sheets can't be listed are reported in `problems`.
+    """
+    jobs = []
+    for file in files:
+        if isinstance(file, (str, os.PathLike)):
+            name, source = os.path.basename(file), str(file)
+        else:
+            file.seek(0)
+            name, source = file.name, file.read()
+        problems.setdefault(name, [])
+        try:
+            sheets = list_inventory_sheets(_open(name, source))
+        except Exception as e:
+            problems[name].append(str(e))
+            continue
+        jobs.extend(SheetJob(name, source, sheet) for sheet in sheets)
+    return jobs
+
+def bulk_import_files(db: Session, files, user_id=None, workers: int = IMPORT_WORKERS,
+                      full_export: bool = False, progress_callback=None):
+    """
+    Imports every sheet of every file. Each parsed sheet is upserted and
+    committed on its own, like a chunk of ingest_inventory_stream, and
+    the import is audited as a single upload. With full_export=True the
+    files together are taken as the complete inventory; items missing
+    from all of them drop to qty 0, unless a sheet couldn't be read.
+    progress_callback(sheets_done, total_sheets) is called per sheet.
+
+    Returns (success, msg, results) with one FileResult per file.
+    """
+    problems = {}
+    jobs = plan_jobs(files, problems)
+    totals = {name: {"sheets": 0, "rows": 0, "added": 0, "updated": 0, "skipped": 0, "errors": []}
+              for name in problems}
+    diff = IngestDiff()
+    upload = IngestUpload()
+    sheets_done = 0
+
+    def results():
+        out = []
+        for name, t in totals.items():
+            errors = pd.concat(t["errors"], ignore_index=True)[["Sheet", *ERROR_COLUMNS]] if t["errors"] \
+                else pd.DataFrame(columns=["Sheet", *ERROR_COLUMNS])
+            out.append(FileResult(name, t["sheets"], t["rows"], t["added"], t["updated"], t["skipped"],
+                                  errors, problems[name]))
+        return out
+
+    def audit(**extra):
+        files_summary = [{k: v for k, v in r._asdict().items() if k != "errors"} for r in results()]
+        record(db, "INVENTORY_UPLOAD", str(user_id) if user_id else "SYSTEM", "inventory",
+               details=diff.details(files=files_summary, **extra))
+        refresh_stock_summary(db)
+        upload.discard(db)
+        db.commit()
+
+    try:
+        for parsed in parse_sheets(jobs, workers):
+            t = totals[parsed.file]
+            if parsed.error:
+                problems[parsed.file].append(f"Sheet '{parsed.sheet}': {parsed.error}")
+            else:
+                added, updated = upsert_inventory_items(db, parsed.items, upload=upload, diff=diff)
+                db.commit()
+                t["sheets"] += 1
+                t["rows"] += parsed.rows
+                t["added"] += added
+                t["updated"] += updated
+                if parsed.errors is not None:
+                    t["skipped"] += len(parsed.errors)
+                    t["errors"].append(parsed.errors)
+            sheets_done += 1
+            if progress_callback:
+                progress_callback(sheets_done, len(jobs))
+
+        failed = sum(bool(p) for p in problems.values())
+        zeroing = full_export and not failed
+        if zeroing:
+            zero_missing_items(db, upload, diff)
+        skipped = sum(t["skipped"] for t in totals.values())
+        audit(skipped=skipped)
+        invalidate_catalog()
+
+        imported = sum(t["sheets"] for t in totals.values())
+        msg = _upload_message(diff.counts(), skipped, zeroing, "Completed with problems" if failed else "Success")
+        msg += f" Imported {imported} sheet(s) from {len(totals)} file(s)."
+        if failed:
+            msg += f" {failed} file(s) had problems."
+            if full_export:
+                msg += " Items missing from the files were not zeroed, as some sheets could not be read."
+        return not failed, msg, results()
+
+    except Exception as e:
+        db.rollback()
+        invalidate_catalog()
+        if sheets_done:
+            # Earlier sheets are already committed, record them
+            audit(error=str(e))
+        counts = diff.counts()
+        return False, f"Error after {sheets_done} sheet(s) (Added {counts['added']}, Updated {counts['updated']}): {str(e)}", results()
+
+if __name__ == "__main__":
+    import argparse
+    from database import SessionLocal
+
+    parser = argparse.ArgumentParser(description="Import every sheet of one or more inventory workbooks.")
+    parser.add_argument("files", nargs="+")
+    parser.add_argument("--workers", type=int, default=IMPORT_WORKERS)
+    parser.add_argument("--full-export", action="store_true", help="Zero the stock of items missing from all files")
+    args = parser.parse_args()
+
+    db = SessionLocal()
+    try:
+        success, msg, results = bulk_import_files(db, args.files, workers=args.workers, full_export=args.full_export)
+    finally:
+        db.close()
+    for r in results:
+        print(f"{r.file}: {r.sheets} sheet(s), {r.rows} rows, added {r.added}, updated {r.updated}, skipped {r.skipped}")
+        for problem in r.problems:
+            print(f"  {problem}")
+    print(msg)
+    raise SystemExit(0 if success else 1)
@@ -0,0 +1,133 @@
+"""
+Process-wide cache of the available-inventory catalog shown in the
+Requester Portal. Ingest calls invalidate_catalog() after committing;
+approvals only take stock, so they apply the new quantities with
+update_catalog_stock() instead of a rebuild. The TTL covers writes made
+by other processes (e.g. init_project.py).
+
+Rebuilds (the search index takes seconds at tens of thousands of items)
+run outside the lock, one per database at a time; other page runs keep
+getting the previous catalog until the new one is swapped in.
+"""
+import threading
+import time
+from collections import namedtuple
+from sqlalchemy.orm import Session
+from models import InventoryItem
+from search import SearchIndex, SEARCH_LIMIT
+
+CATALOG_TTL_SECONDS = 60
+
+Catalog = namedtuple("Catalog", ["version", "loaded_at", "rows", "by_id", "index"])
+
+_lock = threading.Lock()
+_version = 0
+_catalogs = {}
+_build_locks = {}  # database -> lock held while its catalog is rebuilt
+_building = {}  # database -> {item_id: qty} stock updates made during its rebuild
+
+def invalidate_catalog():
+    global _version
+    with _lock:
+        _version += 1
+
+def _load(db: Session, version: int) -> Catalog:
+    items = (
+        db.query(InventoryItem.id, InventoryItem.type, InventoryItem.manufacturer, InventoryItem.model,
+                 InventoryItem.description, InventoryItem.sum_description, InventoryItem.qty,
+                 InventoryItem.location, InventoryItem.site)
+        .filter(InventoryItem.qty > 0)
+        .order_by(InventoryItem.id)
+        .all()
+    )
+    rows = [{
+        "ID": i.id,
+        "Type": i.type,
+        "Manufacturer": i.manufacturer,
+        "Model": i.model,
+        "Description": i.description,
+        "Available Qty": i.qty,
+        "Location": i.location
+    } for i in items]
+    by_id = {r["ID"]: r for r in rows}
+    index = SearchIndex((i.id, i._asdict()) for i in items)
+    return Catalog(version, time.monotonic(), rows, by_id, index)
+
+def _with_stock(catalog: Catalog, stock: dict) -> Catalog:
+    """Copy of `catalog` with {item_id: qty} applied; items at 0 drop out."""
+    rows = []
+    for row in catalog.rows:
+        qty = stock.get(row["ID"])
+        if qty is None:
+            rows.append(row)
+        elif qty > 0:
+            rows.append({**row, "Available Qty": qty})
+    return catalog._replace(rows=rows, by_id={r["ID"]: r for r in rows})
+
+def _is_fresh(catalog: Catalog) -> bool:
+    return (catalog is not None and catalog.version == _version
+            and time.monotonic() - catalog.loaded_at <= CATALOG_TTL_SECONDS)
+
+def get_catalog(db: Session) -> Catalog:
+    """
+    The in-stock items as display rows (also by id) and their search
+    index. Served from memory until invalidated or stale; while a stale
+    catalog is rebuilt, callers get the previous one.
+    """
+    key = str(db.get_bind().url)
+    with _lock:
+        catalog = _catalogs.get(key)
+        if _is_fresh(catalog):
+            return catalog
+        build_lock = _build_locks.setdefault(key, threading.Lock())
+    # Only wait for the rebuild when there is nothing to serve meanwhile
+    if not build_lock.acquire(blocking=catalog is None):
+        return catalog
+    try:
+        with _lock:
+            current = _catalogs.get(key)
+            if _is_fresh(current):
+                # Rebuilt by the thread this one waited for
+                return current
+            version = _version
+            _building[key] = {}
+        catalog = _load(db, version)
+        with _lock:
+            # Approvals that committed after the rebuild read the items
+            catalog = _with_stock(catalog, _building.pop(key))
+            _catalogs[key] = catalog
+        return catalog
+    finally:
+        with _lock:
+            _building.pop(key, None)
+        build_lock.release()
+
+def update_catalog_stock(db: Session, item_ids):
+    """
+    Applies the committed stock of `item_ids` to the cached catalog of
+    db's database, e.g. after an approval: quantities change and items
+    that ran out drop out, without rebuilding the search index.
+    """
+    key = str(db.get_bind().url)
+    stock = dict(db.query(InventoryItem.id, InventoryItem.qty).filter(InventoryItem.id.in_(list(item_ids))))
+    with _lock:
+        if key in _building:
+            _building[key].update(stock)
+        catalog = _catalogs.get(key)
+        if catalog is not None:
+            _catalogs[key] = _with_stock(catalog, stock)
+
+def search_catalog(catalog: Catalog, query: str, limit: int = SEARCH_LIMIT) -> list:
+    """
+    Catalog rows matching `query`, best first. An empty query returns the
+    first `limit` items.
+    """
+    if not query.strip():
+        return catalog.rows[:limit]
+    # The index still holds items that ran out since it was built
+    dropped = len(catalog.index) - len(catalog.rows)
+    hits = catalog.index.search(query, limit + dropped)
+    return [catalog.by_id[item_id] for item_id, _ in hits if item_id in catalog.by_id][:limit]
+
+def item_label(row: dict) -> str:
+    return f"{row['ID']} - {row['Manufacturer']} {row['Model']} ({row['Description']})"
@@ -1,6 +1,9 @@
-from sqlalchemy import create_engine
-from sqlalchemy.orm import sessionmaker
-from models import Base
+import threading
+from contextlib import contextmanager
+from sqlalchemy import create_engine, event
+from sqlalchemy.orm import Session, sessionmaker
+from migrations import upgrade_schema
+from metrics import instrument_engine, page_run
 import os
 from dotenv import load_dotenv
 
@@ -8,11 +11,90 @@ load_dotenv()
 
 DATABASE_URL = os.getenv("DATABASE_URL", "sqlite:///./data/inventory.db")
 
-engine = create_engine(DATABASE_URL, connect_args={"check_same_thread": False})
-SessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=engine)
+# Server databases (Postgres): connection pool
+DB_POOL_SIZE = int(os.getenv("DB_POOL_SIZE", 10))
+DB_MAX_OVERFLOW = int(os.getenv("DB_MAX_OVERFLOW", 20))
+DB_POOL_RECYCLE = int(os.getenv("DB_POOL_RECYCLE", 1800))
+
+# SQLite: per-connection pragmas
+SQLITE_BUSY_TIMEOUT_MS = int(os.getenv("SQLITE_BUSY_TIMEOUT_MS", 5000))
+SQLITE_MMAP_SIZE = int(os.getenv("SQLITE_MMAP_SIZE", 256 * 1024 * 1024))
+SQLITE_CACHE_SIZE_KB = int(os.getenv("SQLITE_CACHE_SIZE_KB", 64 * 1024))
+
+def _set_sqlite_pragmas(dbapi_connection, connection_record):
+    cursor = dbapi_connection.cursor()
+    # WAL lets readers run alongside the single writer
+    cursor.execute("PRAGMA journal_mode=WAL")
+    cursor.execute("PRAGMA synchronous=NORMAL")
+    cursor.execute(f"PRAGMA busy_timeout={SQLITE_BUSY_TIMEOUT_MS}")
+    cursor.execute(f"PRAGMA mmap_size={SQLITE_MMAP_SIZE}")
+    cursor.execute(f"PRAGMA cache_size=-{SQLITE_CACHE_SIZE_KB}")
+    cursor.close()
+
+def create_db_engine(url: str = DATABASE_URL, **kwargs):
+    """
+    Builds an engine tuned for the backend: WAL and pragmas on SQLite, a
+    sized, pre-pinged pool on server databases.
+    """
+    if url.startswith("sqlite"):
+        connect_args = {"check_same_thread": False, "timeout": SQLITE_BUSY_TIMEOUT_MS / 1000}
+        engine = create_engine(url, connect_args=connect_args, **kwargs)
+        event.listen(engine, "connect", _set_sqlite_pragmas)
+        return instrument_engine(engine)
+
+    kwargs.setdefault("pool_size", DB_POOL_SIZE)
+    kwargs.setdefault("max_overflow", DB_MAX_OVERFLOW)
+    kwargs.setdefault("pool_recycle", DB_POOL_RECYCLE)
+    return instrument_engine(create_engine(url, pool_pre_ping=True, **kwargs))
+
+_engine_lock = threading.Lock()
+
+def get_engine():
+    """
+    The app's engine, built on first use rather than on import: creating
+    it loads the database driver, which pages that never query (e.g. the
+    login form) shouldn't pay for. Assigning database.engine replaces it.
+    """
+    global engine
+    with _engine_lock:
+        if "engine" not in globals():
+            engine = create_db_engine()
+        return engine
+
+def __getattr__(name):
+    # Only called while `engine` isn't set yet: `from database import engine` builds it
+    if name == "engine":
+        return get_engine()
+    raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
+
+class AppSession(Session):
+    """Binds to get_engine() when first used."""
+    def get_bind(self, *args, **kwargs):
+        if self.bind is None:
+            self.bind = get_engine()
+        return super().get_bind(*args, **kwargs)
+
+SessionLocal = sessionmaker(autocommit=False, autoflush=False, class_=AppSession)
 
 def init_db():
-    Base.metadata.create_all(bind=engine)
+    upgrade_schema(get_engine())
+
+@contextmanager
+def session_scope(page: str = None):
+    """
+    Session for one page run. Closed (and its connection returned to the
+    pool) however the block exits, including st.stop() and st.rerun().
+    With `page`, the block is timed as a run of that page (see metrics.py).
+    """
+    db = SessionLocal()
+    try:
+        if page is None:
+            yield db
+        else:
+            with page_run(page):
+                yield db
+    finally:
+        db.close()
 
 def get_db():
     db = SessionLocal()
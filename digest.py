@@ -0,0 +1,139 @@
+"""
+Approver digests. A submitted request records its approver's email
+instead of mailing them right away; once per DIGEST_INTERVAL_HOURS each
+approver with pending requests gets one summary email of their queue,
+through the outbox. The digest row and its outbox message are written in
+one transaction under a unique (approver, period) key, so restarts and
+several app processes never queue a period's digest twice.
+
+    python digest.py    # send the current period's digests, e.g. from cron
+"""
+import os
+import threading
+from datetime import datetime, timedelta
+from itertools import groupby
+from sqlalchemy import func, select
+from sqlalchemy.exc import IntegrityError
+from sqlalchemy.orm import Session
+from models import ApproverDigest, AssetRequest, InventoryItem, RequestStatus, User
+from outbox import enqueue_notification, start_outbox_worker
+from email_templates import render_email
+
+# Cadence: one digest per period, periods starting DIGEST_OFFSET_HOURS after midnight UTC
+DIGEST_INTERVAL_HOURS = float(os.getenv("DIGEST_INTERVAL_HOURS", 24))
+DIGEST_OFFSET_HOURS = float(os.getenv("DIGEST_OFFSET_HOURS", 8))
+# Requests listed per email, oldest first; the total is always given
+DIGEST_MAX_ROWS = int(os.getenv("DIGEST_MAX_ROWS", 200))
+# How often the in-process scheduler checks for a new period
+DIGEST_POLL_SECONDS = 300
+
+_scheduler = None
+_scheduler_lock = threading.Lock()
+_wake = threading.Event()
+
+def digest_period(now: datetime = None) -> datetime:
+    """Start of the cadence period `now` falls in (UTC)."""
+    now = now or datetime.utcnow()
+    interval = timedelta(hours=DIGEST_INTERVAL_HOURS)
+    origin = datetime(1970, 1, 1) + timedelta(hours=DIGEST_OFFSET_HOURS)
+    return origin + ((now - origin) // interval) * interval
+
+def get_pending_digests(db: Session, period_start: datetime, max_rows: int = DIGEST_MAX_ROWS):
+    """
+    {approver_email: (pending_count, oldest requests)} for every approver
+    with pending requests and no digest for this period yet, in one
+    statement: a window over the pending queue numbers and counts each
+    approver's requests, and only their first max_rows are returned.
+    """
+    per_approver = {"partition_by": AssetRequest.approver_email,
+                    "order_by": (AssetRequest.created_at, AssetRequest.id)}
+    queue = (
+        select(AssetRequest.id, AssetRequest.approver_email, AssetRequest.created_at,
+               AssetRequest.qty_requested, AssetRequest.purpose, AssetRequest.user_id, AssetRequest.item_id,
+               func.row_number().over(**per_approver).label("position"),
+               func.count().over(partition_by=AssetRequest.approver_email).label("pending"))
+        .where(AssetRequest.status == RequestStatus.PENDING, AssetRequest.approver_email.isnot(None),
+               AssetRequest.approver_email.not_in(
+                   select(ApproverDigest.approver_email).where(ApproverDigest.period_start == period_start)))
+        .subquery()
+    )
+    rows = db.execute(
+        select(queue, User.username, InventoryItem.manufacturer, InventoryItem.model, InventoryItem.description)
+        .join(User, User.id == queue.c.user_id)
+        .join(InventoryItem, InventoryItem.id == queue.c.item_id)
+        .where(queue.c.position <= max_rows)
+        .order_by(queue.c.approver_email, queue.c.position)
+    ).all()
+    return {email: (group[0].pending, group)
+            for email, group in ((email, list(g)) for email, g in groupby(rows, key=lambda r: r.approver_email))}
+
+def _digest_rows(requests):
+    return [{
+        "id": r.id,
+        "created_at": f"{r.created_at:%Y-%m-%d %H:%M}",
+        "requester_name": r.username,
+        "item_details": f"{r.manufacturer} {r.model} ({r.description})",
+        "qty_requested": r.qty_requested,
+        "purpose": r.purpose,
+    } for r in requests]
+
+def send_digests(db: Session, now: datetime = None):
+    """
+    Queues this period's digest for every approver who has pending
+    requests and hasn't had it yet. Each digest commits on its own; a
+    digest another process queued first is skipped.
+    Returns (queued, skipped).
+    """
+    period_start = digest_period(now)
+    queued = skipped = 0
+    for email, (pending, requests) in get_pending_digests(db, period_start).items():
+        html, text = render_email("digest", requests=_digest_rows(requests), total=pending)
+        db.add(ApproverDigest(approver_email=email, period_start=period_start, request_count=pending))
+        enqueue_notification(db, email, f"Pending Asset Requests ({pending})", html, is_html=True, text_body=text)
+        try:
+            db.commit()
+            queued += 1
+        except IntegrityError:
+            db.rollback()
+            skipped += 1
+    return queued, skipped
+
+def run_digest_scheduler(session_factory, poll_seconds: float = DIGEST_POLL_SECONDS,
+                         stop_event: threading.Event = None):
+    """Sends each period's digests once it starts, until stop_event is set."""
+    while stop_event is None or not stop_event.is_set():
+        db = session_factory()
+        try:
+            queued, _ = send_digests(db)
+            if queued:
+                start_outbox_worker()
+        except Exception as e:
+            db.rollback()
+            print(f"Digest scheduler error: {e}")
+        finally:
+            db.close()
+        until_next = (digest_period() + timedelta(hours=DIGEST_INTERVAL_HOURS) - datetime.utcnow()).total_seconds()
+        _wake.wait(max(1.0, min(poll_seconds, until_next)))
+        _wake.clear()
+
+def start_digest_scheduler():
+    """Starts the in-process scheduler thread, once per process."""
+    global _scheduler
+    with _scheduler_lock:
+        if _scheduler is None or not _scheduler.is_alive():
+            import database
+            _scheduler = threading.Thread(target=run_digest_scheduler, args=(database.SessionLocal,),
+                                          name="digest-scheduler", daemon=True)
+            _scheduler.start()
+
+if __name__ == "__main__":
+    from database import SessionLocal
+
+    db = SessionLocal()
+    try:
+        queued, skipped = send_digests(db)
+    finally:
+        db.close()
+    print(f"Queued {queued} digest(s) for period starting {digest_period():%Y-%m-%d %H:%M} UTC"
+          + (f", {skipped} already queued elsewhere" if skipped else "")
+          + ". The outbox worker (python outbox.py, or the app's) sends them.")
@@ -0,0 +1,39 @@
+"""
+Email templates (templates/email). Each kind has an HTML template,
+autoescaped, and a plain-text alternative. Templates are compiled once
+per process and their bytecode is cached on disk across processes.
+jinja2 is only imported when the first email is rendered.
+"""
+import os
+import tempfile
+
+TEMPLATE_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), "templates", "email")
+EMAIL_KINDS = ("request", "approved", "rejected", "digest", "reorder")
+
+_env = None
+
+def get_environment():
+    global _env
+    if _env is None:
+        from jinja2 import Environment, FileSystemLoader, FileSystemBytecodeCache, select_autoescape
+
+        cache_dir = os.path.join(tempfile.gettempdir(), "inventory-email-templates")
+        os.makedirs(cache_dir, exist_ok=True)
+        _env = Environment(
+            loader=FileSystemLoader(TEMPLATE_DIR),
+            autoescape=select_autoescape(["html"]),
+            bytecode_cache=FileSystemBytecodeCache(cache_dir),
+            auto_reload=False,
+            trim_blocks=True,
+            lstrip_blocks=True,
+        )
+    return _env
+
+def render_email(kind: str, **context):
+    """Renders one email kind. Returns (html, text)."""
+    if kind not in EMAIL_KINDS:
+        raise ValueError(f"Unknown email template: {kind}")
+    env = get_environment()
+    html = env.get_template(f"{kind}.html").render(**context)
+    text = env.get_template(f"{kind}.txt").render(**context)
+    return html, text
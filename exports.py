@@ -0,0 +1,113 @@
+"""
+Streaming exports of inventory and request history to CSV or Parquet.
+Rows are fetched with yield_per (a server-side cursor where the backend
+has one) and written batch by batch, so a full-history export holds one
+batch in memory however large the table.
+
+    python exports.py asset_requests requests.parquet
+"""
+import csv
+import io
+import os
+from sqlalchemy import Boolean, Date, DateTime, Enum, Float, Integer, String, select, type_coerce
+from sqlalchemy.orm import Session
+from models import InventoryItem, AssetRequest, ApprovalLog
+
+EXPORT_BATCH_SIZE = 10000
+# Largest export the Admin Console offers as a browser download: Streamlit
+# hands download data to the browser from memory, so bigger exports are
+# left to the command line above, which writes straight to disk
+EXPORT_DOWNLOAD_MAX_MB = int(os.getenv("EXPORT_DOWNLOAD_MAX_MB", 100))
+
+# Exportable tables and their columns; content_hash is internal to ingest
+EXPORT_TABLES = {
+    "inventory_items": [c for c in InventoryItem.__table__.c if c.name != "content_hash"],
+    "asset_requests": list(AssetRequest.__table__.c),
+    "approval_logs": list(ApprovalLog.__table__.c),
+}
+EXPORT_FORMATS = ["parquet", "csv"]
+
+def iter_export_batches(db: Session, table: str, batch_size: int = EXPORT_BATCH_SIZE):
+    """Yields lists of rows of `table`, in id order, batch_size rows at a time."""
+    # Enums are stored by name, which is also their value: read them as plain strings
+    columns = [type_coerce(c, String).label(c.name) if isinstance(c.type, Enum) else c
+               for c in EXPORT_TABLES[table]]
+    result = db.execute(
+        select(*columns).order_by(columns[0]).execution_options(yield_per=batch_size)
+    )
+    yield from result.partitions()
+
+def _arrow_schema(columns):
+    import pyarrow as pa
+
+    def arrow_type(column):
+        if isinstance(column.type, Enum):
+            return pa.string()
+        if isinstance(column.type, Boolean):
+            return pa.bool_()
+        if isinstance(column.type, Integer):
+            return pa.int64()
+        if isinstance(column.type, Float):
+            return pa.float64()
+        if isinstance(column.type, DateTime):
+            return pa.timestamp("us")
+        if isinstance(column.type, Date):
+            return pa.date32()
+        return pa.string()
+
+    return pa.schema([(c.name, arrow_type(c)) for c in columns])
+
+def export_table(db: Session, table: str, out, fmt: str = "parquet", batch_size: int = EXPORT_BATCH_SIZE) -> int:
+    """
+    Writes `table` to `out` (a path or binary file object) as Parquet
+    (one row group per batch) or CSV. Returns the number of rows written.
+    """
+    columns = EXPORT_TABLES[table]
+    rows_written = 0
+    if fmt == "parquet":
+        import pyarrow as pa
+        import pyarrow.parquet as pq
+
+        schema = _arrow_schema(columns)
+        with pq.ParquetWriter(out, schema) as writer:
+            for rows in iter_export_batches(db, table, batch_size):
+                arrays = [pa.array(values, type=field.type) for values, field in zip(zip(*rows), schema)]
+                writer.write_batch(pa.record_batch(arrays, schema=schema))
+                rows_written += len(rows)
+        return rows_written
+
+    if fmt != "csv":
+        raise ValueError(f"Unknown export format: {fmt}")
+    stream = open(out, "w", newline="", encoding="utf-8") if isinstance(out, str) \
+        else io.TextIOWrapper(out, newline="", encoding="utf-8", write_through=True)
+    try:
+        writer = csv.writer(stream)
+        writer.writerow([c.name for c in columns])
+        for rows in iter_export_batches(db, table, batch_size):
+            writer.writerows(rows)
+            rows_written += len(rows)
+    finally:
+        if isinstance(out, str):
+            stream.close()
+        else:
+            stream.detach()  # Leave the caller's file open
+    return rows_written
+
+if __name__ == "__main__":
+    import argparse
+    from database import SessionLocal
+
+    parser = argparse.ArgumentParser(description="Export a table to Parquet or CSV.")
+    parser.add_argument("table", choices=list(EXPORT_TABLES))
+    parser.add_argument("output")
+    parser.add_argument("--format", choices=EXPORT_FORMATS,
+                        help="Defaults to the output file's extension")
+    args = parser.parse_args()
+
+    fmt = args.format or ("csv" if args.output.lower().endswith(".csv") else "parquet")
+    db = SessionLocal()
+    try:
+        count = export_table(db, args.table, args.output, fmt)
+    finally:
+        db.close()
+    print(f"Exported {count:,} {args.table} rows to {args.output}")
@@ -0,0 +1,172 @@
+"""
+Demand forecast and reorder alerts. An item's consumption rate is an
+exponentially weighted average of its approved quantities (half-life
+FORECAST_HALF_LIFE_DAYS), stored as a decayed sum: a run decays the
+stored sums to now and adds only the approvals logged since the previous
+run, so its cost follows the new approvals and the number of items, not
+the history. Days until stockout is current stock over that rate. Items
+that will run out within REORDER_LEAD_DAYS are mailed to the admins
+through the outbox, once until they are no longer at risk.
+
+    python forecast.py    # e.g. hourly from cron
+"""
+import math
+import os
+from collections import namedtuple
+from datetime import datetime
+import numpy as np
+import pandas as pd
+from sqlalchemy import String, delete, func, insert, select, type_coerce
+from sqlalchemy.exc import IntegrityError
+from sqlalchemy.orm import Session
+from models import (ApprovalLog, AssetRequest, ForecastRun, InventoryItem, ItemForecast, RequestStatus,
+                    User, UserRole)
+from outbox import enqueue_notifications
+from email_templates import render_email
+
+FORECAST_HALF_LIFE_DAYS = float(os.getenv("FORECAST_HALF_LIFE_DAYS", 30))
+REORDER_LEAD_DAYS = float(os.getenv("REORDER_LEAD_DAYS", 14))
+# Rows listed in one alert email, most urgent first
+ALERT_ITEMS_LISTED = 200
+# Approvals read (and item forecasts written) per batch
+FORECAST_BATCH_SIZE = 100000
+
+ForecastSummary = namedtuple("ForecastSummary", ["approvals", "items", "at_risk", "alerts"])
+
+def _tau_days() -> float:
+    """Decay time constant: weights halve every FORECAST_HALF_LIFE_DAYS."""
+    return FORECAST_HALF_LIFE_DAYS / math.log(2)
+
+def iter_new_approvals(db: Session, after_id: int, upto_id: int, batch_size: int = FORECAST_BATCH_SIZE):
+    """
+    Yields DataFrames (item_id, decided_at, qty) of the requests approved
+    by the approval logs with after_id < id <= upto_id, batch_size rows
+    at a time.
+    """
+    # Timestamps are parsed by pandas, a whole batch at once, rather than row by row
+    decided_at = type_coerce(ApprovalLog.timestamp, String)
+    # Core result on the session's connection: rows skip the ORM loading layer
+    result = db.connection().execute(
+        select(AssetRequest.item_id, decided_at, AssetRequest.qty_requested)
+        .join(AssetRequest, AssetRequest.id == ApprovalLog.request_id)
+        .where(ApprovalLog.id > after_id, ApprovalLog.id <= upto_id,
+               ApprovalLog.decision == RequestStatus.APPROVED.value)
+        .execution_options(yield_per=batch_size)
+    )
+    for rows in result.partitions():
+        yield pd.DataFrame(rows, columns=["item_id", "decided_at", "qty"])
+
+def decayed_quantities(approvals: pd.DataFrame, now: datetime, tau: float) -> pd.Series:
+    """
+    Sum of qty * exp(-age / tau) per item_id, ages in days. Decaying
+    these sums to a later instant gives exactly what that instant would
+    compute from scratch, which is what lets runs be incremental.
+    """
+    decided_at = pd.to_datetime(approvals["decided_at"], format="ISO8601")
+    age = (pd.Timestamp(now) - decided_at).dt.total_seconds().to_numpy() / 86400
+    weights = approvals["qty"].to_numpy() * np.exp(-age / tau)
+    return pd.Series(weights).groupby(approvals["item_id"].to_numpy()).sum()
+
+def _alert_rows(db: Session, forecast: pd.DataFrame):
+    ids = forecast.index.tolist()
+    items = {item.id: item for item in db.query(InventoryItem).filter(InventoryItem.id.in_(ids))}
+    return [{
+        "item_details": f"{items[i].manufacturer or ''} {items[i].model}".strip(),
+        "site": items[i].site or "",
+        "dept": items[i].dept or "",
+        "qty": int(row.qty),
+        "rate": row.rate,
+        "days": row.days,
+    } for i, row in zip(ids, forecast.itertuples())]
+
+def _queue_alerts(db: Session, forecast: pd.DataFrame):
+    """One reorder email per admin listing the items newly at risk."""
+    admins = [email for (email,) in db.query(User.email).filter(User.role == UserRole.ADMIN, User.email.isnot(None))]
+    if not admins:
+        return
+    listed = forecast.sort_values("days").head(ALERT_ITEMS_LISTED)
+    html, text = render_email("reorder", items=_alert_rows(db, listed), lead_days=f"{REORDER_LEAD_DAYS:g}")
+    subject = f"Reorder Alert: {len(forecast)} item(s) running low"
+    enqueue_notifications(db, [{"to_email": email, "subject": subject, "body": html, "is_html": True,
+                                "text_body": text} for email in admins])
+
+def run_forecast(db: Session, now: datetime = None, notify: bool = True):
+    """
+    Brings every item's forecast up to date with the approvals logged
+    since the previous run and queues reorder alerts for items newly at
+    risk, all in one transaction. Two runs started from the same previous
+    run can't both commit (the second changes nothing).
+
+    Returns (success, msg, ForecastSummary or None).
+    """
+    now = now or datetime.utcnow()
+    tau = _tau_days()
+    try:
+        last = db.query(ForecastRun).order_by(ForecastRun.id.desc()).first()
+        after_id = last.last_approval_id if last else 0
+        upto_id = db.query(func.max(ApprovalLog.id)).scalar() or 0
+
+        state = pd.DataFrame(
+            db.execute(select(ItemForecast.item_id, ItemForecast.decayed_qty, ItemForecast.alerted_at)).all(),
+            columns=["item_id", "decayed_qty", "alerted_at"],
+        ).set_index("item_id")
+        if last:
+            state["decayed_qty"] *= math.exp(-(now - last.ran_at).total_seconds() / 86400 / tau)
+
+        approvals = 0
+        for batch in iter_new_approvals(db, after_id, upto_id):
+            added = decayed_quantities(batch, now, tau)
+            state = state.reindex(state.index.union(added.index))
+            state["decayed_qty"] = state["decayed_qty"].fillna(0) + added.reindex(state.index, fill_value=0)
+            approvals += len(batch)
+
+        stock = pd.DataFrame(db.execute(select(InventoryItem.id, InventoryItem.qty)).all(), columns=["item_id", "qty"]) \
+            .set_index("item_id")["qty"]
+        # Forget items that were deleted. Items whose demand has died out stay: dropping their
+        # small remainder would make this run differ from a from-scratch one
+        state = state[state.index.isin(stock.index)]
+        state["qty"] = stock.reindex(state.index).fillna(0).clip(lower=0)
+        state["rate"] = state["decayed_qty"] / tau
+        state["days"] = state["qty"] / state["rate"]
+
+        at_risk = state["days"] <= REORDER_LEAD_DAYS
+        newly = at_risk & state["alerted_at"].isna()
+        alerted_at = state["alerted_at"].astype(object).where(at_risk & state["alerted_at"].notna(), None)
+        alerted_at[newly] = now
+
+        db.execute(delete(ItemForecast))
+        records = [{"item_id": int(i), "decayed_qty": float(d), "consumption_rate": float(r),
+                    "days_until_stockout": float(n), "alerted_at": a}
+                   for i, d, r, n, a in zip(state.index, state["decayed_qty"], state["rate"], state["days"], alerted_at)]
+        for start in range(0, len(records), FORECAST_BATCH_SIZE):
+            db.connection().execute(insert(ItemForecast.__table__), records[start:start + FORECAST_BATCH_SIZE])
+
+        if notify and newly.any():
+            _queue_alerts(db, state[newly])
+        summary = ForecastSummary(approvals, len(state), int(at_risk.sum()), int(newly.sum()))
+        db.add(ForecastRun(previous_run_id=last.id if last else 0, ran_at=now, last_approval_id=upto_id,
+                           approvals=summary.approvals, at_risk=summary.at_risk, alerts=summary.alerts))
+        db.commit()
+
+    except IntegrityError:
+        db.rollback()
+        return False, "Another forecast run finished first; nothing was changed.", None
+    except Exception as e:
+        db.rollback()
+        return False, f"Error: {str(e)}", None
+
+    msg = (f"Forecast updated with {summary.approvals:,} new approval(s): {summary.items:,} item(s) in demand, "
+           f"{summary.at_risk:,} running out within {REORDER_LEAD_DAYS:g} days, {summary.alerts:,} new reorder alert(s).")
+    return True, msg, summary
+
+if __name__ == "__main__":
+    from database import SessionLocal
+
+    db = SessionLocal()
+    try:
+        success, msg, summary = run_forecast(db)
+    finally:
+        db.close()
+    print(msg)
+    if summary and summary.alerts:
+        print("Reorder alerts are queued in the outbox; the app's outbox worker (or python outbox.py) sends them.")
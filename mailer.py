@@ -0,0 +1,164 @@
+"""
+SMTP transport. Configuration is read once (st.secrets, then env) and a
+single authenticated connection is kept open and reused across sends,
+closed after sitting idle and re-opened if the server dropped it.
+smtplib and email.mime are imported on first send, not by every page.
+"""
+import os
+import threading
+import time
+from metrics import timed
+
+IDLE_TIMEOUT_SECONDS = 60
+CONNECT_TIMEOUT_SECONDS = 30
+
+_config = None
+_transport = None
+_transport_lock = threading.Lock()
+
+def _get_config(key, default=None):
+    # Helper to get config from secrets or env
+    try:
+        import streamlit as st
+        if key in st.secrets:
+            return st.secrets[key]
+    except FileNotFoundError:
+        pass  # No secrets.toml, e.g. outside Streamlit
+    return os.getenv(key, default)
+
+def get_smtp_config() -> dict:
+    global _config
+    if _config is None:
+        _config = {
+            "server": _get_config("SMTP_SERVER", "smtp.gmail.com"),
+            "port": int(_get_config("SMTP_PORT", 587)),
+            "email": _get_config("SMTP_EMAIL"),
+            "password": _get_config("SMTP_PASSWORD"),
+            "use_tls": str(_get_config("SMTP_USE_TLS", "true")).lower() not in ("0", "false", "no"),
+        }
+    return _config
+
+class MailTransport:
+    def __init__(self, config: dict, idle_timeout: float = IDLE_TIMEOUT_SECONDS):
+        self.config = config
+        self.idle_timeout = idle_timeout
+        self.connections_opened = 0
+        self._server = None
+        self._last_used = 0.0
+        self._lock = threading.Lock()
+
+    @property
+    def is_mock(self) -> bool:
+        sender = self.config["email"]
+        return not sender or sender == "dummy@example.com"
+
+    def _connect(self):
+        import smtplib
+
+        with timed("email: connect"):
+            server = smtplib.SMTP(self.config["server"], self.config["port"], timeout=CONNECT_TIMEOUT_SECONDS)
+            if self.config["use_tls"]:
+                server.starttls()
+            if self.config["password"]:
+                server.login(self.config["email"], self.config["password"])
+        self.connections_opened += 1
+        return server
+
+    def _drop(self):
+        if self._server is not None:
+            try:
+                self._server.quit()
+            except Exception:
+                pass
+            self._server = None
+
+    def _session(self):
+        if self._server is not None and time.monotonic() - self._last_used > self.idle_timeout:
+            self._drop()
+        if self._server is None:
+            self._server = self._connect()
+        return self._server
+
+    def _build(self, to_email, subject, body, is_html, text_body=None):
+        from email.mime.text import MIMEText
+        from email.mime.multipart import MIMEMultipart
+
+        msg = MIMEMultipart('alternative' if is_html and text_body else 'mixed')
+        msg['From'] = self.config["email"]
+        msg['To'] = to_email
+        msg['Subject'] = subject
+        if is_html and text_body:
+            # Clients show the last part they support, so HTML goes last
+            msg.attach(MIMEText(text_body, 'plain'))
+        msg.attach(MIMEText(body, 'html' if is_html else 'plain'))
+        return msg
+
+    def _send_one(self, msg):
+        import smtplib
+
+        try:
+            self._session().send_message(msg)
+        except (smtplib.SMTPServerDisconnected, ConnectionError):
+            # The pooled connection went stale; reconnect once and retry
+            self._drop()
+            self._session().send_message(msg)
+        self._last_used = time.monotonic()
+
+    def send_many(self, messages) -> list:
+        """
+        Sends {"to_email", "subject", "body", "is_html", "text_body"} dicts over one
+        SMTP session. Returns one entry per message: None when sent, the
+        error text otherwise.
+        """
+        messages = list(messages)
+        if self.is_mock:
+            for m in messages:
+                print(f"[MOCK EMAIL] To: {m['to_email']} | Subject: {m['subject']} | Body: (HTML Content omitted in logs)" if m.get("is_html") else f"[MOCK EMAIL] To: {m['to_email']} | Subject: {m['subject']} | Body: {m['body']}")
+                if m.get("is_html"):
+                    # Print a snippet for verification
+                    print(f"[MOCK EMAIL PREVIEW] {m['body'][:200]}...")
+            return [None] * len(messages)
+
+        import smtplib
+
+        errors = []
+        with self._lock:
+            for m in messages:
+                try:
+                    with timed("email: send"):
+                        self._send_one(self._build(m["to_email"], m["subject"], m["body"], m.get("is_html", False),
+                                                   m.get("text_body")))
+                    errors.append(None)
+                except Exception as e:
+                    if not isinstance(e, smtplib.SMTPResponseException):
+                        self._drop()
+                    errors.append(str(e))
+        return errors
+
+    def send(self, to_email: str, subject: str, body: str, is_html: bool = False, text_body: str = None) -> bool:
+        error = self.send_many([{"to_email": to_email, "subject": subject, "body": body, "is_html": is_html,
+                                 "text_body": text_body}])[0]
+        if error:
+            print(f"Failed to send email: {error}")
+        return error is None
+
+    def close(self):
+        with self._lock:
+            self._drop()
+
+def get_transport() -> MailTransport:
+    """The process-wide transport, created on first use."""
+    global _transport
+    with _transport_lock:
+        if _transport is None:
+            _transport = MailTransport(get_smtp_config())
+        return _transport
+
+def reset_transport():
+    """Closes the pooled connection and re-reads configuration on next use."""
+    global _config, _transport
+    with _transport_lock:
+        if _transport is not None:
+            _transport.close()
+        _transport = None
+        _config = None
@@ -0,0 +1,283 @@
+"""
+In-process instrumentation. Engines built by database.create_db_engine
+time every SQL statement; session_scope(page=...) times a page run and
+counts the statements it ran; timed(stage) times named steps such as the
+inventory ingest stages and email sends. Everything is kept as latency
+histograms in memory, shown in the Admin Console and written in
+Prometheus text format to METRICS_FILE (e.g. for node_exporter's textfile
+collector) at most every METRICS_EXPORT_SECONDS.
+"""
+import atexit
+import os
+import re
+import threading
+import time
+from bisect import bisect_left
+from contextlib import contextmanager
+
+# Empty disables the export
+METRICS_FILE = os.getenv("METRICS_FILE", "data/metrics.prom")
+METRICS_EXPORT_SECONDS = float(os.getenv("METRICS_EXPORT_SECONDS", 30))
+# Distinct statements tracked; any beyond are counted under "(other)"
+MAX_STATEMENTS = 500
+# Upper bounds (seconds) of the histogram buckets
+BUCKETS = (0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0)
+
+# IN lists of different lengths are one statement
+_IN_LIST = re.compile(r"\bIN \((?:\?|%\([^)]*\)s|:\w+)(?:, (?:\?|%\([^)]*\)s|:\w+))*\)", re.IGNORECASE)
+
+class Histogram:
+    """Latency histogram over BUCKETS, with sum and max."""
+    __slots__ = ("counts", "sum", "max")
+
+    def __init__(self):
+        self.counts = [0] * (len(BUCKETS) + 1)
+        self.sum = 0.0
+        self.max = 0.0
+
+    @property
+    def count(self) -> int:
+        return sum(self.counts)
+
+    def observe(self, seconds: float):
+        self.counts[bisect_left(BUCKETS, seconds)] += 1
+        self.sum += seconds
+        self.max = max(self.max, seconds)
+
+    def quantile(self, q: float) -> float:
+        """Estimate interpolated within the bucket, as Prometheus' histogram_quantile does."""
+        rank = q * self.count
+        seen = 0
+        for i, c in enumerate(self.counts):
+            if c and seen + c >= rank:
+                lower = BUCKETS[i - 1] if i else 0.0
+                upper = BUCKETS[i] if i < len(BUCKETS) else self.max
+                return min(lower + (upper - lower) * (rank - seen) / c, self.max)
+            seen += c
+        return self.max
+
+class PageStats:
+    __slots__ = ("duration", "statements", "sql_seconds", "max_statements")
+
+    def __init__(self):
+        self.duration = Histogram()
+        self.statements = 0
+        self.sql_seconds = 0.0
+        self.max_statements = 0
+
+_lock = threading.Lock()
+_pages = {}       # page -> PageStats
+_statements = {}  # statement text -> Histogram
+_keys = {}        # raw statement -> normalized text
+_stages = {}      # stage -> Histogram
+_since = time.time()
+_last_export = 0.0
+_export_lock = threading.Lock()
+_run = threading.local()  # statements of the page run on this thread
+
+def _statement_key(statement: str) -> str:
+    # Statement strings repeat (SQLAlchemy caches compiled SQL), so normalize each once
+    key = _keys.get(statement)
+    if key is None:
+        key = _IN_LIST.sub("IN (...)", " ".join(statement.split()))
+        if len(_keys) < 4 * MAX_STATEMENTS:
+            _keys[statement] = key
+    if key not in _statements and len(_statements) >= MAX_STATEMENTS:
+        return "(other)"
+    return key
+
+def _before_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    conn.info.setdefault("metrics_start", []).append(time.perf_counter())
+
+def _after_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    elapsed = time.perf_counter() - conn.info["metrics_start"].pop()
+    with _lock:
+        key = _statement_key(statement)
+        histogram = _statements.get(key)
+        if histogram is None:
+            histogram = _statements[key] = Histogram()
+        histogram.observe(elapsed)
+    run = getattr(_run, "current", None)
+    if run is not None:
+        run[0] += 1
+        run[1] += elapsed
+
+def _handle_error(context):
+    # after_cursor_execute doesn't fire for a failed statement
+    starts = context.connection.info.get("metrics_start") if context.connection is not None else None
+    if starts:
+        starts.pop()
+
+def instrument_engine(engine):
+    """Times every statement the engine runs."""
+    from sqlalchemy import event
+
+    event.listen(engine, "before_cursor_execute", _before_cursor_execute)
+    event.listen(engine, "after_cursor_execute", _after_cursor_execute)
+    event.listen(engine, "handle_error", _handle_error)
+    return engine
+
+@contextmanager
+def page_run(page: str):
+    """
+    Times one run of a page and counts the statements this thread ran
+    meanwhile. Runs ended by st.stop() or st.rerun() count too.
+    """
+    outer = getattr(_run, "current", None)
+    run = _run.current = [0, 0.0]
+    start = time.perf_counter()
+    try:
+        yield
+    finally:
+        elapsed = time.perf_counter() - start
+        _run.current = outer
+        with _lock:
+            stats = _pages.setdefault(page, PageStats())
+            stats.duration.observe(elapsed)
+            stats.statements += run[0]
+            stats.sql_seconds += run[1]
+            stats.max_statements = max(stats.max_statements, run[0])
+        _maybe_export()
+
+@contextmanager
+def timed(stage: str):
+    """Records how long the block took under `stage`, whether or not it raised."""
+    start = time.perf_counter()
+    try:
+        yield
+    finally:
+        observe(stage, time.perf_counter() - start)
+
+def observe(stage: str, seconds: float):
+    with _lock:
+        _stages.setdefault(stage, Histogram()).observe(seconds)
+
+def reset_metrics():
+    global _since
+    with _lock:
+        _pages.clear()
+        _statements.clear()
+        _stages.clear()
+        _since = time.time()
+
+def metrics_since() -> float:
+    """When collection started (process start or the last reset), as a timestamp."""
+    return _since
+
+def page_summary():
+    """One row per page, slowest 95th percentile first."""
+    with _lock:
+        rows = [{
+            "Page": page,
+            "Runs": s.duration.count,
+            "p50 ms": s.duration.quantile(0.5) * 1000,
+            "p95 ms": s.duration.quantile(0.95) * 1000,
+            "Max ms": s.duration.max * 1000,
+            "Statements/run": s.statements / s.duration.count,
+            "Max statements": s.max_statements,
+            "SQL ms/run": s.sql_seconds / s.duration.count * 1000,
+            "SQL share %": 100 * s.sql_seconds / s.duration.sum if s.duration.sum else 0.0,
+        } for page, s in _pages.items()]
+    return sorted(rows, key=lambda r: r["p95 ms"], reverse=True)
+
+def slowest_statements(limit: int = 20, by: str = "Total ms"):
+    """The `limit` statements with the highest `by` ("Total ms", "Max ms" or "Mean ms")."""
+    with _lock:
+        rows = [{
+            "Statement": statement,
+            "Calls": h.count,
+            "Total ms": h.sum * 1000,
+            "Mean ms": h.sum / h.count * 1000,
+            "p95 ms": h.quantile(0.95) * 1000,
+            "Max ms": h.max * 1000,
+        } for statement, h in _statements.items()]
+    return sorted(rows, key=lambda r: r[by], reverse=True)[:limit]
+
+def stage_summary():
+    """Timed stages (ingest steps, email sends), by total time."""
+    with _lock:
+        rows = [{
+            "Stage": stage,
+            "Calls": h.count,
+            "Total ms": h.sum * 1000,
+            "Mean ms": h.sum / h.count * 1000,
+            "p95 ms": h.quantile(0.95) * 1000,
+            "Max ms": h.max * 1000,
+        } for stage, h in _stages.items()]
+    return sorted(rows, key=lambda r: r["Total ms"], reverse=True)
+
+def _label(value: str) -> str:
+    return value.replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+
+def _histogram_lines(name: str, label: str, histograms: dict):
+    cumulative_bounds = [f"{b:g}" for b in BUCKETS] + ["+Inf"]
+    for value, h in sorted(histograms.items()):
+        labels = f'{label}="{_label(value)}"'
+        total = 0
+        for bound, count in zip(cumulative_bounds, h.counts):
+            total += count
+            yield f'{name}_bucket{{{labels},le="{bound}"}} {total}'
+        yield f"{name}_sum{{{labels}}} {h.sum:.6f}"
+        yield f"{name}_count{{{labels}}} {total}"
+
+def render_prometheus() -> str:
+    """Current metrics in the Prometheus text exposition format."""
+    with _lock:
+        pages = dict(_pages)
+        page_durations = {page: s.duration for page, s in pages.items()}
+        by_verb = {}
+        for statement, h in _statements.items():
+            verb = statement.split(" ", 1)[0].upper() if statement != "(other)" else "OTHER"
+            merged = by_verb.setdefault(verb, Histogram())
+            merged.counts = [a + b for a, b in zip(merged.counts, h.counts)]
+            merged.sum += h.sum
+        stages = dict(_stages)
+        lines = [
+            "# HELP portal_page_run_seconds Duration of one Streamlit page run.",
+            "# TYPE portal_page_run_seconds histogram",
+            *_histogram_lines("portal_page_run_seconds", "page", page_durations),
+            "# HELP portal_page_statements_total SQL statements run by page runs.",
+            "# TYPE portal_page_statements_total counter",
+            *(f'portal_page_statements_total{{page="{_label(p)}"}} {s.statements}' for p, s in sorted(pages.items())),
+            "# HELP portal_page_sql_seconds_total Time page runs spent in SQL statements.",
+            "# TYPE portal_page_sql_seconds_total counter",
+            *(f'portal_page_sql_seconds_total{{page="{_label(p)}"}} {s.sql_seconds:.6f}' for p, s in sorted(pages.items())),
+            "# HELP portal_sql_statement_seconds SQL statement latency, pages and background work alike.",
+            "# TYPE portal_sql_statement_seconds histogram",
+            *_histogram_lines("portal_sql_statement_seconds", "verb", by_verb),
+            "# HELP portal_stage_seconds Duration of timed stages (inventory ingest, email sends).",
+            "# TYPE portal_stage_seconds histogram",
+            *_histogram_lines("portal_stage_seconds", "stage", stages),
+        ]
+    return "\n".join(lines) + "\n"
+
+def write_metrics(path: str = METRICS_FILE):
+    """Writes render_prometheus() to `path`, replacing it in one step."""
+    directory = os.path.dirname(path)
+    if directory:
+        os.makedirs(directory, exist_ok=True)
+    tmp_path = f"{path}.{os.getpid()}.tmp"
+    with open(tmp_path, "w") as f:
+        f.write(render_prometheus())
+    os.replace(tmp_path, path)
+
+def _maybe_export():
+    global _last_export
+    if not METRICS_FILE or time.monotonic() - _last_export < METRICS_EXPORT_SECONDS:
+        return
+    # Another thread is already exporting
+    if not _export_lock.acquire(blocking=False):
+        return
+    try:
+        if not _last_export:
+            atexit.register(_export_quietly)
+        _last_export = time.monotonic()
+        _export_quietly()
+    finally:
+        _export_lock.release()
+
+def _export_quietly():
+    try:
+        write_metrics(METRICS_FILE)
+    except OSError as e:
+        print(f"Metrics export error: {e}")
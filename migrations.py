@@ -0,0 +1,175 @@
+"""
+In-place upgrades for existing databases (e.g. data/inventory.db files
+created before indexes or the dashboard summaries were added). Every
+step is idempotent.
+
+    python migrations.py
+"""
+import json
+from datetime import datetime
+from sqlalchemy import inspect, text
+from models import Base
+from stats import rebuild_stats
+
+# Indexes earlier versions created that the models no longer declare
+OBSOLETE_INDEXES = {
+    # Unique key on model alone: blocked the same model at a second site;
+    # then a non-unique (model, site, location) index
+    "inventory_items": ["uq_inventory_items_model", "ix_inventory_items_model_site_location"],
+}
+
+def drop_obsolete_indexes(conn):
+    """Drops OBSOLETE_INDEXES the database still has. Returns their names."""
+    inspector = inspect(conn)
+    dropped = []
+    for table, names in OBSOLETE_INDEXES.items():
+        existing = {ix["name"] for ix in inspector.get_indexes(table)}
+        for name in names:
+            if name in existing:
+                conn.execute(text(f"DROP INDEX {name}"))
+                dropped.append(name)
+    return dropped
+
+def merge_duplicate_items(conn):
+    """
+    Merges inventory items that share a natural key (validation.ITEM_KEY:
+    model, site and location) into the lowest id, as ingest would have
+    written them: quantities are added up, requests and forecast state are
+    repointed to the kept item, and the kept item's content hash is
+    cleared so it is rehashed. Needed before the unique index on the key
+    can be created. Returns {kept_id: [merged_ids]}.
+    """
+    groups = {}
+    for item_id, *key in conn.execute(text(
+        "SELECT id, model, site, location FROM inventory_items WHERE model IS NOT NULL ORDER BY id"
+    )):
+        # Grouped in Python: a missing site or location is part of the key, not a wildcard
+        groups.setdefault(tuple(key), []).append(item_id)
+
+    merged = {}
+    for keep_id, *others in (ids for ids in groups.values() if len(ids) > 1):
+        params = {"keep": keep_id, **{f"id{i}": other for i, other in enumerate(others)}}
+        in_others = ", ".join(f":id{i}" for i in range(len(others)))
+        conn.execute(text(
+            "UPDATE inventory_items SET content_hash = NULL, qty = "
+            f"(SELECT SUM(COALESCE(qty, 0)) FROM inventory_items WHERE id = :keep OR id IN ({in_others})) "
+            "WHERE id = :keep"
+        ), params)
+        conn.execute(text(f"UPDATE asset_requests SET item_id = :keep WHERE item_id IN ({in_others})"), params)
+        # Decayed sums add up exactly; the next forecast run recomputes rates from them
+        conn.execute(text(
+            "INSERT INTO item_forecasts (item_id, decayed_qty) SELECT :keep, 0 "
+            f"WHERE EXISTS (SELECT 1 FROM item_forecasts WHERE item_id IN ({in_others})) "
+            "AND NOT EXISTS (SELECT 1 FROM item_forecasts WHERE item_id = :keep)"
+        ), params)
+        conn.execute(text(
+            "UPDATE item_forecasts SET decayed_qty = decayed_qty + "
+            f"(SELECT COALESCE(SUM(decayed_qty), 0) FROM item_forecasts WHERE item_id IN ({in_others})) "
+            "WHERE item_id = :keep"
+        ), params)
+        for table in ("item_forecasts", "item_request_stats"):
+            conn.execute(text(f"DELETE FROM {table} WHERE item_id IN ({in_others})"), params)
+        conn.execute(text(f"DELETE FROM inventory_items WHERE id IN ({in_others})"), params)
+        merged[keep_id] = others
+    if merged:
+        # Per-item request counts and the stock summary change with the merge
+        rebuild_stats(conn)
+    return merged
+
+def add_missing_columns(conn):
+    """
+    Adds nullable columns declared on the models that existing tables lack
+    (create_all only creates whole tables).
+    """
+    inspector = inspect(conn)
+    added = []
+    for table in Base.metadata.sorted_tables:
+        existing = {c["name"] for c in inspector.get_columns(table.name)}
+        for column in table.columns:
+            if column.name in existing or not column.nullable:
+                continue
+            col_type = column.type.compile(dialect=conn.dialect)
+            conn.execute(text(f'ALTER TABLE {table.name} ADD COLUMN {column.name} {col_type}'))
+            added.append(f"{table.name}.{column.name}")
+    return added
+
+def create_missing_indexes(conn):
+    """
+    Creates every index declared on the models that the database lacks,
+    and recreates those whose declared columns changed since.
+    """
+    inspector = inspect(conn)
+    created = []
+    for table in Base.metadata.sorted_tables:
+        existing = {ix["name"]: ix["column_names"] for ix in inspector.get_indexes(table.name)}
+        for index in table.indexes:
+            if existing.get(index.name) == [c.name for c in index.columns]:
+                continue
+            if index.name in existing:
+                index.drop(bind=conn)
+            index.create(bind=conn)
+            created.append(index.name)
+    return created
+
+def backfill_content_hashes(conn):
+    """
+    Hashes items that have no content_hash yet (created before delta
+    ingest), so the next upload only rewrites items that really differ.
+    Returns the number of items hashed.
+    """
+    # validation pulls in pandas, only worth loading when upgrading
+    from validation import INVENTORY_COLUMNS, content_hash
+
+    rows = conn.execute(text(
+        f"SELECT id, {', '.join(INVENTORY_COLUMNS)} FROM inventory_items WHERE content_hash IS NULL"
+    )).fetchall()
+    if rows:
+        conn.execute(text("UPDATE inventory_items SET content_hash = :hash WHERE id = :id"),
+                     [{"id": row[0], "hash": content_hash(row[1:])} for row in rows])
+    return len(rows)
+
+def backfill_stats(conn):
+    """
+    Fills the dashboard summaries (stats.py) for databases that have data
+    but predate them. Returns True if they were rebuilt.
+    """
+    has_data = conn.execute(text(
+        "SELECT EXISTS (SELECT 1 FROM asset_requests) OR EXISTS (SELECT 1 FROM inventory_items)"
+    )).scalar()
+    has_stats = conn.execute(text(
+        "SELECT EXISTS (SELECT 1 FROM item_request_stats) OR EXISTS (SELECT 1 FROM stock_summary)"
+    )).scalar()
+    if has_data and not has_stats:
+        rebuild_stats(conn)
+        return True
+    return False
+
+def upgrade_schema(engine):
+    Base.metadata.create_all(bind=engine)
+    with engine.begin() as conn:
+        columns = add_missing_columns(conn)
+        dropped = drop_obsolete_indexes(conn)
+        merged = merge_duplicate_items(conn)
+        created = create_missing_indexes(conn)
+        hashed = backfill_content_hashes(conn)
+        rebuilt = backfill_stats(conn)
+        if columns or dropped or merged or created or hashed or rebuilt:
+            conn.execute(text(
+                "INSERT INTO audit_logs (action, actor, timestamp, details) "
+                "VALUES ('SCHEMA_MIGRATION', 'SYSTEM', :timestamp, :details)"
+            ), {
+                "timestamp": datetime.utcnow(),
+                "details": json.dumps({"added_columns": columns, "dropped_indexes": dropped, "merged_items": merged,
+                                    "created_indexes": created,
+                                    "hashed_items": hashed, "rebuilt_stats": rebuilt}),
+            })
+    return columns, dropped, merged, created
+
+if __name__ == "__main__":
+    from database import engine
+
+    columns, dropped, merged, created = upgrade_schema(engine)
+    print(f"Added columns: {', '.join(columns) or 'none'}")
+    print(f"Dropped indexes: {', '.join(dropped) or 'none'}")
+    print(f"Merged duplicate items: {sum(len(v) for v in merged.values())}")
+    print(f"Created indexes: {', '.join(created) or 'none'}")
@@ -1,4 +1,4 @@
-from sqlalchemy import create_engine, Column, Integer, String, Float, ForeignKey, DateTime, Enum, Text
+from sqlalchemy import create_engine, Column, Integer, String, Float, ForeignKey, DateTime, Enum, Text, Index, Boolean, Date
 from sqlalchemy.orm import declarative_base, relationship
 from datetime import datetime
 import enum
@@ -15,6 +15,11 @@ class RequestStatus(enum.Enum):
     APPROVED = "APPROVED"
     REJECTED = "REJECTED"
 
+class OutboxStatus(enum.Enum):
+    PENDING = "PENDING"
+    SENT = "SENT"
+    FAILED = "FAILED"
+
 class User(Base):
     __tablename__ = "users"
     
@@ -27,6 +32,18 @@ class User(Base):
     requests = relationship("AssetRequest", back_populates="requester")
     approvals = relationship("ApprovalLog", back_populates="approver")
 
+class RevokedSessionToken(Base):
+    __tablename__ = "revoked_session_tokens"
+
+    # Session tokens (auth.py) that no longer work: redeemed by a new tab or logged out. Shared by
+    # every app process; a row is only needed until its token would have expired anyway.
+    nonce = Column(String, primary_key=True)
+    expires_at = Column(Integer, nullable=False) # Unix time, as in the token
+
+    __table_args__ = (
+        Index("ix_revoked_session_tokens_expires_at", "expires_at"),
+    )
+
 class InventoryItem(Base):
     __tablename__ = "inventory_items"
     
@@ -43,9 +60,28 @@ class InventoryItem(Base):
     area = Column(String)
     location = Column(String)
     site = Column(String)
+    content_hash = Column(String, nullable=True) # validation.content_hash of the last ingested row
     
     requests = relationship("AssetRequest", back_populates="item")
 
+    __table_args__ = (
+        # validation.ITEM_KEY, the natural key used by inventory ingest. SQLite
+        # treats NULLs as distinct here; ingest matches a missing site or location itself.
+        Index("uq_inventory_items_model_site_location", "model", "site", "location", unique=True),
+        Index("ix_inventory_items_qty", "qty"),
+    )
+
+class IngestUploadItem(Base):
+    __tablename__ = "ingest_upload_items"
+
+    # Items an upload in progress has written, so one spread over several chunks or sheets
+    # (utils.IngestUpload) needn't hold them in memory. Deleted when the upload ends.
+    upload_id = Column(Integer, primary_key=True, autoincrement=False) # Starts with the Unix time, see IngestUpload
+    item_id = Column(Integer, primary_key=True, autoincrement=False)
+    added = Column(Boolean, default=False) # Inserted by this upload
+    original_hash = Column(String, nullable=True) # content_hash before this upload
+    qty = Column(Integer, nullable=False) # Upload total so far
+
 class AssetRequest(Base):
     __tablename__ = "asset_requests"
     
@@ -56,11 +92,22 @@ class AssetRequest(Base):
     purpose = Column(Text)
     status = Column(Enum(RequestStatus), default=RequestStatus.PENDING)
     created_at = Column(DateTime, default=datetime.utcnow)
+    approver_email = Column(String, nullable=True) # Who is told about it, in their next digest
     
     requester = relationship("User", back_populates="requests")
     item = relationship("InventoryItem", back_populates="requests")
     approvals = relationship("ApprovalLog", back_populates="request")
 
+    __table_args__ = (
+        # Approver Portal: pending queue in submission order
+        Index("ix_asset_requests_status_created_at", "status", "created_at", "id"),
+        # Digests: pending requests per approver, oldest first
+        Index("ix_asset_requests_status_approver_email", "status", "approver_email", "created_at", "id"),
+        # Requester Portal: "My Requests", newest first
+        Index("ix_asset_requests_user_id_created_at", "user_id", "created_at"),
+        Index("ix_asset_requests_item_id", "item_id"),
+    )
+
 class ApprovalLog(Base):
     __tablename__ = "approval_logs"
     
@@ -74,11 +121,133 @@ class ApprovalLog(Base):
     request = relationship("AssetRequest", back_populates="approvals")
     approver = relationship("User", back_populates="approvals")
 
+    __table_args__ = (
+        # Approver Portal: approval history, newest first
+        Index("ix_approval_logs_approver_id_timestamp", "approver_id", "timestamp"),
+        Index("ix_approval_logs_request_id", "request_id"),
+    )
+
 class AuditLog(Base):
     __tablename__ = "audit_logs"
     
     id = Column(Integer, primary_key=True)
     action = Column(String)
-    actor = Column(String) # Username
+    actor = Column(String) # User id, "SYSTEM", or the username tried for a failed login
+    entity = Column(String) # What the action touched: "user", "request", "item", "inventory"
+    entity_id = Column(Integer)
     timestamp = Column(DateTime, default=datetime.utcnow)
     details = Column(Text) # JSON string
+
+    __table_args__ = (
+        # Monthly archiving (audit.archive_audit_logs)
+        Index("ix_audit_logs_timestamp", "timestamp"),
+        # Admin Console: newest first (by id) per filter, paged by keyset
+        Index("ix_audit_logs_action_id", "action", "id"),
+        Index("ix_audit_logs_actor_id", "actor", "id"),
+        Index("ix_audit_logs_entity_id", "entity", "id"),
+        Index("ix_audit_logs_entity_entity_id_id", "entity", "entity_id", "id"),
+    )
+
+class ApproverDigest(Base):
+    __tablename__ = "approver_digests"
+
+    # One digest per approver and cadence period: written with its outbox message, so it's never queued twice
+    id = Column(Integer, primary_key=True)
+    approver_email = Column(String, nullable=False)
+    period_start = Column(DateTime, nullable=False)
+    request_count = Column(Integer, default=0)
+    created_at = Column(DateTime, default=datetime.utcnow)
+
+    __table_args__ = (
+        Index("uq_approver_digests_approver_email_period_start", "approver_email", "period_start", unique=True),
+    )
+
+class OutboxMessage(Base):
+    __tablename__ = "notification_outbox"
+    
+    id = Column(Integer, primary_key=True)
+    to_email = Column(String, nullable=False)
+    subject = Column(String)
+    body = Column(Text)
+    is_html = Column(Boolean, default=False)
+    text_body = Column(Text, nullable=True) # Plain-text alternative of an HTML body
+    status = Column(Enum(OutboxStatus), default=OutboxStatus.PENDING)
+    attempts = Column(Integer, default=0)
+    next_attempt_at = Column(DateTime, default=datetime.utcnow)
+    last_error = Column(Text, nullable=True)
+    created_at = Column(DateTime, default=datetime.utcnow)
+    sent_at = Column(DateTime, nullable=True)
+
+    __table_args__ = (
+        # Worker: due messages in order
+        Index("ix_notification_outbox_status_next_attempt_at", "status", "next_attempt_at"),
+    )
+
+# Dashboard aggregates, maintained incrementally by stats.py
+
+class ItemRequestStats(Base):
+    __tablename__ = "item_request_stats"
+
+    item_id = Column(Integer, ForeignKey("inventory_items.id"), primary_key=True)
+    request_count = Column(Integer, default=0)
+    pending_qty = Column(Integer, default=0)
+    approved_qty = Column(Integer, default=0)
+    rejected_qty = Column(Integer, default=0)
+
+class DailyRequestStats(Base):
+    __tablename__ = "daily_request_stats"
+
+    # Requests by submission day and current status
+    day = Column(Date, primary_key=True)
+    status = Column(Enum(RequestStatus), primary_key=True)
+    request_count = Column(Integer, default=0)
+    qty = Column(Integer, default=0)
+
+class ApproverStats(Base):
+    __tablename__ = "approver_stats"
+
+    approver_id = Column(Integer, ForeignKey("users.id"), primary_key=True)
+    approved_count = Column(Integer, default=0)
+    rejected_count = Column(Integer, default=0)
+    total_latency_seconds = Column(Float, default=0) # Submission to decision
+    max_latency_seconds = Column(Float, default=0)
+
+class StockSummary(Base):
+    __tablename__ = "stock_summary"
+
+    # Missing values are stored as "" so the key can be matched on
+    site = Column(String, primary_key=True)
+    dept = Column(String, primary_key=True)
+    type = Column(String, primary_key=True)
+    item_count = Column(Integer, default=0)
+    total_qty = Column(Integer, default=0)
+    out_of_stock = Column(Integer, default=0)
+
+# Demand forecast, maintained by forecast.py
+
+class ItemForecast(Base):
+    __tablename__ = "item_forecasts"
+
+    item_id = Column(Integer, ForeignKey("inventory_items.id"), primary_key=True)
+    # Approved qty weighted by exp(-age / tau), age taken at the last ForecastRun
+    decayed_qty = Column(Float, default=0)
+    consumption_rate = Column(Float, default=0) # Units per day
+    days_until_stockout = Column(Float) # At the current rate; 0 when already out of stock
+    alerted_at = Column(DateTime, nullable=True) # Reorder alert sent; cleared once the item is no longer at risk
+
+    __table_args__ = (
+        # Analytics: items closest to running out
+        Index("ix_item_forecasts_days_until_stockout", "days_until_stockout"),
+    )
+
+class ForecastRun(Base):
+    __tablename__ = "forecast_runs"
+
+    id = Column(Integer, primary_key=True)
+    # Each run continues from the one before; the unique key stops two runs counting the same approvals
+    previous_run_id = Column(Integer, nullable=False, unique=True) # 0 for the first run
+    ran_at = Column(DateTime, nullable=False)
+    last_approval_id = Column(Integer, nullable=False) # Approvals up to this approval_logs.id are counted
+    approvals = Column(Integer, default=0) # New approvals this run
+    at_risk = Column(Integer, default=0)
+    alerts = Column(Integer, default=0)
@@ -0,0 +1,136 @@
+"""
+Notification outbox. Emails are written to notification_outbox in the
+same transaction as the request or decision that causes them, and a
+background worker delivers them with retries and exponential backoff.
+
+    python outbox.py    # run the worker as its own process
+"""
+import threading
+from datetime import datetime, timedelta
+from sqlalchemy import update
+from sqlalchemy.orm import Session
+from models import OutboxMessage, OutboxStatus
+
+MAX_ATTEMPTS = 5
+BACKOFF_BASE_SECONDS = 30
+BACKOFF_MAX_SECONDS = 3600
+# A claimed message becomes due again after this long if its worker died
+CLAIM_LEASE_SECONDS = 300
+
+_worker = None
+_worker_lock = threading.Lock()
+_wake = threading.Event()
+
+def enqueue_notification(db: Session, to_email: str, subject: str, body: str, is_html: bool = False,
+                         text_body: str = None):
+    """
+    Adds a message to the outbox. Nothing is sent until the caller commits.
+    text_body is the plain-text alternative of an HTML body.
+    """
+    db.add(OutboxMessage(to_email=to_email, subject=subject, body=body, is_html=is_html, text_body=text_body))
+
+def enqueue_notifications(db: Session, notifications):
+    """Adds a list of {"to_email", "subject", "body", "is_html", "text_body"} dicts to the outbox."""
+    for n in notifications:
+        enqueue_notification(db, n["to_email"], n["subject"], n["body"], n.get("is_html", False), n.get("text_body"))
+
+def backoff_seconds(attempts: int) -> int:
+    return min(BACKOFF_BASE_SECONDS * 2 ** (attempts - 1), BACKOFF_MAX_SECONDS)
+
+def _claim_due(db: Session, batch_size: int):
+    now = datetime.utcnow()
+    ids = [i for (i,) in db.query(OutboxMessage.id)
+           .filter(OutboxMessage.status == OutboxStatus.PENDING, OutboxMessage.next_attempt_at <= now)
+           .order_by(OutboxMessage.next_attempt_at, OutboxMessage.id)
+           .limit(batch_size)]
+    if not ids:
+        return []
+
+    # Lease the batch so concurrent workers skip it
+    lease_until = now + timedelta(seconds=CLAIM_LEASE_SECONDS)
+    db.execute(
+        update(OutboxMessage)
+        .where(OutboxMessage.id.in_(ids), OutboxMessage.status == OutboxStatus.PENDING,
+               OutboxMessage.next_attempt_at <= now)
+        .values(next_attempt_at=lease_until)
+        .execution_options(synchronize_session=False)
+    )
+    db.commit()
+    return (
+        db.query(OutboxMessage)
+        .filter(OutboxMessage.id.in_(ids), OutboxMessage.next_attempt_at == lease_until)
+        .order_by(OutboxMessage.id)
+        .all()
+    )
+
+def drain_outbox(db: Session, send=None, batch_size: int = 50, max_attempts: int = MAX_ATTEMPTS):
+    """
+    Delivers one batch of due messages. Failed sends are retried with
+    exponential backoff and marked FAILED after max_attempts.
+    Returns (sent_count, failed_count).
+    """
+    if send is None:
+        from utils import send_email_notification as send
+
+    sent = failed = 0
+    for msg in _claim_due(db, batch_size):
+        try:
+            ok = send(msg.to_email, msg.subject, msg.body, is_html=msg.is_html, text_body=msg.text_body)
+            error = None if ok else "Send failed"
+        except Exception as e:
+            ok, error = False, str(e)
+
+        msg.attempts = (msg.attempts or 0) + 1
+        if ok:
+            msg.status = OutboxStatus.SENT
+            msg.sent_at = datetime.utcnow()
+            msg.last_error = None
+            sent += 1
+        else:
+            msg.last_error = error
+            if msg.attempts >= max_attempts:
+                msg.status = OutboxStatus.FAILED
+            else:
+                msg.next_attempt_at = datetime.utcnow() + timedelta(seconds=backoff_seconds(msg.attempts))
+            failed += 1
+        # Commit per message so a crash re-sends at most one email
+        db.commit()
+    return sent, failed
+
+def run_outbox_worker(session_factory, interval: float = 5.0, stop_event: threading.Event = None, send=None):
+    """Drains the outbox until stop_event is set, waking early when new mail is queued."""
+    while stop_event is None or not stop_event.is_set():
+        db = session_factory()
+        try:
+            while any(drain_outbox(db, send)):
+                pass
+        except Exception as e:
+            db.rollback()
+            print(f"Outbox worker error: {e}")
+        finally:
+            db.close()
+        _wake.wait(interval)
+        _wake.clear()
+
+def start_outbox_worker(interval: float = 5.0):
+    """
+    Starts the in-process worker thread (once per process) and wakes it
+    so freshly committed messages go out right away.
+    """
+    global _worker
+    with _worker_lock:
+        if _worker is None or not _worker.is_alive():
+            import database
+            _worker = threading.Thread(target=run_outbox_worker, args=(database.SessionLocal, interval),
+                                       name="outbox-worker", daemon=True)
+            _worker.start()
+    _wake.set()
+
+if __name__ == "__main__":
+    from database import SessionLocal
+
+    print("Outbox worker running, Ctrl+C to stop.")
+    try:
+        run_outbox_worker(SessionLocal)
+    except KeyboardInterrupt:
+        pass
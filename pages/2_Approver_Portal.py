@@ -1,13 +1,20 @@
 import streamlit as st
 import pandas as pd
-from database import get_db
-from models import AssetRequest, RequestStatus, ApprovalLog, InventoryItem, UserRole
-from utils import send_email_notification
-import datetime
+from database import session_scope
+from session import restore_login
+from models import RequestStatus, UserRole
+from queries import (
+    PENDING_PAGE_SIZE, count_pending_requests, get_pending_page,
+    get_pending_filter_options, get_approval_history,
+)
+from approvals import decide_requests
+from outbox import start_outbox_worker
+from digest import start_digest_scheduler
 
 st.set_page_config(page_title="Approver Portal", page_icon="🛡️", layout="wide")
 
 def check_auth():
+    restore_login()
     if "user" not in st.session_state:
         st.warning("Please login first.")
         st.stop()
@@ -18,88 +25,120 @@ def check_auth():
 
 check_auth()
 user = st.session_state["user"]
+start_digest_scheduler()
 st.title("Approver Portal")
 
-db = next(get_db())
-
-st.subheader("Pending Requests")
-pending_requests = db.query(AssetRequest).filter(AssetRequest.status == RequestStatus.PENDING).all()
-
-if not pending_requests:
-    st.info("No pending requests.")
-else:
-    for req in pending_requests:
-        with st.expander(f"Request #{req.id}: {req.item.manufacturer} {req.item.model} (Qty: {req.qty_requested})"):
-            col1, col2 = st.columns(2)
-            with col1:
-                st.markdown(f"**Requester:** {req.requester.username}")
-                st.markdown(f"**Date:** {req.created_at}")
-                st.markdown(f"**Purpose:** {req.purpose}")
-            with col2:
-                st.markdown(f"**Current Stock:** {req.item.qty}")
+def apply_decision(db, request_ids, decision, comments, skip_short=False):
+    success, msg = decide_requests(db, request_ids, user["id"], decision, comments, skip_short)
+    if success:
+        start_outbox_worker()
+        st.session_state.pop("batch_selected", None)
+        st.success(msg)
+        st.rerun()
+    else:
+        st.error(msg)
+
+with session_scope("Approver Portal") as db:
+    st.subheader("Pending Requests")
+
+    filter_options = get_pending_filter_options(db)
+    f1, f2, f3, f4, f5 = st.columns(5)
+    site = f1.selectbox("Site", ["All"] + filter_options["site"])
+    dept = f2.selectbox("Dept", ["All"] + filter_options["dept"])
+    item_type = f3.selectbox("Item Type", ["All"] + filter_options["item_type"])
+    requester = f4.text_input("Requester (username)").strip()
+    page_size = f5.selectbox("Per Page", [PENDING_PAGE_SIZE, 100, 250])
+    filters = {
+        "site": None if site == "All" else site,
+        "dept": None if dept == "All" else dept,
+        "item_type": None if item_type == "All" else item_type,
+        "requester": requester or None,
+    }
+
+    # Keyset cursors of the pages visited so far; reset when filters change
+    if st.session_state.get("pending_filters") != (filters, page_size):
+        st.session_state["pending_filters"] = (filters, page_size)
+        st.session_state["pending_cursors"] = [None]
+    cursors = st.session_state["pending_cursors"]
+
+    total_pending = count_pending_requests(db, **filters)
+    pending_requests = get_pending_page(db, after=cursors[-1], limit=page_size, **filters)
+    page_start = (len(cursors) - 1) * page_size
+
+    if not pending_requests and len(cursors) > 1:
+        # The last requests on this page were decided, step back a page
+        cursors.pop()
+        st.rerun()
+
+    if not pending_requests:
+        st.info("No pending requests.")
+    else:
+        st.caption(f"Showing {page_start + 1}-{page_start + len(pending_requests)} of {total_pending} pending requests")
+
+        with st.expander("📦 Batch Decision"):
+            labels = {
+                req.id: f"#{req.id}: {req.item.manufacturer} {req.item.model} (Qty: {req.qty_requested}) - {req.requester.username}"
+                for req in pending_requests
+            }
+            if st.checkbox("Select all on this page", key="batch_select_all"):
+                selected = list(labels)
+            else:
+                selected = st.multiselect("Requests", options=list(labels), format_func=labels.get, key="batch_selected")
+            batch_comments = st.text_input("Comments", key="batch_comments")
+            skip_short = st.checkbox("Leave requests that don't fit in stock pending instead of refusing the whole batch")
+            b1, b2 = st.columns([1, 1])
+            if b1.button("✅ Approve Selected", disabled=not selected):
+                apply_decision(db, selected, RequestStatus.APPROVED, batch_comments, skip_short)
+            if b2.button("❌ Reject Selected", disabled=not selected):
+                apply_decision(db, selected, RequestStatus.REJECTED, batch_comments)
+
+        for req in pending_requests:
+            with st.expander(f"Request #{req.id}: {req.item.manufacturer} {req.item.model} (Qty: {req.qty_requested})"):
+                col1, col2 = st.columns(2)
+                with col1:
+                    st.markdown(f"**Requester:** {req.requester.username}")
+                    st.markdown(f"**Date:** {req.created_at}")
+                    st.markdown(f"**Purpose:** {req.purpose}")
+                with col2:
+                    st.markdown(f"**Current Stock:** {req.item.qty}")
                 
-                # prevent approval if stock insufficient (double check)
-                if req.item.qty < req.qty_requested:
-                    st.error("⚠️ Insufficient Stock to Approve")
-                    disable_approve = True
-                else:
-                    disable_approve = False
-
-            container = st.container()
-            with container:
-                comments = st.text_input("Comments", key=f"comment_{req.id}")
-                c1, c2 = st.columns([1, 1])
+                    # prevent approval if stock insufficient (double check)
+                    if req.item.qty < req.qty_requested:
+                        st.error("⚠️ Insufficient Stock to Approve")
+                        disable_approve = True
+                    else:
+                        disable_approve = False
+
+                container = st.container()
+                with container:
+                    comments = st.text_input("Comments", key=f"comment_{req.id}")
+                    c1, c2 = st.columns([1, 1])
                 
-                if c1.button("✅ Approve", key=f"approve_{req.id}", disabled=disable_approve):
-                    # Update Request
-                    req.status = RequestStatus.APPROVED
-                    # Update Inventory
-                    req.item.qty -= req.qty_requested
-                    
-                    # Log
-                    log = ApprovalLog(
-                        request_id=req.id,
-                        approver_id=user["id"],
-                        decision="APPROVED",
-                        comments=comments,
-                        timestamp=datetime.datetime.utcnow()
-                    )
-                    db.add(log)
-                    db.commit()
-                    
-                    st.success("Request Approved")
-                    send_email_notification(req.requester.email or "user@example.com", "Request Approved", f"Your request for {req.item.model} has been approved.")
-                    st.rerun()
-
-                if c2.button("❌ Reject", key=f"reject_{req.id}"):
-                    req.status = RequestStatus.REJECTED
-                    
-                    log = ApprovalLog(
-                        request_id=req.id,
-                        approver_id=user["id"],
-                        decision="REJECTED",
-                        comments=comments,
-                        timestamp=datetime.datetime.utcnow()
-                    )
-                    db.add(log)
-                    db.commit()
-                    
-                    st.error("Request Rejected")
-                    send_email_notification(req.requester.email or "user@example.com", "Request Rejected", f"Your request for {req.item.model} has been rejected.")
-                    st.rerun()
-
-st.divider()
-st.subheader("Approval History")
-# Show logs where this user was the approver
-history = db.query(ApprovalLog).filter(ApprovalLog.approver_id == user["id"]).order_by(ApprovalLog.timestamp.desc()).limit(50).all()
-
-if history:
-    hist_data = [{
-        "Date": h.timestamp,
-        "Request ID": h.request_id,
-        "Decision": h.decision,
-        "Comments": h.comments
-    } for h in history]
-    st.dataframe(pd.DataFrame(hist_data), use_container_width=True)
-
-db.close()
+                    if c1.button("✅ Approve", key=f"approve_{req.id}", disabled=disable_approve):
+                        apply_decision(db, [req.id], RequestStatus.APPROVED, comments)
+
+                    if c2.button("❌ Reject", key=f"reject_{req.id}"):
+                        apply_decision(db, [req.id], RequestStatus.REJECTED, comments)
+
+        p1, p2 = st.columns([1, 1])
+        if p1.button("⬅️ Previous", disabled=len(cursors) == 1):
+            cursors.pop()
+            st.rerun()
+        if p2.button("Next ➡️", disabled=page_start + len(pending_requests) >= total_pending):
+            last = pending_requests[-1]
+            cursors.append((last.created_at, last.id))
+            st.rerun()
+
+    st.divider()
+    st.subheader("Approval History")
+    # Show logs where this user was the approver
+    history = get_approval_history(db, user["id"])
+
+    if history:
+        hist_data = [{
+            "Date": h.timestamp,
+            "Request ID": h.request_id,
+            "Decision": h.decision,
+            "Comments": h.comments
+        } for h in history]
+        st.dataframe(pd.DataFrame(hist_data), use_container_width=True)
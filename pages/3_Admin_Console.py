@@ -1,12 +1,22 @@
+import os
+import tempfile
 import streamlit as st
 import pandas as pd
-from database import get_db
-from models import AuditLog, UserRole
-from utils import ingest_inventory_excel
+from database import session_scope
+from session import restore_login
+from models import UserRole
+from queries import AUDIT_PAGE_SIZE, get_audit_page
+from audit import (AUDIT_ACTIONS, AUDIT_ENTITIES, AUDIT_ARCHIVE_DIR, AUDIT_RETENTION_MONTHS,
+                   archive_audit_logs, list_audit_archives)
+from utils import ingest_inventory_stream, preview_inventory_file
+from bulk_import import bulk_import_files
+from exports import EXPORT_DOWNLOAD_MAX_MB, EXPORT_TABLES, EXPORT_FORMATS, export_table
+from metrics import METRICS_FILE, metrics_since, page_summary, reset_metrics, slowest_statements, stage_summary
 
 st.set_page_config(page_title="Admin Console", page_icon="⚙️", layout="wide")
 
 def check_auth():
+    restore_login()
     if "user" not in st.session_state:
         st.warning("Please login first.")
         st.stop()
@@ -17,42 +27,207 @@ def check_auth():
 
 check_auth()
 user = st.session_state["user"]
+UPLOAD_TYPES = ["xlsx", "xls", "csv", "parquet"]
 st.title("Admin Console")
 
-tab1, tab2 = st.tabs(["📤 Upload Inventory", "📜 Audit Logs"])
+tab1, tab2, tab3, tab4 = st.tabs(["📤 Upload Inventory", "📜 Audit Logs", "📥 Export Data", "⏱️ Performance"])
 
-db = next(get_db())
-
-with tab1:
-    st.subheader("Update Inventory Data")
-    st.write("Upload an Excel file to bulk update inventory. Matches on 'Model'.")
+with session_scope("Admin Console") as db:
+    with tab1:
+        st.subheader("Update Inventory Data")
+        st.write("Upload an Excel, CSV or Parquet file to bulk update inventory. An item is a model at one site and location (rows repeating all three add up their quantities); only new and changed items are written.")
     
-    uploaded_file = st.file_uploader("Choose Excel File", type=["xlsx", "xls"])
+        uploaded_file = st.file_uploader("Choose Inventory File", type=UPLOAD_TYPES)
     
-    if uploaded_file is not None:
-        if st.button("Process File"):
-            with st.spinner("Ingesting data..."):
-                success, msg = ingest_inventory_excel(db, uploaded_file, user_id=user["id"])
+        full_export = st.checkbox("File is a full export", help="Items missing from the file are set to quantity 0.")
+        if uploaded_file is not None:
+            c1, c2 = st.columns(2)
+            if c1.button("Validate (Dry Run)"):
+                uploaded_file.seek(0)
+                preview = preview_inventory_file(db, uploaded_file)
+                if preview.missing_columns:
+                    st.error(f"Missing required column(s): {', '.join(c.title() for c in preview.missing_columns)}. "
+                             f"Columns found: {', '.join(preview.unknown_columns)}")
+                else:
+                    m1, m2, m3, m4, m5, m6, m7 = st.columns(7)
+                    m1.metric("Rows", f"{preview.rows:,}")
+                    m2.metric("Invalid", f"{len(preview.errors):,}")
+                    m3.metric("Duplicate Rows", f"{preview.duplicates:,}", help="Same model, site and location as another row: merged into one item, quantities added up")
+                    m4.metric("New Items", f"{preview.to_add:,}")
+                    m5.metric("Changed Items", f"{preview.to_update:,}")
+                    m6.metric("Unchanged Items", f"{preview.unchanged:,}", help="Not written")
+                    m7.metric("Not in File", f"{preview.not_in_file:,}", help="Zeroed if the file is a full export")
+                    if preview.unknown_columns:
+                        st.caption(f"Ignored columns: {', '.join(preview.unknown_columns)}")
+                    if len(preview.errors):
+                        st.warning("These rows will be skipped:")
+                        st.dataframe(preview.errors, use_container_width=True, hide_index=True)
+                    else:
+                        st.success("All rows are valid.")
+
+            if c2.button("Process File"):
+                uploaded_file.seek(0)
+                progress = st.progress(0.0, text="Ingesting data...")
+
+                def on_progress(rows_done, total_rows):
+                    if total_rows:
+                        progress.progress(min(rows_done / total_rows, 1.0), text=f"Ingested {rows_done:,} of {total_rows:,} rows")
+                    else:
+                        progress.progress(0.0, text=f"Ingested {rows_done:,} rows")
+
+                errors = []
+                success, msg = ingest_inventory_stream(db, uploaded_file, user_id=user["id"], progress_callback=on_progress,
+                                                       errors=errors, full_export=full_export)
+                progress.empty()
                 if success:
                     st.success(msg)
                 else:
                     st.error(msg)
+                if errors:
+                    st.dataframe(pd.concat(errors, ignore_index=True), use_container_width=True, hide_index=True)
 
-with tab2:
-    st.subheader("System Access & Action Logs")
-    logs = db.query(AuditLog).order_by(AuditLog.timestamp.desc()).limit(100).all()
-    
-    if logs:
-        log_data = [{
-            "ID": l.id,
-            "Timestamp": l.timestamp,
-            "Action": l.action,
-            "Actor": l.actor,
-            "Details": l.details
-        } for l in logs]
-        
-        st.dataframe(pd.DataFrame(log_data), use_container_width=True)
-    else:
-        st.info("No audit logs found.")
-
-db.close()
+        st.divider()
+        st.subheader("Bulk Import")
+        st.write("Import several workbooks at once, every sheet of each. Sheets are parsed in parallel and applied as one upload.")
+
+        bulk_files = st.file_uploader("Choose Inventory Files", type=UPLOAD_TYPES, accept_multiple_files=True, key="bulk_files")
+        bulk_full_export = st.checkbox("Files are a full export", key="bulk_full_export",
+                                       help="Items missing from all files are set to quantity 0.")
+        if bulk_files and st.button("Import All"):
+            progress = st.progress(0.0, text="Parsing sheets...")
+
+            def on_sheet(sheets_done, total_sheets):
+                progress.progress(sheets_done / total_sheets, text=f"Imported {sheets_done} of {total_sheets} sheets")
+
+            success, msg, results = bulk_import_files(db, bulk_files, user_id=user["id"], full_export=bulk_full_export,
+                                                      progress_callback=on_sheet)
+            progress.empty()
+            if success:
+                st.success(msg)
+            else:
+                st.error(msg)
+            st.dataframe(pd.DataFrame([{
+                "File": r.file,
+                "Sheets": r.sheets,
+                "Rows": r.rows,
+                "Added": r.added,
+                "Updated": r.updated,
+                "Skipped Rows": r.skipped,
+                "Problems": "; ".join(r.problems),
+            } for r in results]), use_container_width=True, hide_index=True)
+            for r in results:
+                if len(r.errors):
+                    with st.expander(f"Skipped rows in {r.file}"):
+                        st.dataframe(r.errors, use_container_width=True, hide_index=True)
+
+    with tab2:
+        st.subheader("System Access & Action Logs")
+        f1, f2, f3, f4 = st.columns(4)
+        action = f1.selectbox("Action", ["All"] + AUDIT_ACTIONS)
+        actor = f2.text_input("Actor (user id, or username for failed logins)").strip()
+        entity = f3.selectbox("Entity", ["All"] + AUDIT_ENTITIES)
+        entity_id = f4.number_input("Entity ID", min_value=0, value=None, step=1, disabled=entity == "All")
+        filters = {
+            "action": None if action == "All" else action,
+            "actor": actor or None,
+            "entity": None if entity == "All" else entity,
+            "entity_id": None if entity == "All" or entity_id is None else int(entity_id),
+        }
+
+        # Keyset cursors of the pages visited so far; reset when filters change
+        if st.session_state.get("audit_filters") != filters:
+            st.session_state["audit_filters"] = filters
+            st.session_state["audit_cursors"] = [None]
+        cursors = st.session_state["audit_cursors"]
+        # One extra row tells whether there is an older page
+        logs = get_audit_page(db, before=cursors[-1], limit=AUDIT_PAGE_SIZE + 1, **filters)
+        has_older = len(logs) > AUDIT_PAGE_SIZE
+        logs = logs[:AUDIT_PAGE_SIZE]
+
+        if logs:
+            log_data = [{
+                "ID": l.id,
+                "Timestamp": l.timestamp,
+                "Action": l.action,
+                "Actor": l.actor,
+                "Entity": l.entity,
+                "Entity ID": l.entity_id,
+                "Details": l.details
+            } for l in logs]
+
+            st.dataframe(pd.DataFrame(log_data), use_container_width=True, hide_index=True)
+        else:
+            st.info("No audit logs found.")
+
+        p1, p2 = st.columns([1, 1])
+        if p1.button("⬅️ Newer", disabled=len(cursors) == 1):
+            cursors.pop()
+            st.rerun()
+        if p2.button("Older ➡️", disabled=not has_older):
+            cursors.append(logs[-1].id)
+            st.rerun()
+
+        with st.expander("🗄️ Archive"):
+            st.write(f"Entries older than the last {AUDIT_RETENTION_MONTHS} months are moved to one compressed "
+                     f"file per month in `{AUDIT_ARCHIVE_DIR}`.")
+            if st.button("Archive Old Entries"):
+                with st.spinner("Archiving..."):
+                    archived = archive_audit_logs(db, actor=str(user["id"]))
+                st.success(f"Archived {sum(archived.values()):,} entries into {len(archived)} file(s).")
+            for name in list_audit_archives():
+                st.text(name)
+
+    with tab3:
+        st.subheader("Export Tables")
+        st.write("Full table exports, written in batches so large histories don't have to fit in memory.")
+        c1, c2 = st.columns(2)
+        table = c1.selectbox("Table", list(EXPORT_TABLES))
+        fmt = c2.selectbox("Format", EXPORT_FORMATS, format_func=str.upper)
+        if st.button("Prepare Export"):
+            with tempfile.TemporaryDirectory() as tmp:
+                path = os.path.join(tmp, f"{table}.{fmt}")
+                with st.spinner("Exporting..."):
+                    count = export_table(db, table, path, fmt)
+                size = os.path.getsize(path)
+                if size > EXPORT_DOWNLOAD_MAX_MB * 2**20:
+                    st.warning(f"Exported {count:,} rows, {size / 2**20:,.0f} MB: over the "
+                               f"{EXPORT_DOWNLOAD_MAX_MB} MB download limit. Run "
+                               f"`python exports.py {table} {table}.{fmt}` on the server instead.")
+                else:
+                    with open(path, "rb") as f:
+                        data = f.read()
+                    st.success(f"Exported {count:,} rows.")
+                    st.download_button(f"Download {table}.{fmt}", data, file_name=f"{table}.{fmt}",
+                                       mime="text/csv" if fmt == "csv" else "application/vnd.apache.parquet")
+
+    with tab4:
+        st.subheader("Slowest Pages and Queries")
+        st.caption(f"Measured in this app process since {pd.Timestamp(metrics_since(), unit='s'):%Y-%m-%d %H:%M} UTC"
+                   + (f", also written to `{METRICS_FILE}` for Prometheus." if METRICS_FILE else "."))
+        pages = page_summary()
+        if pages:
+            st.write("**Page runs** (time outside SQL is Python, pandas and building the page)")
+            st.dataframe(pd.DataFrame(pages), use_container_width=True, hide_index=True,
+                         column_config={c: st.column_config.NumberColumn(format="%.1f")
+                                        for c in ["p50 ms", "p95 ms", "Max ms", "Statements/run", "SQL ms/run", "SQL share %"]})
+        else:
+            st.info("No page runs recorded yet.")
+
+        order = st.radio("Queries by", ["Total ms", "Max ms", "Mean ms"], horizontal=True)
+        statements = slowest_statements(by=order)
+        if statements:
+            st.dataframe(pd.DataFrame(statements), use_container_width=True, hide_index=True,
+                         column_config={"Statement": st.column_config.TextColumn(width="large"),
+                                        **{c: st.column_config.NumberColumn(format="%.2f")
+                                           for c in ["Total ms", "Mean ms", "p95 ms", "Max ms"]}})
+
+        stages = stage_summary()
+        if stages:
+            st.write("**Inventory ingest and email stages**")
+            st.dataframe(pd.DataFrame(stages), use_container_width=True, hide_index=True,
+                         column_config={c: st.column_config.NumberColumn(format="%.1f")
+                                        for c in ["Total ms", "Mean ms", "p95 ms", "Max ms"]})
+
+        if st.button("Reset Measurements"):
+            reset_metrics()
+            st.rerun()
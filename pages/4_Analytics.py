@@ -0,0 +1,138 @@
+import datetime
+import streamlit as st
+import pandas as pd
+from database import session_scope
+from session import restore_login
+from models import RequestStatus, UserRole
+from forecast import FORECAST_HALF_LIFE_DAYS, REORDER_LEAD_DAYS, run_forecast
+from outbox import start_outbox_worker
+from queries import (
+    DEMAND_DIMENSIONS, get_status_totals, get_daily_request_counts, get_demand_by,
+    get_top_items, get_stock_summary, get_approver_latency, get_pending_filter_options,
+    get_stockout_forecast, get_last_forecast_run,
+)
+
+st.set_page_config(page_title="Analytics", page_icon="📊", layout="wide")
+
+def check_auth():
+    restore_login()
+    if "user" not in st.session_state:
+        st.warning("Please login first.")
+        st.stop()
+    user = st.session_state["user"]
+    if user["role"] not in [UserRole.APPROVER.value, UserRole.ADMIN.value]:
+        st.error("Unauthorized Access")
+        st.stop()
+
+check_auth()
+st.title("Analytics")
+
+with session_scope("Analytics") as db:
+    totals = get_status_totals(db)
+    m1, m2, m3, m4 = st.columns(4)
+    m1.metric("Total Requests", sum(count for count, _ in totals.values()))
+    for col, status in zip((m2, m3, m4), RequestStatus):
+        count, qty = totals.get(status, (0, 0))
+        col.metric(status.value.capitalize(), count, help=f"{qty:,} units")
+
+    tab1, tab2, tab3, tab4 = st.tabs(["📈 Demand", "📦 Stock", "⏱️ Approval Latency", "🔮 Stockout Forecast"])
+
+    with tab1:
+        st.subheader("Requests per Day")
+        days = st.selectbox("Period", [30, 90, 365], format_func=lambda d: f"Last {d} days")
+        since = datetime.date.today() - datetime.timedelta(days=days)
+        daily = get_daily_request_counts(db, since)
+        if daily:
+            df_daily = pd.DataFrame(daily, columns=["Day", "Status", "Requests", "Qty"])
+            df_daily["Status"] = df_daily["Status"].map(lambda s: s.value)
+            st.bar_chart(df_daily.pivot_table(index="Day", columns="Status", values="Requests", aggfunc="sum", fill_value=0))
+        else:
+            st.info("No requests in this period.")
+
+        st.subheader("Demand Breakdown")
+        dimension = st.selectbox("Group By", list(DEMAND_DIMENSIONS), format_func=str.capitalize)
+        demand = get_demand_by(db, dimension)
+        if demand:
+            st.dataframe(pd.DataFrame(demand, columns=[dimension.capitalize(), "Requests", "Pending Qty", "Approved Qty", "Rejected Qty"]),
+                         use_container_width=True)
+
+        st.subheader("Most Requested Items")
+        top = get_top_items(db)
+        if top:
+            st.dataframe(pd.DataFrame([{
+                "ID": item.id,
+                "Item": f"{item.manufacturer} {item.model}",
+                "Site": item.site,
+                "In Stock": item.qty,
+                "Pending Qty": stats.pending_qty,
+                "Approved Qty": stats.approved_qty,
+                "Requests": stats.request_count,
+            } for item, stats in top]), use_container_width=True)
+
+    with tab2:
+        st.subheader("Stock Levels")
+        stock_dimension = st.selectbox("Group By", ["site", "dept", "type"], format_func=str.capitalize, key="stock_dimension")
+        stock = get_stock_summary(db, stock_dimension)
+        if stock:
+            st.dataframe(pd.DataFrame(stock, columns=[stock_dimension.capitalize(), "Items", "Total Qty", "Out of Stock"]),
+                         use_container_width=True)
+        else:
+            st.info("No inventory loaded yet.")
+
+    with tab3:
+        st.subheader("Time to Decision per Approver")
+        latency = get_approver_latency(db)
+        if latency:
+            rows = []
+            for username, stats in latency:
+                decided = stats.approved_count + stats.rejected_count
+                rows.append({
+                    "Approver": username,
+                    "Approved": stats.approved_count,
+                    "Rejected": stats.rejected_count,
+                    "Avg Hours": round(stats.total_latency_seconds / decided / 3600, 1) if decided else None,
+                    "Max Hours": round(stats.max_latency_seconds / 3600, 1),
+                })
+            st.dataframe(pd.DataFrame(rows), use_container_width=True)
+        else:
+            st.info("No decisions recorded yet.")
+
+    with tab4:
+        st.subheader("Items Closest to Running Out")
+        last_run = get_last_forecast_run(db)
+        if last_run:
+            st.caption(f"Consumption rates from approved requests (half-life {FORECAST_HALF_LIFE_DAYS:g} days), "
+                       f"as of {last_run.ran_at:%Y-%m-%d %H:%M} UTC. Items running out within "
+                       f"{REORDER_LEAD_DAYS:g} days are mailed to the admins.")
+        if st.session_state["user"]["role"] == UserRole.ADMIN.value and st.button("Update Forecast"):
+            with st.spinner("Updating forecast..."):
+                success, msg, summary = run_forecast(db)
+            if success:
+                if summary.alerts:
+                    start_outbox_worker()
+                st.success(msg)
+                last_run = get_last_forecast_run(db)
+            else:
+                st.error(msg)
+
+        filter_options = get_pending_filter_options(db)
+        f1, f2 = st.columns(2)
+        site = f1.selectbox("Site", ["All"] + filter_options["site"], key="forecast_site")
+        dept = f2.selectbox("Dept", ["All"] + filter_options["dept"], key="forecast_dept")
+        forecast = get_stockout_forecast(db, site=None if site == "All" else site,
+                                         dept=None if dept == "All" else dept)
+        if forecast:
+            st.dataframe(pd.DataFrame([{
+                "ID": item.id,
+                "Item": f"{item.manufacturer} {item.model}",
+                "Site": item.site,
+                "Dept": item.dept,
+                "In Stock": item.qty,
+                "Units/Day": round(f.consumption_rate, 2),
+                "Days Left": round(f.days_until_stockout, 1),
+                "Alerted": f.alerted_at,
+            } for item, f in forecast]), use_container_width=True)
+        elif last_run:
+            st.info("No item is being consumed.")
+        else:
+            st.info("No forecast yet. Run `python forecast.py` (e.g. hourly from cron) or press Update Forecast.")
@@ -0,0 +1,186 @@
+"""
+Read queries used by the portal pages. Relationships the pages display
+are eager-loaded so a page render costs a fixed number of statements no
+matter how many rows it shows.
+"""
+from sqlalchemy import func, and_, or_
+from sqlalchemy.orm import Session, joinedload, contains_eager
+from models import (User, InventoryItem, AssetRequest, ApprovalLog, AuditLog, RequestStatus,
+                    ItemRequestStats, DailyRequestStats, ApproverStats, StockSummary, ItemForecast, ForecastRun)
+
+def get_user_requests(db: Session, user_id: int):
+    return (
+        db.query(AssetRequest)
+        .options(joinedload(AssetRequest.item))
+        .filter(AssetRequest.user_id == user_id)
+        .order_by(AssetRequest.created_at.desc())
+        .all()
+    )
+
+PENDING_PAGE_SIZE = 25
+AUDIT_PAGE_SIZE = 100
+
+def _filter_pending(query, site=None, dept=None, requester=None, item_type=None):
+    query = query.filter(AssetRequest.status == RequestStatus.PENDING)
+    if site:
+        query = query.filter(InventoryItem.site == site)
+    if dept:
+        query = query.filter(InventoryItem.dept == dept)
+    if item_type:
+        query = query.filter(InventoryItem.type == item_type)
+    if requester:
+        query = query.filter(User.username == requester)
+    return query
+
+def count_pending_requests(db: Session, **filters) -> int:
+    query = db.query(func.count(AssetRequest.id))
+    if filters.get("site") or filters.get("dept") or filters.get("item_type"):
+        query = query.join(AssetRequest.item)
+    if filters.get("requester"):
+        query = query.join(AssetRequest.requester)
+    return _filter_pending(query, **filters).scalar()
+
+def get_pending_page(db: Session, after=None, limit: int = PENDING_PAGE_SIZE, **filters):
+    """
+    One page of pending requests in submission order, with item and
+    requester loaded. `after` is the (created_at, id) of the last request
+    on the previous page (keyset pagination), None for the first page.
+    Filters: site, dept, item_type, requester (username).
+    """
+    query = (
+        db.query(AssetRequest)
+        .join(AssetRequest.item)
+        .join(AssetRequest.requester)
+        .options(contains_eager(AssetRequest.item), contains_eager(AssetRequest.requester))
+    )
+    query = _filter_pending(query, **filters)
+    if after is not None:
+        created_at, request_id = after
+        query = query.filter(or_(
+            AssetRequest.created_at > created_at,
+            and_(AssetRequest.created_at == created_at, AssetRequest.id > request_id),
+        ))
+    return query.order_by(AssetRequest.created_at, AssetRequest.id).limit(limit).all()
+
+def get_pending_filter_options(db: Session) -> dict:
+    """Distinct values for the pending-queue filters."""
+    options = {}
+    for key, column in (("site", InventoryItem.site), ("dept", InventoryItem.dept), ("item_type", InventoryItem.type)):
+        options[key] = [v for (v,) in db.query(column).filter(column.isnot(None)).distinct().order_by(column)]
+    return options
+
+def get_approval_history(db: Session, approver_id: int, limit: int = 50):
+    return (
+        db.query(ApprovalLog)
+        .filter(ApprovalLog.approver_id == approver_id)
+        .order_by(ApprovalLog.timestamp.desc())
+        .limit(limit)
+        .all()
+    )
+
+def get_audit_page(db: Session, before: int = None, limit: int = AUDIT_PAGE_SIZE, action: str = None,
+                   actor: str = None, entity: str = None, entity_id: int = None):
+    """
+    One page of audit entries, newest first. Paged by keyset: `before` is
+    the id of the last entry of the previous page. Every filter has an
+    (filter, id) index, so a page costs the same however deep it is and
+    however large the table grows.
+    """
+    query = db.query(AuditLog)
+    if action:
+        query = query.filter(AuditLog.action == action)
+    if actor:
+        query = query.filter(AuditLog.actor == actor)
+    if entity:
+        query = query.filter(AuditLog.entity == entity)
+    if entity_id is not None:
+        query = query.filter(AuditLog.entity_id == entity_id)
+    if before is not None:
+        query = query.filter(AuditLog.id < before)
+    return query.order_by(AuditLog.id.desc()).limit(limit).all()
+
+# Analytics page: reads only the summary tables maintained by stats.py
+
+def get_status_totals(db: Session) -> dict:
+    """{status: (request_count, qty)} over all requests."""
+    rows = (
+        db.query(DailyRequestStats.status, func.sum(DailyRequestStats.request_count), func.sum(DailyRequestStats.qty))
+        .group_by(DailyRequestStats.status)
+        .all()
+    )
+    return {status: (count or 0, qty or 0) for status, count, qty in rows}
+
+def get_daily_request_counts(db: Session, since):
+    """(day, status, request_count, qty) for requests submitted on or after `since`."""
+    return (
+        db.query(DailyRequestStats.day, DailyRequestStats.status, DailyRequestStats.request_count, DailyRequestStats.qty)
+        .filter(DailyRequestStats.day >= since)
+        .order_by(DailyRequestStats.day)
+        .all()
+    )
+
+DEMAND_DIMENSIONS = {"site": InventoryItem.site, "dept": InventoryItem.dept, "type": InventoryItem.type}
+
+def get_demand_by(db: Session, dimension: str):
+    """
+    Requested quantities per site, dept or type: (value, requests,
+    pending_qty, approved_qty, rejected_qty). Joins the per-item summary
+    to inventory_items, so the cost follows the catalog size.
+    """
+    column = DEMAND_DIMENSIONS[dimension]
+    return (
+        db.query(column,
+                 func.sum(ItemRequestStats.request_count),
+                 func.sum(ItemRequestStats.pending_qty),
+                 func.sum(ItemRequestStats.approved_qty),
+                 func.sum(ItemRequestStats.rejected_qty))
+        .join(InventoryItem, InventoryItem.id == ItemRequestStats.item_id)
+        .group_by(column)
+        .order_by(func.sum(ItemRequestStats.approved_qty + ItemRequestStats.pending_qty).desc())
+        .all()
+    )
+
+def get_top_items(db: Session, limit: int = 20):
+    """Items with the most approved plus pending quantity, with their stats row."""
+    return (
+        db.query(InventoryItem, ItemRequestStats)
+        .join(ItemRequestStats, ItemRequestStats.item_id == InventoryItem.id)
+        .order_by((ItemRequestStats.approved_qty + ItemRequestStats.pending_qty).desc())
+        .limit(limit)
+        .all()
+    )
+
+def get_stock_summary(db: Session, dimension: str):
+    """(value, items, total_qty, out_of_stock) per site, dept or type."""
+    column = getattr(StockSummary, dimension)
+    return (
+        db.query(column, func.sum(StockSummary.item_count), func.sum(StockSummary.total_qty),
+                 func.sum(StockSummary.out_of_stock))
+        .group_by(column)
+        .order_by(column)
+        .all()
+    )
+
+def get_approver_latency(db: Session):
+    return (
+        db.query(User.username, ApproverStats)
+        .join(ApproverStats, ApproverStats.approver_id == User.id)
+        .order_by(User.username)
+        .all()
+    )
+
+def get_stockout_forecast(db: Session, limit: int = 50, site: str = None, dept: str = None):
+    """(item, forecast) pairs for the items closest to running out, as of the last forecast run."""
+    query = (
+        db.query(InventoryItem, ItemForecast)
+        .join(ItemForecast, ItemForecast.item_id == InventoryItem.id)
+        .filter(ItemForecast.days_until_stockout.isnot(None))
+    )
+    if site:
+        query = query.filter(InventoryItem.site == site)
+    if dept:
+        query = query.filter(InventoryItem.dept == dept)
+    return query.order_by(ItemForecast.days_until_stockout).limit(limit).all()
+
+def get_last_forecast_run(db: Session):
+    return db.query(ForecastRun).order_by(ForecastRun.id.desc()).first()
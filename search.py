@@ -0,0 +1,144 @@
+"""
+In-memory search over inventory items: an inverted index with ranked
+prefix matching and trigram-based fuzzy matching for typos. The index
+is built together with the cached catalog (catalog.py) and rebuilt with
+it after ingest; approvals leave it as is and the catalog skips hits on
+items that ran out.
+"""
+import heapq
+import re
+from bisect import bisect_left
+from collections import defaultdict
+
+# Field weights; a hit on the model counts more than one on the site
+SEARCH_FIELDS = {
+    "model": 3.0,
+    "manufacturer": 2.0,
+    "type": 1.5,
+    "description": 1.5,
+    "sum_description": 1.0,
+    "location": 0.5,
+    "site": 0.5,
+}
+PREFIX_FACTOR = 0.7
+FUZZY_FACTOR = 0.5
+FUZZY_MIN_SIMILARITY = 0.4
+SEARCH_LIMIT = 50
+
+_TOKEN_RE = re.compile(r"[a-z0-9]+")
+
+def tokenize(value) -> list:
+    if value is None:
+        return []
+    text = str(value).lower()
+    tokens = _TOKEN_RE.findall(text)
+    # "YS-10CV610" is also findable as "ys10cv610"
+    joined = "".join(tokens)
+    if len(tokens) > 1:
+        tokens.append(joined)
+    return tokens
+
+def _trigrams(token: str) -> set:
+    padded = f"  {token} "
+    return {padded[i:i + 3] for i in range(len(padded) - 2)}
+
+class SearchIndex:
+    def __init__(self, docs):
+        """docs: iterable of (item_id, {field: value}) with fields from SEARCH_FIELDS."""
+        self.postings = defaultdict(dict)  # token -> {item_id: weight}
+        self.doc_tokens = defaultdict(dict)  # item_id -> {token: weight}
+        for item_id, fields in docs:
+            doc = self.doc_tokens[item_id]
+            for field, weight in SEARCH_FIELDS.items():
+                for token in tokenize(fields.get(field)):
+                    if doc.get(token, 0) < weight:
+                        doc[token] = weight
+                        self.postings[token][item_id] = weight
+        self.tokens = sorted(self.postings)
+        self.trigrams = defaultdict(set)
+        self.gram_counts = {}
+        for token in self.tokens:
+            grams = _trigrams(token)
+            self.gram_counts[token] = len(grams)
+            for gram in grams:
+                self.trigrams[gram].add(token)
+
+    def __len__(self):
+        return len(self.doc_tokens)
+
+    def _prefix_range(self, term):
+        # Tokens are [a-z0-9], so "{" sorts after every token starting with `term`
+        return bisect_left(self.tokens, term), bisect_left(self.tokens, term + "{")
+
+    def _fuzzy_tokens(self, term) -> dict:
+        if len(term) < 3 or term.isdigit():
+            # Numbers are not misspelled words: fuzzy "0012" would match every part number
+            return {}
+        grams = _trigrams(term)
+        shared = defaultdict(int)
+        for gram in grams:
+            for token in self.trigrams.get(gram, ()):
+                shared[token] += 1
+        matches = {}
+        for token, count in shared.items():
+            similarity = count / (len(grams) + self.gram_counts[token] - count)
+            if similarity >= FUZZY_MIN_SIMILARITY:
+                matches[token] = FUZZY_FACTOR * similarity
+        return matches
+
+    def _scan(self, term, lo, hi) -> dict:
+        """Best score per item over every token matching `term`."""
+        if lo < hi:
+            matches = ((t, 1.0 if t == term else PREFIX_FACTOR) for t in self.tokens[lo:hi])
+        else:
+            matches = self._fuzzy_tokens(term).items()
+        scores = {}
+        for token, factor in matches:
+            for item_id, weight in self.postings[token].items():
+                score = weight * factor
+                if score > scores.get(item_id, 0):
+                    scores[item_id] = score
+        return scores
+
+    def _rescore(self, term, exists, candidates) -> dict:
+        """Like _scan, restricted to `candidates` via their own tokens."""
+        fuzzy = None if exists else self._fuzzy_tokens(term)
+        scores = {}
+        for item_id in candidates:
+            best = 0
+            for token, weight in self.doc_tokens[item_id].items():
+                if fuzzy is not None:
+                    factor = fuzzy.get(token, 0)
+                elif token.startswith(term):
+                    factor = 1.0 if token == term else PREFIX_FACTOR
+                else:
+                    continue
+                best = max(best, weight * factor)
+            if best:
+                scores[item_id] = best
+        return scores
+
+    def search(self, query: str, limit: int = SEARCH_LIMIT) -> list:
+        """
+        Returns up to `limit` (item_id, score) pairs, best first. Every
+        query term has to match (exactly, as a prefix, or fuzzily).
+        """
+        terms = _TOKEN_RE.findall(query.lower())
+        if not terms:
+            return []
+        # Most selective term first (fuzzy terms last); the rest only
+        # rescore the items that are still in the running
+        ranges = sorted(((term, *self._prefix_range(term)) for term in terms),
+                        key=lambda r: r[2] - r[1] or len(self.tokens))
+        totals = None
+        for term, lo, hi in ranges:
+            if totals is None or len(totals) >= hi - lo > 0:
+                scores = self._scan(term, lo, hi)
+                if totals is not None:
+                    scores = {i: s for i, s in scores.items() if i in totals}
+            else:
+                scores = self._rescore(term, lo < hi, totals)
+            totals = scores if totals is None else {i: totals[i] + s for i, s in scores.items()}
+            if not totals:
+                return []
+        return heapq.nlargest(limit, totals.items(), key=lambda kv: (kv[1], -kv[0]))
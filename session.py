@@ -0,0 +1,71 @@
+"""
+Keeps a login across browser tabs. The page URL carries a short-lived,
+single-use session token (see auth.issue_session_token); a new tab
+opened on that URL redeems it instead of asking for the password again,
+so it never pays the bcrypt cost, and gets a token of its own. The login
+itself lives in st.session_state, so a token left in the browser history
+or a shared link stops working once redeemed or expired.
+"""
+import time
+import streamlit as st
+from database import session_scope
+from auth import (SESSION_TTL_SECONDS, issue_session_token, reissue_session_token, resume_session,
+                  revoke_session_token, token_expires_at)
+from audit import record
+
+TOKEN_PARAM = "session"
+
+def _show_token(token):
+    st.session_state["session_token"] = token
+    st.query_params[TOKEN_PARAM] = token
+
+def remember_login(user):
+    """Call right after authenticate_user succeeds (with the session still open)."""
+    _show_token(issue_session_token(user))
+
+def restore_login():
+    """
+    Call at the top of every page, before checking st.session_state["user"].
+    Redeems the URL token of a new tab. A logged-in tab puts its token
+    back in the URL when page navigation dropped it, and replaces (and
+    revokes) it once it is past half its lifetime.
+    """
+    if "user" in st.session_state:
+        token = st.session_state.get("session_token")
+        if not token:
+            return
+        if token_expires_at(token) - time.time() < SESSION_TTL_SECONDS / 2:
+            with session_scope() as db:
+                token = reissue_session_token(db, st.session_state["user"]["id"], previous=token)
+            if token:
+                _show_token(token)
+            else:
+                st.session_state.pop("session_token", None)
+                st.query_params.pop(TOKEN_PARAM, None)
+        elif st.query_params.get(TOKEN_PARAM) != token:
+            st.query_params[TOKEN_PARAM] = token
+        return
+
+    token = st.query_params.get(TOKEN_PARAM)
+    if not token:
+        return
+    with session_scope() as db:
+        resumed = resume_session(db, token)
+    if resumed:
+        st.session_state["user"], token = resumed
+        _show_token(token)
+    else:
+        del st.query_params[TOKEN_PARAM]
+
+def forget_login():
+    token = st.session_state.pop("session_token", None)
+    user = st.session_state.pop("user", None)
+    st.query_params.pop(TOKEN_PARAM, None)
+    if not (token or user):
+        return
+    with session_scope() as db:
+        if user:
+            record(db, "LOGOUT", str(user["id"]), "user", user["id"])
+            db.commit()
+        if token:
+            revoke_session_token(db, token)
@@ -0,0 +1,169 @@
+"""
+Summary tables behind the Analytics page. They are updated in the same
+transaction as the change they summarize (submission, approve/reject,
+ingest), so the dashboard reads a handful of small tables instead of
+scanning asset_requests.
+
+    python stats.py    # rebuild every summary from scratch
+"""
+import datetime
+from collections import defaultdict
+from sqlalchemy import case, delete, func, insert, select, update
+from models import (AssetRequest, ApprovalLog, InventoryItem, RequestStatus,
+                    ItemRequestStats, DailyRequestStats, ApproverStats, StockSummary)
+
+REBUILD_BATCH_SIZE = 10000
+
+def _bump(db, model, key: dict, deltas: dict, maxima: dict = None):
+    """
+    Adds `deltas` to the row identified by `key` (and raises `maxima`
+    columns to at least the given value), inserting the row if needed.
+    On SQLite the UPDATE already holds the write lock, so the INSERT
+    can't race another writer.
+    """
+    table = model.__table__
+    values = {col: table.c[col] + delta for col, delta in deltas.items()}
+    for col, value in (maxima or {}).items():
+        values[col] = case((table.c[col] < value, value), else_=table.c[col])
+    result = db.execute(
+        update(table).where(*[table.c[col] == val for col, val in key.items()]).values(values)
+    )
+    if result.rowcount == 0:
+        db.execute(insert(table).values(**key, **deltas, **(maxima or {})))
+
+def _dims(item) -> dict:
+    return {"site": item.site or "", "dept": item.dept or "", "type": item.type or ""}
+
+def record_submission(db, request: AssetRequest):
+    """Counts a new pending request. Call before committing it."""
+    day = (request.created_at or datetime.datetime.utcnow()).date()
+    _bump(db, ItemRequestStats, {"item_id": request.item_id},
+          {"request_count": 1, "pending_qty": request.qty_requested})
+    _bump(db, DailyRequestStats, {"day": day, "status": RequestStatus.PENDING},
+          {"request_count": 1, "qty": request.qty_requested})
+
+def record_decisions(db, requests, decision: RequestStatus, approver_id: int, decided_at: datetime.datetime):
+    """
+    Moves decided requests out of the pending figures and into the
+    decision's, and adds their latency to the approver's. One UPDATE per
+    item and per submission day, whatever the batch size.
+    """
+    qty_col = "approved_qty" if decision == RequestStatus.APPROVED else "rejected_qty"
+    per_item = defaultdict(int)
+    per_day = defaultdict(lambda: [0, 0])
+    latencies = []
+    for req in requests:
+        per_item[req.item_id] += req.qty_requested
+        day = per_day[req.created_at.date()]
+        day[0] += 1
+        day[1] += req.qty_requested
+        latencies.append((decided_at - req.created_at).total_seconds())
+
+    for item_id, qty in per_item.items():
+        _bump(db, ItemRequestStats, {"item_id": item_id}, {"pending_qty": -qty, qty_col: qty})
+    for day, (count, qty) in per_day.items():
+        _bump(db, DailyRequestStats, {"day": day, "status": RequestStatus.PENDING},
+              {"request_count": -count, "qty": -qty})
+        _bump(db, DailyRequestStats, {"day": day, "status": decision},
+              {"request_count": count, "qty": qty})
+    count_col = "approved_count" if decision == RequestStatus.APPROVED else "rejected_count"
+    _bump(db, ApproverStats, {"approver_id": approver_id},
+          {count_col: len(latencies), "total_latency_seconds": sum(latencies)},
+          maxima={"max_latency_seconds": max(latencies)})
+
+def record_stock_taken(db, quantities: dict):
+    """
+    Applies stock decrements ({item_id: qty}, already reserved) to the
+    stock summary, counting items that just ran out.
+    """
+    items = db.execute(
+        select(InventoryItem.id, InventoryItem.site, InventoryItem.dept, InventoryItem.type, InventoryItem.qty)
+        .where(InventoryItem.id.in_(list(quantities)))
+    ).all()
+    per_group = defaultdict(lambda: [0, 0])
+    for item in items:
+        group = per_group[tuple(_dims(item).items())]
+        group[0] -= quantities[item.id]
+        group[1] += 1 if item.qty == 0 else 0
+    for key, (qty, emptied) in per_group.items():
+        _bump(db, StockSummary, dict(key), {"total_qty": qty, "out_of_stock": emptied})
+
+def refresh_stock_summary(db):
+    """Recomputes the stock summary after an ingest (one GROUP BY over inventory_items)."""
+    site = func.coalesce(InventoryItem.site, "")
+    dept = func.coalesce(InventoryItem.dept, "")
+    item_type = func.coalesce(InventoryItem.type, "")
+    rows = db.execute(
+        select(site, dept, item_type, func.count(), func.coalesce(func.sum(InventoryItem.qty), 0),
+               func.sum(case((func.coalesce(InventoryItem.qty, 0) <= 0, 1), else_=0)))
+        .group_by(site, dept, item_type)
+    ).all()
+    db.execute(delete(StockSummary))
+    if rows:
+        db.execute(insert(StockSummary), [{
+            "site": r[0], "dept": r[1], "type": r[2],
+            "item_count": r[3], "total_qty": r[4], "out_of_stock": r[5],
+        } for r in rows])
+
+def rebuild_stats(db):
+    """
+    Recomputes every summary from the base tables. Only needed once for
+    databases that predate the summaries (see migrations.upgrade_schema);
+    afterwards they are maintained incrementally.
+    """
+    for model in (ItemRequestStats, DailyRequestStats, ApproverStats):
+        db.execute(delete(model))
+
+    items = db.execute(
+        select(AssetRequest.item_id, func.count(),
+               *[func.coalesce(func.sum(case((AssetRequest.status == status, AssetRequest.qty_requested), else_=0)), 0)
+                 for status in (RequestStatus.PENDING, RequestStatus.APPROVED, RequestStatus.REJECTED)])
+        .where(AssetRequest.item_id.is_not(None))
+        .group_by(AssetRequest.item_id)
+    ).all()
+    if items:
+        db.execute(insert(ItemRequestStats), [{
+            "item_id": r[0], "request_count": r[1], "pending_qty": r[2], "approved_qty": r[3], "rejected_qty": r[4],
+        } for r in items])
+
+    # Days and latencies are derived in Python, date arithmetic differs per backend
+    per_day = defaultdict(lambda: [0, 0])
+    rows = db.execute(
+        select(AssetRequest.created_at, AssetRequest.status, AssetRequest.qty_requested)
+        .execution_options(yield_per=REBUILD_BATCH_SIZE)
+    )
+    for created_at, status, qty in rows:
+        day = per_day[(created_at.date(), status)]
+        day[0] += 1
+        day[1] += qty or 0
+    if per_day:
+        db.execute(insert(DailyRequestStats), [{
+            "day": day, "status": status, "request_count": count, "qty": qty,
+        } for (day, status), (count, qty) in per_day.items()])
+
+    per_approver = defaultdict(lambda: {"approved_count": 0, "rejected_count": 0,
+                                        "total_latency_seconds": 0.0, "max_latency_seconds": 0.0})
+    rows = db.execute(
+        select(ApprovalLog.approver_id, ApprovalLog.decision, ApprovalLog.timestamp, AssetRequest.created_at)
+        .join(AssetRequest, AssetRequest.id == ApprovalLog.request_id)
+        .execution_options(yield_per=REBUILD_BATCH_SIZE)
+    )
+    for approver_id, decision, decided_at, created_at in rows:
+        stats = per_approver[approver_id]
+        stats["approved_count" if decision == RequestStatus.APPROVED.value else "rejected_count"] += 1
+        latency = (decided_at - created_at).total_seconds()
+        stats["total_latency_seconds"] += latency
+        stats["max_latency_seconds"] = max(stats["max_latency_seconds"], latency)
+    if per_approver:
+        db.execute(insert(ApproverStats), [{"approver_id": approver_id, **stats}
+                                           for approver_id, stats in per_approver.items()])
+
+    refresh_stock_summary(db)
+
+if __name__ == "__main__":
+    from database import session_scope
+
+    with session_scope() as db:
+        rebuild_stats(db)
+        db.commit()
+    print("Rebuilt summary tables.")
@@ -0,0 +1,46 @@
+"""
+Stock reservation. Decrements are conditional UPDATEs evaluated by the
+database, so concurrent approvals can't drive stock negative no matter
+how stale the caller's view of InventoryItem.qty is. On Postgres the
+UPDATE takes the row lock and re-checks the condition, on SQLite writers
+are serialized.
+"""
+from sqlalchemy import update
+from sqlalchemy.orm import Session
+from models import InventoryItem, AssetRequest, RequestStatus
+
+def reserve_stock(db: Session, item_id: int, qty: int) -> bool:
+    """
+    Takes qty units of an item if they are available. Returns False (and
+    changes nothing) when stock is insufficient. The item's content_hash
+    is cleared: it no longer matches the last upload, so re-uploading the
+    same sheet restores the listed quantity instead of skipping the item.
+    """
+    result = db.execute(
+        update(InventoryItem)
+        .where(InventoryItem.id == item_id, InventoryItem.qty >= qty)
+        .values(qty=InventoryItem.qty - qty, content_hash=None)
+        .execution_options(synchronize_session=False)
+    )
+    return result.rowcount == 1
+
+def reserve_stock_batch(db: Session, quantities: dict) -> list:
+    """
+    Reserves {item_id: qty} and returns the item ids that couldn't be
+    covered. Items that could are already decremented; the caller decides
+    whether to commit or roll back.
+    """
+    return [item_id for item_id, qty in quantities.items() if not reserve_stock(db, item_id, qty)]
+
+def transition_pending(db: Session, request_ids, status: RequestStatus) -> int:
+    """
+    Moves requests out of PENDING, skipping any another approver already
+    decided. Returns the number of requests moved.
+    """
+    result = db.execute(
+        update(AssetRequest)
+        .where(AssetRequest.id.in_(list(request_ids)), AssetRequest.status == RequestStatus.PENDING)
+        .values(status=status)
+        .execution_options(synchronize_session=False)
+    )
+    return result.rowcount
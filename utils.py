@@ -1,173 +1,544 @@
+import secrets
+import time
+import numpy as np
 import pandas as pd
+from sqlalchemy import and_, or_, select
 from sqlalchemy.orm import Session
-from models import InventoryItem, AuditLog
-import smtplib
-from email.mime.text import MIMEText
-from email.mime.multipart import MIMEMultipart
-import os
-import json
+from models import InventoryItem, IngestUploadItem
+from audit import record
+from collections import namedtuple
 from datetime import datetime
-import streamlit as st
+from mailer import get_transport
+from email_templates import render_email
+from catalog import invalidate_catalog
+from stats import refresh_stock_summary
+from metrics import timed
+from validation import (NA_STRINGS, ERROR_COLUMNS, INVENTORY_COLUMNS, ITEM_KEY, validate_inventory_frame, content_hash,
+                        content_hashes, item_keys, key_label)
 
-def ingest_inventory_excel(db: Session, file, user_id=None):
-    try:
-        df = pd.read_excel(file)
-        # Expected columns mapping
-        column_map = {
-            "Type": "type", "Manufacturer": "manufacturer", "Model ": "model",
-            "Description": "description", "Sum-Description": "sum_description",
-            "QTY": "qty", "Head Configuration": "head_configuration",
-            "Dept": "dept", "Status": "status", "Area": "area",
-            "Location": "location", "Site": "site"
-        }
-        
-        added_count = 0
-        updated_count = 0
-        
-        for _, row in df.iterrows():
-            # Check for existing item (composite key could be Manufacturer + Model + Serial, but we lack Serial)
-            # Assuming Manufacturer + Model is unique-ish for this logic, or just adding all.
-            # Plan says "Insert or update". Let's assume Model is key.
-            
-            model_val = str(row.get("Model ", "")).strip()
-            if not model_val or model_val == "nan":
+BULK_BATCH_SIZE = 5000
+# Items listed per kind (added/updated/removed) in an upload's audit entry
+DIFF_LIMIT = 500
+# Rows an upload left in ingest_upload_items because its process died are dropped after this
+UPLOAD_STALE_HOURS = 24
+
+IngestPreview = namedtuple("IngestPreview", ["rows", "valid", "duplicates", "to_add", "to_update", "unchanged",
+                                             "not_in_file", "errors", "unknown_columns", "missing_columns"])
+
+def _chunks(rows, size):
+    for i in range(0, len(rows), size):
+        yield rows[i:i + size]
+
+def load_existing_items(db: Session) -> dict:
+    """
+    Returns {(model, site, location): (item_id, content_hash)} for every
+    item. Keys are unique (migrations.merge_duplicate_items merges older
+    databases); setdefault keeps the first id regardless.
+    """
+    existing = {}
+    key_columns = [getattr(InventoryItem, c) for c in ITEM_KEY]
+    query = db.query(InventoryItem.id, InventoryItem.content_hash, *key_columns)
+    for item_id, item_hash, *key in query.order_by(InventoryItem.id):
+        existing.setdefault(tuple(key), (item_id, item_hash))
+    return existing
+
+# An item as stored, and as the upload in progress has left it so far (see find_items)
+StoredItem = namedtuple("StoredItem", ["id", "content_hash", "seen", "added", "original_hash", "upload_qty"])
+
+def find_items(db: Session, keys, upload: "IngestUpload" = None) -> dict:
+    """
+    Returns {key: StoredItem} for those of `keys` (ITEM_KEY tuples) that
+    are in the inventory, looked up by their model (the leading column of
+    the natural key index) in batches. With an upload, items it has
+    already written come back with seen=True and their state in it.
+    """
+    wanted = set(keys)
+    key_columns = [getattr(InventoryItem, c) for c in ITEM_KEY]
+    columns = [InventoryItem.id, InventoryItem.content_hash, *key_columns]
+    if upload is None:
+        query = db.query(*columns)
+    else:
+        query = db.query(*columns, IngestUploadItem.added, IngestUploadItem.original_hash, IngestUploadItem.qty) \
+            .outerjoin(IngestUploadItem, and_(IngestUploadItem.upload_id == upload.id,
+                                              IngestUploadItem.item_id == InventoryItem.id))
+    found = {}
+    for batch in _chunks(list({key[0] for key in wanted}), 500):
+        for item_id, item_hash, *rest in query.filter(key_columns[0].in_(batch)).order_by(InventoryItem.id):
+            key = tuple(rest[:len(ITEM_KEY)])
+            if key not in wanted or key in found:
                 continue
-                
-            existing_item = db.query(InventoryItem).filter(InventoryItem.model == model_val).first()
-            
-            item_data = {
-                "type": row.get("Type"),
-                "manufacturer": row.get("Manufacturer"),
-                "model": model_val,
-                "description": row.get("Description"),
-                "sum_description": row.get("Sum-Description"),
-                "qty": int(row.get("QTY", 0)) if pd.notna(row.get("QTY")) else 0,
-                "head_configuration": str(row.get("Head Configuration")) if pd.notna(row.get("Head Configuration")) else None,
-                "dept": row.get("Dept"),
-                "status": row.get("Status"),
-                "area": row.get("Area"),
-                "location": row.get("Location"),
-                "site": row.get("Site")
-            }
-            
-            if existing_item:
-                for key, value in item_data.items():
-                    setattr(existing_item, key, value)
-                updated_count += 1
+            added, original_hash, qty = rest[len(ITEM_KEY):] if upload is not None else (None, None, None)
+            found[key] = StoredItem(item_id, item_hash, qty is not None, bool(added), original_hash, qty)
+    return found
+
+class IngestUpload:
+    """
+    The items one upload has written so far, kept in the
+    ingest_upload_items table rather than in memory, so an upload spread
+    over chunks or sheets needs the same memory however large it is: a
+    key repeated by a later chunk adds to the quantity written before and
+    counts once, and a full export zeroes the items it never wrote. Call
+    discard() (and commit) when the upload ends, whether it succeeded or not.
+    """
+    def __init__(self):
+        # Unix time first, so rows of an upload whose process died can be told apart
+        self.id = int(time.time()) * 10**6 + secrets.randbelow(10**6)
+
+    def mark(self, db: Session, keys, qtys, stored: dict, inserted: dict):
+        """Call after writing a chunk's collapsed items; `stored` as passed to IngestDiff.observe."""
+        first, again = [], []
+        for key, qty in zip(keys, qtys):
+            item = stored.get(key)
+            if item is None:
+                first.append({"upload_id": self.id, "item_id": inserted[key].id, "added": True,
+                              "original_hash": None, "qty": int(qty)})
+            elif item.seen:
+                again.append({"upload_id": self.id, "item_id": item.id, "qty": int(qty)})
             else:
-                new_item = InventoryItem(**item_data)
-                db.add(new_item)
-                added_count += 1
-        
-        # Log action
-        log = AuditLog(
-            action="INVENTORY_UPLOAD",
-            actor=str(user_id) if user_id else "SYSTEM",
-            details=json.dumps({"added": added_count, "updated": updated_count})
-        )
-        db.add(log)
+                first.append({"upload_id": self.id, "item_id": item.id, "added": False,
+                              "original_hash": item.content_hash, "qty": int(qty)})
+        if first:
+            db.execute(IngestUploadItem.__table__.insert(), first)
+        db.bulk_update_mappings(IngestUploadItem, again)
+
+    def discard(self, db: Session):
+        """Drops this upload's rows, and those left by uploads whose process died."""
+        stale = int(time.time() - UPLOAD_STALE_HOURS * 3600) * 10**6
+        db.query(IngestUploadItem).filter(
+            or_(IngestUploadItem.upload_id == self.id, IngestUploadItem.upload_id < stale)
+        ).delete(synchronize_session=False)
+
+class IngestDiff:
+    """
+    What an upload changed, for the audit log. Items are compared as they
+    were before the upload and as it leaves them, so an item written by
+    several chunks counts once. Everything is counted, but only the first
+    `limit` added and removed items (as key_label()s) and the column-level
+    old/new values of the first `limit` updated items are kept.
+    """
+    def __init__(self, limit: int = DIFF_LIMIT):
+        self.limit = limit
+        self.totals = {"added": 0, "updated": 0, "unchanged": 0, "removed": 0}
+        self.new = []  # Keys of the first added items
+        self.removed = []  # Keys of the first zeroed items
+        self.before = {}  # key -> values before this upload
+        self.after = {}  # key -> values written last
+
+    def observe(self, keys, hashes, stored: dict):
+        """Call with each chunk's collapsed items and find_items() for them, before writing them."""
+        for key, item_hash in zip(keys, hashes):
+            item = stored.get(key)
+            if item is None:
+                self.totals["added"] += 1
+                if len(self.new) < self.limit:
+                    self.new.append(key)
+            elif item.added:
+                continue
+            elif not item.seen:
+                self.totals["updated" if item_hash != item.content_hash else "unchanged"] += 1
+            else:
+                # Counted by an earlier chunk, which may have decided otherwise
+                was = item.content_hash != item.original_hash
+                now = item_hash != item.original_hash
+                if was != now:
+                    self.totals["updated" if was else "unchanged"] -= 1
+                    self.totals["updated" if now else "unchanged"] += 1
+
+    def record_updates(self, db: Session, rows: list):
+        """Call before writing `rows` (update mappings with id) of items that predate the upload."""
+        keyed = [(tuple(r[c] for c in ITEM_KEY), r) for r in rows]
+        for key, row in keyed:
+            if key in self.after:
+                self.after[key] = row
+        wanted = [(k, r) for k, r in keyed if k not in self.after]
+        wanted = wanted[:max(self.limit - len(self.before), 0)]
+        columns = [getattr(InventoryItem, c) for c in INVENTORY_COLUMNS]
+        for batch in _chunks(wanted, 500):
+            by_id = {r["id"]: (k, r) for k, r in batch}
+            for item_id, *values in db.query(InventoryItem.id, *columns).filter(InventoryItem.id.in_(list(by_id))):
+                key, row = by_id[item_id]
+                self.before[key] = dict(zip(INVENTORY_COLUMNS, values))
+                self.after[key] = row
+
+    def record_removed(self, keys: list):
+        self.totals["removed"] += len(keys)
+        self.removed.extend(keys[:max(self.limit - len(self.removed), 0)])
+
+    def counts(self) -> dict:
+        return dict(self.totals)
+
+    def changes(self) -> dict:
+        """{key: {column: [old, new]}} for the updated items kept."""
+        changes = {}
+        for key, old in self.before.items():
+            new = self.after[key]
+            columns = {c: [old[c], new[c]] for c in INVENTORY_COLUMNS if old[c] != new[c]}
+            if columns:
+                changes[key] = columns
+        return changes
+
+    def details(self, **extra) -> dict:
+        counts = self.counts()
+        return {
+            **counts,
+            **extra,
+            "diff": {
+                "added": sorted(key_label(k) for k in self.new),
+                "updated": {key_label(k): columns for k, columns in self.changes().items()},
+                "removed": [key_label(k) for k in self.removed],
+            },
+            "truncated": counts["added"] > len(self.new) or counts["removed"] > len(self.removed)
+                         or counts["updated"] > len(self.before),
+        }
+
+def collapse_inventory_items(mapped: pd.DataFrame, upload_qty: dict = None) -> pd.DataFrame:
+    """
+    Reduces mapped rows to one row per item (validation.ITEM_KEY):
+    quantities of rows sharing a key add up, the last row wins for
+    everything else. `upload_qty` carries running per-key totals across
+    the chunks of a single upload.
+    """
+    # Dicts rather than groupby, which would drop keys with a missing site or location
+    qty = {}
+    last = {}
+    for i, (key, q) in enumerate(zip(item_keys(mapped), mapped["qty"])):
+        qty[key] = qty.get(key, 0) + int(q)
+        last[key] = i
+    items = mapped.iloc[sorted(last.values())].reset_index(drop=True)
+    items["qty"] = [qty[key] + (upload_qty.get(key, 0) if upload_qty is not None else 0) for key in item_keys(items)]
+    return items.astype(object)
+
+def upsert_inventory_frame(db: Session, df: pd.DataFrame, batch_size: int = BULK_BATCH_SIZE,
+                           upload: IngestUpload = None, errors: list = None, diff: IngestDiff = None):
+    """
+    Set-based insert-or-update of a raw inventory sheet, keyed on
+    validation.ITEM_KEY (model, site and location).
+    Rows failing validation are skipped; their error report (a DataFrame,
+    see validation.py) is appended to `errors`. The valid rows go through
+    upsert_inventory_items. Returns (added_count, updated_count) in items.
+    """
+    with timed("ingest: validate"):
+        report = validate_inventory_frame(df)
+    if report.missing_columns:
+        raise ValueError(f"Missing required column(s): {', '.join(c.title() for c in report.missing_columns)}")
+    if errors is not None and len(report.errors):
+        errors.append(report.errors)
+    with timed("ingest: write items"):
+        return upsert_inventory_items(db, report.items, batch_size, upload, diff)
+
+def upsert_inventory_items(db: Session, mapped: pd.DataFrame, batch_size: int = BULK_BATCH_SIZE,
+                           upload: IngestUpload = None, diff: IngestDiff = None):
+    """
+    Writes validated rows (ValidationReport.items). The stored items they
+    match are looked up by key for these rows only. Items whose content
+    hash matches the stored one are left alone, so re-uploading an
+    unchanged export writes nothing; inserts and updates are applied in
+    batches and recorded in `diff`. Pass the same `upload` for every chunk
+    of one upload. Returns (added_count, updated_count) in items.
+    """
+    if mapped.empty:
+        return 0, 0
+
+    stored = find_items(db, item_keys(mapped), upload)
+    items = collapse_inventory_items(mapped, {key: s.upload_qty for key, s in stored.items() if s.seen})
+    items["content_hash"] = content_hashes(items)
+    keys = item_keys(items)
+    found = [stored.get(key) for key in keys]
+    is_existing = np.array([s is not None for s in found], dtype=bool)
+    to_insert = items[~is_existing]
+    matched = [s for s in found if s is not None]
+    changed = items["content_hash"].to_numpy()[is_existing] != np.array([s.content_hash for s in matched], dtype=object)
+    to_update = [s for s, c in zip(matched, changed) if c]
+
+    update_rows = items[is_existing][changed].to_dict("records")
+    for row, item in zip(update_rows, to_update):
+        row["id"] = item.id
+
+    if diff is not None:
+        diff.observe(keys, items["content_hash"], stored)
+        diff.record_updates(db, [row for row, item in zip(update_rows, to_update) if not item.added])
+
+    for batch in _chunks(to_insert.to_dict("records"), batch_size):
+        db.bulk_insert_mappings(InventoryItem, batch)
+    for batch in _chunks(update_rows, batch_size):
+        db.bulk_update_mappings(InventoryItem, batch)
+
+    if upload is not None:
+        inserted = find_items(db, item_keys(to_insert)) if len(to_insert) else {}
+        upload.mark(db, keys, items["qty"], stored, inserted)
+
+    # Items written by an earlier chunk of this upload were counted then
+    return len(to_insert), sum(not item.seen for item in to_update)
+
+def zero_missing_items(db: Session, upload: IngestUpload, diff: IngestDiff = None) -> int:
+    """
+    Full-export uploads: items the upload didn't write drop to qty 0.
+    They are kept rather than deleted, requests still point at them.
+    Returns the number of items changed.
+    """
+    written = select(IngestUploadItem.item_id).where(IngestUploadItem.upload_id == upload.id)
+    columns = [getattr(InventoryItem, c) for c in INVENTORY_COLUMNS]
+    removed = last_id = 0
+    while True:
+        rows = [
+            dict(zip(INVENTORY_COLUMNS, values), id=item_id, qty=0)
+            for item_id, *values in db.query(InventoryItem.id, *columns)
+            .filter(InventoryItem.id > last_id, InventoryItem.qty != 0, InventoryItem.id.not_in(written))
+            .order_by(InventoryItem.id).limit(500)
+        ]
+        if not rows:
+            return removed
+        last_id = rows[-1]["id"]
+        for row in rows:
+            row["content_hash"] = content_hash([row[c] for c in INVENTORY_COLUMNS])
+        db.bulk_update_mappings(InventoryItem, rows)
+        if diff is not None:
+            diff.record_removed([tuple(row[c] for c in ITEM_KEY) for row in rows])
+        removed += len(rows)
+
+# Upload formats by extension; anything else is read as a legacy Excel file
+INVENTORY_FILE_TYPES = {".xlsx": "xlsx", ".xlsm": "xlsx", ".xls": "excel", ".csv": "csv", ".parquet": "parquet"}
+
+def _file_format(file) -> str:
+    name = str(getattr(file, "name", file)).lower()
+    return next((fmt for ext, fmt in INVENTORY_FILE_TYPES.items() if name.endswith(ext)), "excel")
+
+def read_inventory_file(file, sheet=0) -> pd.DataFrame:
+    """Whole inventory file as a raw DataFrame, whatever its format."""
+    fmt = _file_format(file)
+    if fmt == "csv":
+        # Text as is: model codes like 00123 keep their zeros, validation coerces QTY
+        return pd.read_csv(file, dtype=str, na_values=list(NA_STRINGS), keep_default_na=False)
+    if fmt == "parquet":
+        return pd.read_parquet(file)
+    return pd.read_excel(file, sheet_name=sheet)
+
+def list_inventory_sheets(file) -> list:
+    """Sheet names of a workbook, in workbook order. CSV and Parquet files have one sheet, 0."""
+    fmt = _file_format(file)
+    if fmt in ("csv", "parquet"):
+        return [0]
+    if fmt == "excel":
+        return pd.ExcelFile(file).sheet_names
+
+    from openpyxl import load_workbook
+
+    wb = load_workbook(file, read_only=True)
+    try:
+        return wb.sheetnames
+    finally:
+        wb.close()
+
+def iter_inventory_sheet(file, chunk_size: int = BULK_BATCH_SIZE, sheet=0):
+    """
+    Yields (chunk_df, total_rows) from one sheet of an inventory workbook
+    (`sheet` is a name or position, the first sheet by default) or from a
+    CSV or Parquet file. .xlsx files are streamed with openpyxl in
+    read-only mode, CSV with pandas' chunked reader and Parquet by row
+    group batches, so only one chunk is held in memory; total_rows is
+    the declared size and may be None.
+    """
+    fmt = _file_format(file)
+    if fmt == "csv":
+        for chunk in pd.read_csv(file, dtype=str, na_values=list(NA_STRINGS), keep_default_na=False,
+                                 chunksize=chunk_size):
+            yield chunk, None
+        return
+    if fmt == "parquet":
+        import pyarrow.parquet as pq
+
+        parquet = pq.ParquetFile(file)
+        start = 0
+        for batch in parquet.iter_batches(batch_size=chunk_size):
+            chunk = batch.to_pandas()
+            chunk.index += start
+            start += len(chunk)
+            yield chunk, parquet.metadata.num_rows
+        return
+    if fmt == "excel":
+        df = read_inventory_file(file, sheet)
+        for start in range(0, len(df), chunk_size):
+            yield df.iloc[start:start + chunk_size], len(df)
+        return
+
+    from openpyxl import load_workbook
+
+    wb = load_workbook(file, read_only=True, data_only=True)
+    try:
+        ws = wb.worksheets[sheet] if isinstance(sheet, int) else wb[sheet]
+        total = ws.max_row - 1 if ws.max_row else None
+        rows = ws.iter_rows(values_only=True)
+        header = next(rows, None)
+        if header is None:
+            return
+
+        # Index rows like pd.read_excel (sheet row - 2) so errors point at the right row
+        chunk, index = [], []
+        for row_number, row in enumerate(rows):
+            row = tuple(None if isinstance(v, str) and v in NA_STRINGS else v for v in row)
+            if all(v is None for v in row):
+                continue
+            chunk.append(row)
+            index.append(row_number)
+            if len(chunk) >= chunk_size:
+                yield pd.DataFrame(chunk, columns=header, index=index), total
+                chunk, index = [], []
+        if chunk:
+            yield pd.DataFrame(chunk, columns=header, index=index), total
+    finally:
+        wb.close()
+
+def _upload_message(counts, skipped, full_export, outcome="Success"):
+    msg = f"{outcome}: Added {counts['added']}, Updated {counts['updated']}, Unchanged {counts['unchanged']} items."
+    if full_export:
+        msg += f" Zeroed {counts['removed']} item(s) missing from the file."
+    if skipped:
+        msg += f" Skipped {skipped} invalid row(s)."
+    return msg
+
+def ingest_inventory_stream(db: Session, file, user_id=None, chunk_size: int = BULK_BATCH_SIZE,
+                            progress_callback=None, errors: list = None, full_export: bool = False):
+    """
+    Streaming variant of ingest_inventory_excel. Each chunk of rows is
+    upserted and committed on its own, and what the upload has written so
+    far is kept in the database (IngestUpload), so memory stays bounded by
+    chunk_size however many rows the file has. progress_callback(rows_done, total_rows) is called after
+    every commit; total_rows may be None when the sheet doesn't declare it.
+    Invalid rows are skipped and their error reports appended to `errors`.
+    full_export works as in ingest_inventory_excel.
+    """
+    rows_done = 0
+    errors = [] if errors is None else errors
+    first_error = len(errors)
+    diff = IngestDiff()
+    upload = IngestUpload()
+    try:
+        for chunk, total in iter_inventory_sheet(file, chunk_size):
+            upsert_inventory_frame(db, chunk, upload=upload, errors=errors, diff=diff)
+            db.commit()
+            rows_done += len(chunk)
+            if progress_callback:
+                progress_callback(rows_done, total)
+
+        if full_export:
+            zero_missing_items(db, upload, diff)
+        skipped = sum(len(e) for e in errors[first_error:])
+        record(db, "INVENTORY_UPLOAD", str(user_id) if user_id else "SYSTEM", "inventory",
+               details=diff.details(skipped=skipped))
+        refresh_stock_summary(db)
+        upload.discard(db)
         db.commit()
-        return True, f"Success: Added {added_count}, Updated {updated_count} items."
+        invalidate_catalog()
+        return True, _upload_message(diff.counts(), skipped, full_export)
+
+    except Exception as e:
+        db.rollback()
+        invalidate_catalog()
+        if rows_done:
+            # Earlier chunks are already committed, record them
+            record(db, "INVENTORY_UPLOAD", str(user_id) if user_id else "SYSTEM", "inventory",
+                   details=diff.details(error=str(e)))
+            refresh_stock_summary(db)
+            upload.discard(db)
+            db.commit()
+        counts = diff.counts()
+        return False, f"Error after {rows_done} rows (Added {counts['added']}, Updated {counts['updated']}): {str(e)}"
+
+def ingest_inventory_excel(db: Session, file, user_id=None, errors: list = None, full_export: bool = False):
+    """
+    Upserts a whole inventory sheet in one transaction. Only new and
+    changed items are written; with full_export=True the file is taken as
+    the complete inventory and items missing from it drop to qty 0.
+    """
+    errors = [] if errors is None else errors
+    first_error = len(errors)
+    diff = IngestDiff()
+    try:
+        with timed("ingest: read file"):
+            df = read_inventory_file(file)
+        # One write, so only a full export needs to know which items it wrote
+        upload = IngestUpload() if full_export else None
+        upsert_inventory_frame(db, df, upload=upload, errors=errors, diff=diff)
+        if full_export:
+            with timed("ingest: zero missing"):
+                zero_missing_items(db, upload, diff)
+        skipped = sum(len(e) for e in errors[first_error:])
+
+        # Log action
+        record(db, "INVENTORY_UPLOAD", str(user_id) if user_id else "SYSTEM", "inventory",
+               details=diff.details(skipped=skipped))
+        with timed("ingest: commit"):
+            refresh_stock_summary(db)
+            if upload is not None:
+                upload.discard(db)
+            db.commit()
+        invalidate_catalog()
+        return True, _upload_message(diff.counts(), skipped, full_export)
         
     except Exception as e:
         db.rollback()
         return False, f"Error: {str(e)}"
 
+def preview_inventory_file(db: Session, file, chunk_size: int = BULK_BATCH_SIZE) -> IngestPreview:
+    """
+    Dry run of an upload: validates every row and counts the items that
+    would be added, changed or left as they are, without writing
+    anything. `errors` is the combined error report (one row per rejected
+    row); `not_in_file` counts existing items the file doesn't list.
+    """
+    existing = load_existing_items(db)
+    upload_qty = {}
+    rows = valid = duplicates = to_add = to_update = unchanged = 0
+    errors = []
+    unknown = []
+    for chunk, _ in iter_inventory_sheet(file, chunk_size):
+        report = validate_inventory_frame(chunk)
+        if report.missing_columns:
+            return IngestPreview(len(chunk), 0, 0, 0, 0, 0, 0, pd.DataFrame(columns=ERROR_COLUMNS),
+                                 report.unknown_columns, report.missing_columns)
+        unknown = report.unknown_columns
+        rows += len(chunk)
+        valid += len(report.items)
+        if len(report.errors):
+            errors.append(report.errors)
+        if report.items.empty:
+            continue
+        items = collapse_inventory_items(report.items, upload_qty)
+        duplicates += len(report.items) - len(items)
+        keys = item_keys(items)
+        for key, item_hash in zip(keys, content_hashes(items)):
+            if key in upload_qty:
+                # Counted where this upload first wrote it
+                duplicates += 1
+            elif key not in existing:
+                to_add += 1
+            elif existing[key][1] != item_hash:
+                to_update += 1
+            else:
+                unchanged += 1
+        upload_qty.update(zip(keys, items["qty"]))
+    not_in_file = sum(key not in upload_qty for key in existing)
+    errors = pd.concat(errors, ignore_index=True) if errors else pd.DataFrame(columns=ERROR_COLUMNS)
+    return IngestPreview(rows, valid, duplicates, to_add, to_update, unchanged, not_in_file, errors, unknown, [])
+
+def generate_request_email(requester_name, item_details, qty_requested, purpose):
+    """
+    Renders the asset request notification. Returns (html, text).
+    """
+    return render_email(
+        "request",
+        requester_name=requester_name,
+        item_details=item_details,
+        qty_requested=qty_requested,
+        purpose=purpose,
+        request_date=datetime.now().strftime('%Y-%m-%d %H:%M:%S'),
+    )
+
 def generate_email_body(requester_name, item_details, qty_requested, purpose):
     """
     Generates an HTML email body for an asset request.
     """
-    html_content = f"""
-    <html>
-    <head>
-        <style>
-            body {{ font-family: Arial, sans-serif; line-height: 1.6; color: #333; }}
-            .container {{ width: 80%; margin: auto; padding: 20px; border: 1px solid #ddd; border-radius: 5px; background-color: #f9f9f9; }}
-            .header {{ background-color: #4CAF50; color: white; padding: 10px; text-align: center; border-radius: 5px 5px 0 0; }}
-            .content {{ padding: 20px; }}
-            .footer {{ margin-top: 20px; font-size: 0.8em; text-align: center; color: #777; }}
-            table {{ width: 100%; border-collapse: collapse; margin-top: 10px; }}
-            th, td {{ padding: 10px; border-bottom: 1px solid #ddd; text-align: left; }}
-            th {{ background-color: #f2f2f2; }}
-        </style>
-    </head>
-    <body>
-        <div class="container">
-            <div class="header">
-                <h2>Asset Request Notification</h2>
-            </div>
-            <div class="content">
-                <p>Dear Approver,</p>
-                <p>A new asset request has been submitted by <strong>{requester_name}</strong>. Please review the details below:</p>
-                
-                <table>
-                    <tr>
-                        <th>Request Date</th>
-                        <td>{datetime.now().strftime('%Y-%m-%d %H:%M:%S')}</td>
-                    </tr>
-                    <tr>
-                        <th>Requester</th>
-                        <td>{requester_name}</td>
-                    </tr>
-                    <tr>
-                        <th>Item Requested</th>
-                        <td>{item_details}</td>
-                    </tr>
-                    <tr>
-                        <th>Quantity Needed</th>
-                        <td>{qty_requested}</td>
-                    </tr>
-                    <tr>
-                        <th>Purpose / Justification</th>
-                        <td>{purpose}</td>
-                    </tr>
-                </table>
-                
-                <p>Please log in to the Inventory Management System to approve or reject this request.</p>
-            </div>
-            <div class="footer">
-                <p>This is an automated message from the Inventory Assets Management System.</p>
-            </div>
-        </div>
-    </body>
-    </html>
-    """
-    return html_content
-
-def send_email_notification(to_email: str, subject: str, body: str, is_html: bool = False):
-    # Helper to get config from secrets or env
-    def get_config(key, default=None):
-        if key in st.secrets:
-            return st.secrets[key]
-        return os.getenv(key, default)
-
-    smtp_server = get_config("SMTP_SERVER", "smtp.gmail.com")
-    smtp_port = int(get_config("SMTP_PORT", 587))
-    sender_email = get_config("SMTP_EMAIL")
-    sender_password = get_config("SMTP_PASSWORD")
-    
-    if not sender_email or sender_email == "dummy@example.com":
-        print(f"[MOCK EMAIL] To: {to_email} | Subject: {subject} | Body: (HTML Content omitted in logs)" if is_html else f"[MOCK EMAIL] To: {to_email} | Subject: {subject} | Body: {body}")
-        if is_html:
-             # Print a snippet for verification
-             print(f"[MOCK EMAIL PREVIEW] {body[:200]}...")
-        return True
+    return generate_request_email(requester_name, item_details, qty_requested, purpose)[0]
 
-    try:
-        msg = MIMEMultipart()
-        msg['From'] = sender_email
-        msg['To'] = to_email
-        msg['Subject'] = subject
-        
-        msg_type = 'html' if is_html else 'plain'
-        msg.attach(MIMEText(body, msg_type))
-        
-        server = smtplib.SMTP(smtp_server, smtp_port)
-        server.starttls()
-        server.login(sender_email, sender_password)
-        server.send_message(msg)
-        server.quit()
-        return True
-    except Exception as e:
-        print(f"Failed to send email: {e}")
-        return False
+def send_email_notification(to_email: str, subject: str, body: str, is_html: bool = False, text_body: str = None):
+    return get_transport().send(to_email, subject, body, is_html=is_html, text_body=text_body)
@@ -0,0 +1,142 @@
+"""
+Pre-ingest validation of inventory sheets. Headers are normalized
+("Model ", "MODEL" and "model" are the same column), values are coerced
+column-wise, and rows that can't be ingested are reported with their
+sheet row number instead of failing the whole upload.
+"""
+import hashlib
+import re
+from collections import namedtuple
+import pandas as pd
+
+# Cell strings pd.read_excel treats as missing; the streaming reader matches it
+NA_STRINGS = {
+    "", "#N/A", "#N/A N/A", "#NA", "-1.#IND", "-1.#QNAN", "-NaN", "-nan",
+    "1.#IND", "1.#QNAN", "<NA>", "N/A", "NA", "NULL", "NaN", "None", "n/a",
+    "nan", "null",
+}
+
+# InventoryItem columns a sheet can provide
+INVENTORY_COLUMNS = [
+    "type", "manufacturer", "model", "description", "sum_description", "qty",
+    "head_configuration", "dept", "status", "area", "location", "site",
+]
+REQUIRED_COLUMNS = ["model"]
+# Natural key of an item: one model stocked at one site and location. Sheets
+# list units, so rows repeating a key are quantities of the same item.
+ITEM_KEY = ["model", "site", "location"]
+
+# Other spellings seen in the wild, after normalize_header
+HEADER_ALIASES = {
+    "quantity": "qty",
+    "sum_desc": "sum_description",
+    "summary_description": "sum_description",
+    "department": "dept",
+    "make": "manufacturer",
+    "model_no": "model",
+    "model_number": "model",
+    "head_config": "head_configuration",
+}
+
+ERROR_COLUMNS = ["Row", "Column", "Value", "Error"]
+
+ValidationReport = namedtuple("ValidationReport", ["items", "errors", "duplicates", "unknown_columns", "missing_columns"])
+
+def content_hash(values) -> str:
+    """
+    Hash of one item's INVENTORY_COLUMNS values, stored on the item so a
+    re-upload can tell unchanged rows apart without comparing columns.
+    """
+    text = "\x1f".join("\x00" if v is None else str(v) for v in values)
+    return hashlib.blake2b(text.encode(), digest_size=16).hexdigest()
+
+def item_keys(items: pd.DataFrame) -> list:
+    """The ITEM_KEY tuple of every row."""
+    return list(zip(*(items[c] for c in ITEM_KEY)))
+
+def key_label(key) -> str:
+    """'MODEL (site / location)', for messages and audit entries."""
+    model, site, location = key
+    return f"{model} ({site or '-'} / {location or '-'})"
+
+def content_hashes(items: pd.DataFrame) -> list:
+    return [content_hash(row) for row in items[INVENTORY_COLUMNS].itertuples(index=False, name=None)]
+
+def normalize_header(name) -> str:
+    """'Model ' -> 'model', 'Sum-Description' -> 'sum_description'."""
+    key = re.sub(r"[^a-z0-9]+", "_", str(name).strip().lower()).strip("_")
+    return HEADER_ALIASES.get(key, key)
+
+def _text(column: pd.Series) -> pd.Series:
+    """Column as stripped strings, with blanks and NA markers as missing."""
+    text = column.astype("string").str.strip()
+    return text.mask(text.isin(NA_STRINGS))
+
+def _errors(rows: pd.Series, column: str, values: pd.Series, message: str) -> pd.DataFrame:
+    return pd.DataFrame({"Row": rows, "Column": column, "Value": values.astype("string").fillna(""), "Error": message})
+
+def validate_inventory_frame(df: pd.DataFrame) -> ValidationReport:
+    """
+    Validates a raw inventory sheet (or a chunk of one). The frame index
+    is taken as the 0-based data row, so errors point at sheet row
+    index + 2 (the header is row 1).
+
+    Returns a ValidationReport: `items` holds the rows that can be
+    ingested as InventoryItem columns (plain Python values, missing as
+    None), `errors` one row per rejected cell, `duplicates` the number of
+    rows repeating an earlier item (ITEM_KEY) of the same frame.
+    """
+    sources = {}
+    unknown = []
+    for header in df.columns:
+        target = normalize_header(header)
+        if target in INVENTORY_COLUMNS and target not in sources:
+            sources[target] = header
+        else:
+            unknown.append(str(header))
+    missing = [c for c in REQUIRED_COLUMNS if c not in sources]
+    if missing:
+        empty = pd.DataFrame(columns=INVENTORY_COLUMNS)
+        return ValidationReport(empty, pd.DataFrame(columns=ERROR_COLUMNS), 0, unknown, missing)
+
+    rows = pd.Series(df.index + 2, index=df.index)
+    items = pd.DataFrame(index=df.index)
+    for target in INVENTORY_COLUMNS:
+        if target == "qty":
+            continue
+        items[target] = _text(df[sources[target]]) if target in sources else None
+
+    problems = []
+    valid = pd.Series(True, index=df.index)
+
+    no_model = items["model"].isna()
+    if no_model.any():
+        problems.append(_errors(rows[no_model], sources["model"], df.loc[no_model, sources["model"]], "Model is missing"))
+        valid &= ~no_model
+
+    if "qty" in sources:
+        raw_qty = df[sources["qty"]]
+        blank = raw_qty.isna() | raw_qty.astype("string").str.strip().isin(NA_STRINGS)
+        qty = pd.to_numeric(raw_qty.where(~blank), errors="coerce")
+        for mask, message in (
+            (~blank & qty.isna(), "QTY is not a number"),
+            (qty.notna() & (qty % 1 != 0), "QTY is not a whole number"),
+            (qty < 0, "QTY is negative"),
+        ):
+            mask &= valid
+            if mask.any():
+                problems.append(_errors(rows[mask], sources["qty"], raw_qty[mask], message))
+                valid &= ~mask
+        items["qty"] = qty.where(valid, 0).fillna(0).astype(int)
+    else:
+        items["qty"] = 0
+
+    items = items[valid]
+    duplicates = int(items.duplicated(ITEM_KEY).sum())
+    errors = pd.concat(problems, ignore_index=True).sort_values("Row", kind="stable") if problems \
+        else pd.DataFrame(columns=ERROR_COLUMNS)
+
+    # Plain Python objects so the DB driver can bind them (NA -> None)
+    items = items[INVENTORY_COLUMNS].astype(object)
+    items = items.where(items.notna(), None)
+    return ValidationReport(items, errors.reset_index(drop=True), duplicates, unknown, [])